@@ -1,12 +1,25 @@
-from openai import AsyncOpenAI, OpenAI
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, OpenAI
 from app.core.config import settings
 
 client = OpenAI(
     api_key=settings.openrouter_api_key,
-    base_url="https://openrouter.ai/api/v1",
+    base_url=settings.openrouter_base_url,
 )
 
+# Retries, rate limiting and concurrency caps live in
+# app.services.provider_gateway, so the client itself never retries.
+# Connections are kept alive long enough to survive gaps between bursts.
 async_client = AsyncOpenAI(
     api_key=settings.openrouter_api_key,
-    base_url="https://openrouter.ai/api/v1",
-)
\ No newline at end of file
+    base_url=settings.openrouter_base_url,
+    max_retries=0,
+    http_client=DefaultAsyncHttpxClient(
+        timeout=httpx.Timeout(settings.provider_timeout_seconds, connect=settings.provider_connect_timeout_seconds),
+        limits=httpx.Limits(
+            max_connections=settings.provider_max_connections,
+            max_keepalive_connections=settings.provider_max_keepalive_connections,
+            keepalive_expiry=settings.provider_keepalive_expiry_seconds,
+        ),
+    ),
+)
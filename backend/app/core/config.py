@@ -4,10 +4,82 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 class Settings(BaseSettings):
     backend_cors_origins: list[str] = ["http://localhost:3000"]
     database_url: str = ""
+    database_pool_mode: str = "pooler" # 'pooler' (PgBouncer-safe, no pooling) or 'direct'
+    database_pool_size: int = 10
+    database_max_overflow: int = 10
+    database_pool_timeout: float = 30
+    database_pool_recycle: int = 1800
+    database_pool_pre_ping: bool = True
+    database_statement_cache_size: int = 100
     openai_api_key: str = ""
     openrouter_api_key: str = ""
+    openrouter_base_url: str = "https://openrouter.ai/api/v1" # any OpenAI-compatible endpoint
+    provider_requests_per_second: float = 50 # token bucket shared by all LLM and embedding calls; 0 disables
+    provider_burst: int = 100
+    provider_default_concurrency: int = 32 # in-flight calls per model
+    provider_model_concurrency: dict[str, int] = {} # per-model overrides, e.g. {"openai/gpt-4o-mini": 64}
+    provider_max_queue: int = 500 # callers waiting per model before new ones are rejected
+    provider_queue_timeout_seconds: float = 10 # longest wait for admission before a 503
+    provider_max_retries: int = 3
+    provider_backoff_base_seconds: float = 0.25
+    provider_backoff_max_seconds: float = 8
+    provider_retry_budget_ratio: float = 0.2 # retries earned per request; caps retry traffic during outages
+    provider_hedge_delay_seconds: float = 0.75 # 0 disables hedging of embedding calls
+    provider_hedge_max_inputs: int = 16 # only query-sized embedding calls are hedged
+    provider_timeout_seconds: float = 60
+    provider_connect_timeout_seconds: float = 5
+    provider_max_connections: int = 200
+    provider_max_keepalive_connections: int = 100
+    provider_keepalive_expiry_seconds: float = 60
     supabase_url: str = ""
     supabase_key: str = ""
+    embedding_provider: str = "openrouter" # 'openrouter' or 'local'
+    embedding_model: str = "text-embedding-3-small"
+    embedding_dimensions: int = 1536 # must match the documents.embedding column
+    local_embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2"
+    local_embedding_batch_size: int = 64
+    local_embedding_quantize: bool = False
+    embedding_batch_size: int = 256
+    embedding_batch_max_tokens: int = 100_000
+    embedding_concurrency: int = 4
+    embedding_cache_max_entries: int = 50_000
+    document_write_mode: str = "copy" # 'copy' (binary COPY) or 'insert' (multi-row INSERT)
+    chunk_max_tokens: int = 512
+    chunk_overlap_tokens: int = 64
+    ingestion_workers: int = 2
+    ingestion_commit_batch_size: int = 256
+    ingestion_lease_seconds: float = 60 # a job whose worker stops renewing this is taken over by another process
+    ingestion_spool_dir: str = "/tmp/lumeris-uploads"
+    pdf_upload_max_mb: int = 200 # larger uploads are rejected with 413 while streaming
+    transcript_cache_ttl_seconds: float = 7 * 86400
+    youtube_content_sharing: bool = True # new resources for an ingested video reuse its documents
+    pdf_extract_workers: int = 2
+    pdf_pages_per_task: int = 16
+    hnsw_iterative_scan: str = "relaxed_order" # 'off', 'strict_order' or 'relaxed_order' (pgvector >= 0.8)
+    hnsw_ef_search: int = 40
+    vector_storage: str = "full" # ANN index precision: 'full', 'halfvec' or 'binary' (candidates are reranked exactly)
+    vector_rerank_oversample: int = 4 # candidates fetched per requested chunk in halfvec/binary mode
+    vector_index_enabled: bool = False
+    vector_index_memory_budget_mb: int = 512
+    study_generation_mode: str = "map_reduce" # 'map_reduce' or 'single' (first 50k characters only)
+    study_group_max_chars: int = 12_000
+    study_max_groups: int = 12
+    study_generation_concurrency: int = 4
+    stream_heartbeat_seconds: float = 15
+    content_moves_poll_seconds: float = 30 # how often caches are checked for documents moved by a resource delete
+    stream_cumulative_models: list[str] = [] # chat models whose stream chunks repeat the whole answer so far
+    query_embedding_cache_max_entries: int = 10_000
+    query_embedding_cache_ttl_seconds: float = 3600
+    answer_cache_enabled: bool = False
+    answer_cache_similarity_threshold: float = 0.95
+    answer_cache_max_resources: int = 1000
+    answer_cache_max_answers_per_resource: int = 200
+    answer_cache_ttl_seconds: float = 86400
+    metrics_enabled: bool = True
+    server_timing_enabled: bool = True
+    history_buffer_max_entries: int = 10_000 # writers wait when the buffer is full
+    history_flush_batch_size: int = 200
+    history_flush_interval_seconds: float = 0.25
 
     model_config = SettingsConfigDict(
         env_file=".env",
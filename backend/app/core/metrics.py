@@ -0,0 +1,157 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from app.core.config import settings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Stage durations of the current request, summed per stage name, for the
+# Server-Timing header. None outside a request (e.g. ingestion workers).
+_request_timings: ContextVar[dict[str, float] | None] = ContextVar("request_timings", default=None)
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram with optional labels.
+
+    ``observe`` is a bisect and a few additions under a lock, cheap enough
+    to call on every query and embedding batch.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value: float, *labelvalues: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                # Per-bucket counts (last slot is +Inf), then sum.
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        for labelvalues, counts, total in sorted(snapshot):
+            labels = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labelvalues)]
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = bound if bound == "+Inf" else repr(float(bound))
+                bucket_labels = ",".join([*labels, f'le="{le}"'])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {cumulative}")
+            suffix = f"{{{','.join(labels)}}}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {total}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+REGISTRY: list[Histogram] = []
+
+STAGE_SECONDS = Histogram(
+    "lumeris_stage_duration_seconds",
+    "Duration of instrumented processing stages.",
+    ("stage",),
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "lumeris_http_request_duration_seconds",
+    "HTTP request duration until the last body chunk is sent.",
+    ("method", "route", "status"),
+)
+CHAT_TTFT_SECONDS = Histogram(
+    "lumeris_chat_time_to_first_token_seconds",
+    "Time from receiving a chat request to the first streamed token.",
+)
+CHAT_TOTAL_SECONDS = Histogram(
+    "lumeris_chat_duration_seconds",
+    "Time from receiving a chat request to the end of its answer stream.",
+)
+
+
+def observe_stage(stage: str, seconds: float):
+    if not settings.metrics_enabled:
+        return
+    STAGE_SECONDS.observe(seconds, stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def timed(stage: str):
+    """Record the duration of the enclosed block under ``stage``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+def render_metrics() -> str:
+    lines: list[str] = []
+    for histogram in REGISTRY:
+        lines.extend(histogram.render())
+    return "\n".join(lines) + "\n"
+
+
+def _server_timing(timings: dict[str, float]) -> bytes:
+    return ", ".join(f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in timings.items()).encode()
+
+
+class MetricsMiddleware:
+    """Times every HTTP request and adds a ``Server-Timing`` header.
+
+    The header lists the stages recorded before the response starts. For a
+    streamed chat answer that is everything up to the model call; the rest
+    of the stream is reported in the final SSE event and the histograms.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.metrics_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        timings: dict[str, float] = {}
+        token = _request_timings.set(timings)
+        status = "500"
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+                if settings.server_timing_enabled and timings:
+                    message = {
+                        **message,
+                        "headers": [*message.get("headers", []), (b"server-timing", _server_timing(timings))],
+                    }
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                status,
+            )
@@ -1,15 +1,20 @@
 import os
+import time
 import uuid
 from urllib.parse import urlparse, parse_qsl, urlencode, urlunparse
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
-from sqlalchemy.pool import NullPool
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
 from app.core.config import settings
+from app.core.metrics import observe_stage
 from dotenv import load_dotenv
 
 load_dotenv()
 
 # NOTE: If using Supabase pooler (port 6543), you MUST disable prepared statements.
-# For better performance, consider using direct connection (port 5432) instead.
+# That is what DATABASE_POOL_MODE=pooler (the default) does. With a direct
+# connection (port 5432), set DATABASE_POOL_MODE=direct to keep a local
+# connection pool and cache prepared statements.
 DATABASE_URL = os.getenv("DATABASE_URL", settings.database_url)
 if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql+asyncpg://", 1)
@@ -22,17 +27,66 @@ if DATABASE_URL and not DATABASE_URL.startswith("postgresql+asyncpg://"):
     )
 
 
-def _with_asyncpg_pooler_safety(url: str) -> str:
+def _with_statement_cache(url: str, size: int) -> str:
     parsed = urlparse(url)
     query = dict(parse_qsl(parsed.query, keep_blank_values=True))
 
-    # Required for PgBouncer transaction/statement pooling compatibility.
-    query["prepared_statement_cache_size"] = "0"
-    query["statement_cache_size"] = "0"
+    # A size of 0 is required for PgBouncer transaction/statement pooling compatibility.
+    query["prepared_statement_cache_size"] = str(size)
+    query["statement_cache_size"] = str(size)
 
     return urlunparse(parsed._replace(query=urlencode(query)))
 
 
+_pool_stats = {
+    "checkouts": 0,
+    "checkout_wait_seconds_total": 0.0,
+    "checkout_wait_seconds_max": 0.0,
+    "connections_opened": 0,
+    "connections_closed": 0,
+}
+
+
+class _TimedPoolMixin:
+    # Time spent in _do_get covers both waiting for a pooled connection and
+    # opening a new one, which is what a request actually waits on.
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - start
+            _pool_stats["checkouts"] += 1
+            _pool_stats["checkout_wait_seconds_total"] += waited
+            _pool_stats["checkout_wait_seconds_max"] = max(_pool_stats["checkout_wait_seconds_max"], waited)
+
+
+class _TimedNullPool(_TimedPoolMixin, NullPool):
+    pass
+
+
+class _TimedQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def get_pool_stats() -> dict:
+    checkouts = _pool_stats["checkouts"]
+    stats = {
+        "mode": settings.database_pool_mode,
+        **_pool_stats,
+        "checkout_wait_seconds_avg": _pool_stats["checkout_wait_seconds_total"] / checkouts if checkouts else 0.0,
+        "connections_open": _pool_stats["connections_opened"] - _pool_stats["connections_closed"],
+    }
+    if engine is not None and isinstance(engine.pool, AsyncAdaptedQueuePool):
+        stats.update({
+            "pool_size": engine.pool.size(),
+            "checked_out": engine.pool.checkedout(),
+            "checked_in": engine.pool.checkedin(),
+            "overflow": engine.pool.overflow(),
+        })
+    return stats
+
+
 engine = None
 AsyncSessionLocal = None
 
@@ -48,22 +102,71 @@ def _init_engine_if_needed():
             "DATABASE_URL is not set. Configure it in backend/.env before using DB routes."
         )
 
-    safe_database_url = _with_asyncpg_pooler_safety(DATABASE_URL)
-
-    engine = create_async_engine(
-        safe_database_url,
-        echo=False,
-        poolclass=NullPool,
-        connect_args={
-            "statement_cache_size": 0,
-            "prepared_statement_cache_size": 0,
-            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4().hex}__",
-        },
-    )
+    if settings.database_pool_mode == "direct":
+        engine = create_async_engine(
+            _with_statement_cache(DATABASE_URL, settings.database_statement_cache_size),
+            echo=False,
+            poolclass=_TimedQueuePool,
+            pool_size=settings.database_pool_size,
+            max_overflow=settings.database_max_overflow,
+            pool_timeout=settings.database_pool_timeout,
+            pool_recycle=settings.database_pool_recycle,
+            pool_pre_ping=settings.database_pool_pre_ping,
+            connect_args={
+                "statement_cache_size": settings.database_statement_cache_size,
+            },
+        )
+    elif settings.database_pool_mode == "pooler":
+        engine = create_async_engine(
+            _with_statement_cache(DATABASE_URL, 0),
+            echo=False,
+            poolclass=_TimedNullPool,
+            connect_args={
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+                "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4().hex}__",
+            },
+        )
+    else:
+        raise ValueError("DATABASE_POOL_MODE must be 'pooler' or 'direct'")
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        _pool_stats["connections_opened"] += 1
+
+    @event.listens_for(engine.sync_engine, "close")
+    def _on_close(dbapi_connection, connection_record):
+        _pool_stats["connections_closed"] += 1
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        observe_stage("db_query", time.perf_counter() - conn.info["query_started"].pop())
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def _on_error(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("query_started"):
+            connection.info["query_started"].pop()
+
     AsyncSessionLocal = async_sessionmaker(
         engine, class_=AsyncSession, expire_on_commit=False
     )
 
+
+def get_sessionmaker() -> async_sessionmaker:
+    _init_engine_if_needed()
+    return AsyncSessionLocal
+
+
+async def dispose_engine():
+    if engine is not None:
+        await engine.dispose()
+
+
 async def get_db():
     _init_engine_if_needed()
     async with AsyncSessionLocal() as session:
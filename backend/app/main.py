@@ -1,18 +1,38 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 
 from app.core.config import settings
+from app.core.metrics import MetricsMiddleware, render_metrics
+from app.database import dispose_engine, get_pool_stats
 from app.routers import resource, chat, learning
+from app.services.embedding_cache import get_cache_stats
+from app.services.history_writer import history_writer
+from app.services.ingestion_service import start_workers, stop_workers
+from app.services.pdf_service import shutdown_pdf_executor
+from app.services.provider_gateway import ProviderBusyError, provider_gateway
+from app.services.retrieval_service import watch_content_moves
+from app.services.vector_index import vector_index
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Setup logic here (e.g. connecting to DB)
+    history_writer.start()
+    await start_workers()
+    content_moves = asyncio.create_task(watch_content_moves())
     yield
-    # Teardown logic here
+    content_moves.cancel()
+    await asyncio.gather(content_moves, return_exceptions=True)
+    await stop_workers()
+    await history_writer.stop()
+    shutdown_pdf_executor()
+    await dispose_engine()
 
 app = FastAPI(title="Lumeris API", version="1.0.0", lifespan=lifespan)
 
+app.add_middleware(MetricsMiddleware)
+
 # CORS setup
 app.add_middleware(
     CORSMiddleware,
@@ -26,6 +46,46 @@ app.include_router(resource.router, prefix="/api")
 app.include_router(chat.router, prefix="/api")
 app.include_router(learning.router, prefix="/api")
 
+
+@app.exception_handler(ProviderBusyError)
+async def provider_busy_handler(request: Request, exc: ProviderBusyError):
+    return ORJSONResponse(
+        {"detail": str(exc)},
+        status_code=503,
+        headers={"Retry-After": str(max(1, round(exc.retry_after)))},
+    )
+
+
 @app.get("/health")
 async def health_check():
     return {"status": "ok"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/stats/embedding-cache")
+async def embedding_cache_stats():
+    return get_cache_stats()
+
+
+@app.get("/stats/database-pool")
+async def database_pool_stats():
+    return get_pool_stats()
+
+
+@app.get("/stats/vector-index")
+async def vector_index_stats():
+    return vector_index.stats()
+
+
+@app.get("/stats/history-writer")
+async def history_writer_stats():
+    return history_writer.stats()
+
+
+@app.get("/stats/provider-gateway")
+async def provider_gateway_stats():
+    return provider_gateway.stats()
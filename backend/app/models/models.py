@@ -1,8 +1,9 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, UUID, JSON, Text
+from sqlalchemy import BigInteger, Boolean, Column, String, DateTime, ForeignKey, UUID, JSON, Text, Integer, Index, UniqueConstraint, true
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.models.base import Base
 from pgvector.sqlalchemy import Vector
+from app.core.config import settings
 import uuid
 
 class User(Base):
@@ -19,44 +20,123 @@ class Resource(Base):
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     type = Column(String, nullable=False) # 'youtube' or 'pdf'
     title = Column(String, nullable=False)
+    video_id = Column(String, nullable=True) # YouTube video id, used to share ingested content
+    content_resource_id = Column(UUID(as_uuid=True), ForeignKey("resources.id", ondelete="SET NULL"), nullable=True) # resource whose documents this one reuses; a sharer inherits them if it is deleted (migrations/009)
+    ready = Column(Boolean, nullable=False, default=True, server_default=true()) # false until its ingestion job completes
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     user = relationship("User", back_populates="resources")
-    documents = relationship("Document", back_populates="resource", cascade="all, delete-orphan")
+    # Left to the database: its delete trigger may hand shared documents to
+    # another resource (migrations/009) instead of deleting them.
+    documents = relationship("Document", back_populates="resource", cascade="all, delete-orphan", passive_deletes=True)
     flashcards = relationship("Flashcard", back_populates="resource", cascade="all, delete-orphan")
     quizzes = relationship("Quiz", back_populates="resource", cascade="all, delete-orphan")
     chat_history = relationship("ChatHistory", back_populates="resource", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("resources_user_created_idx", "user_id", "created_at", "id"),
+        Index(
+            "resources_shared_video_idx", "video_id",
+            postgresql_where=content_resource_id.is_(None) & video_id.isnot(None),
+        ),
+    )
+
+    @property
+    def documents_resource_id(self):
+        """Id the resource's documents are stored under."""
+        return self.content_resource_id or self.id
+
 class Document(Base):
     __tablename__ = "documents"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     resource_id = Column(UUID(as_uuid=True), ForeignKey("resources.id", ondelete="CASCADE"), nullable=False)
     chunk_text = Column(Text, nullable=False)
-    embedding = Column(Vector(1536), nullable=False) # sentence-transformers size
+    content_hash = Column(String, nullable=False) # sha256 of normalized chunk text
+    embedding_model = Column(String, nullable=False) # provider model that produced the embedding
+    embedding = Column(Vector(settings.embedding_dimensions), nullable=False)
     
     resource = relationship("Resource", back_populates="documents")
 
+    __table_args__ = (
+        Index("documents_resource_id_idx", "resource_id"),
+        UniqueConstraint("resource_id", "content_hash", name="documents_resource_content_hash_key"),
+    )
+
+class EmbeddingCache(Base):
+    __tablename__ = "embedding_cache"
+    model = Column(String, primary_key=True)
+    content_hash = Column(String, primary_key=True) # sha256 of normalized chunk text
+    embedding = Column(Vector(settings.embedding_dimensions), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class TranscriptCache(Base):
+    __tablename__ = "transcript_cache"
+    video_id = Column(String, primary_key=True)
+    transcript = Column(Text, nullable=False)
+    fetched_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+class ResourceContentMove(Base):
+    __tablename__ = "resource_content_moves"
+    id = Column(BigInteger, primary_key=True)
+    old_resource_id = Column(UUID(as_uuid=True), nullable=False) # deleted owner
+    new_resource_id = Column(UUID(as_uuid=True), nullable=False) # sharer that inherited its documents
+    moved_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    type = Column(String, nullable=False) # 'youtube' or 'pdf'
+    source = Column(Text, nullable=False) # YouTube URL or uploaded file name
+    action = Column(String, nullable=False, default="create") # 'create' a resource or 'update' resource_id's content
+    stage = Column(String, nullable=False, default="queued") # 'queued', 'extracted', 'chunked', 'embedding', 'completed', 'failed'
+    resource_id = Column(UUID(as_uuid=True), ForeignKey("resources.id", ondelete="SET NULL"), nullable=True)
+    content = Column(Text, nullable=True) # extracted text, kept until chunking is committed
+    chunks = Column(JSON, nullable=True) # chunk list, kept until embedding is committed
+    stale_document_ids = Column(JSON, nullable=True) # update jobs: documents to delete once the new chunks are in
+    chunks_total = Column(Integer, nullable=False, default=0)
+    chunks_embedded = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    lease_owner = Column(String, nullable=True) # worker process running the job
+    lease_until = Column(DateTime(timezone=True), nullable=True) # other workers may take the job over after this
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
 class Flashcard(Base):
     __tablename__ = "flashcards"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     resource_id = Column(UUID(as_uuid=True), ForeignKey("resources.id", ondelete="CASCADE"), nullable=False)
+    set_id = Column(UUID(as_uuid=True), nullable=False) # one generation run
+    content_version = Column(String, nullable=False) # hash of the resource's documents it was generated from
     question = Column(Text, nullable=False)
     answer = Column(Text, nullable=False)
+    position = Column(Integer, nullable=False, default=0, server_default="0") # order within its set, as generated
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     resource = relationship("Resource", back_populates="flashcards")
 
+    __table_args__ = (
+        Index("flashcards_resource_version_idx", "resource_id", "content_version", "created_at"),
+    )
+
 class Quiz(Base):
     __tablename__ = "quizzes"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     resource_id = Column(UUID(as_uuid=True), ForeignKey("resources.id", ondelete="CASCADE"), nullable=False)
+    set_id = Column(UUID(as_uuid=True), nullable=False) # one generation run
+    content_version = Column(String, nullable=False) # hash of the resource's documents it was generated from
     question = Column(Text, nullable=False)
     options = Column(JSON, nullable=False)
     correct_answer = Column(Text, nullable=False)
+    position = Column(Integer, nullable=False, default=0, server_default="0") # order within its set, as generated
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     resource = relationship("Resource", back_populates="quizzes")
 
+    __table_args__ = (
+        Index("quizzes_resource_version_idx", "resource_id", "content_version", "created_at"),
+    )
+
 class ChatHistory(Base):
     __tablename__ = "chat_history"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -66,3 +146,7 @@ class ChatHistory(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     resource = relationship("Resource", back_populates="chat_history")
+
+    __table_args__ = (
+        Index("chat_history_resource_created_idx", "resource_id", "created_at", "id"),
+    )
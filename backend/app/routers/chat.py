@@ -1,14 +1,20 @@
-from fastapi import APIRouter, Depends
+import asyncio
+from fastapi import APIRouter, Depends, Query
 from fastapi import HTTPException
-from fastapi.responses import StreamingResponse
-from sqlalchemy import delete
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy import delete, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from pydantic import BaseModel
 from app.database import get_db
 from app.core.auth import get_current_user_context
+from app.core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, encode_cursor
 from app.models.models import ChatHistory, Resource
+from app.services.chat_cache import get_query_embedding
+from app.services.history_writer import history_writer
 from app.services.rag_service import generate_chat_response
+from app.services.retrieval_service import documents_resource_id_expr
+from app.services.stage_timer import StageTimer
 from uuid import UUID
 
 router = APIRouter(prefix="/chat", tags=["chat"])
@@ -21,40 +27,45 @@ class ChatRequest(BaseModel):
 @router.get("/history/{resource_id}")
 async def get_chat_history(
     resource_id: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
     db: AsyncSession = Depends(get_db),
     user_context = Depends(get_current_user_context),
 ):
+    """Newest ``limit`` messages in chronological order. ``next_cursor``
+    fetches the page of messages before them."""
     user_id, _ = user_context
     try:
         resource_uuid = UUID(resource_id)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid resource_id")
 
-    resource = await db.scalar(
-        select(Resource).where(Resource.id == resource_uuid, Resource.user_id == user_id)
+    resource_exists = await db.scalar(
+        select(Resource.id).where(Resource.id == resource_uuid, Resource.user_id == user_id)
     )
-    if not resource:
+    if not resource_exists:
         raise HTTPException(status_code=404, detail="Resource not found")
 
-    result = await db.execute(
-        select(ChatHistory)
-        .where(ChatHistory.resource_id == resource_uuid)
-        .order_by(ChatHistory.created_at.asc())
+    query = (
+        select(ChatHistory.id, ChatHistory.role, ChatHistory.message, ChatHistory.created_at)
+        .where(
+            ChatHistory.resource_id == resource_uuid,
+            ChatHistory.role.in_(("user", "assistant")),
+        )
+        .order_by(ChatHistory.created_at.desc(), ChatHistory.id.desc())
+        .limit(limit + 1)
     )
-    history = result.scalars().all()
-
-    return {
-        "messages": [
-            {
-                "id": str(message.id),
-                "role": message.role,
-                "message": message.message,
-                "created_at": message.created_at.isoformat() if message.created_at else None,
-            }
-            for message in history
-            if message.role in {"user", "assistant"}
-        ]
-    }
+    if cursor:
+        query = query.where(tuple_(ChatHistory.created_at, ChatHistory.id) < decode_cursor(cursor))
+
+    rows = (await db.execute(query)).mappings().all()
+    page = rows[:limit]
+    next_cursor = encode_cursor(page[-1]["created_at"], page[-1]["id"]) if len(rows) > limit else None
+
+    return ORJSONResponse({
+        "messages": [dict(row) for row in reversed(page)],
+        "next_cursor": next_cursor,
+    })
 
 
 @router.delete("/history/{resource_id}")
@@ -75,6 +86,8 @@ async def clear_chat_history(
     if not resource:
         raise HTTPException(status_code=404, detail="Resource not found")
 
+    # Buffered rows would otherwise land after the delete and resurrect the chat.
+    await history_writer.flush()
     await db.execute(delete(ChatHistory).where(ChatHistory.resource_id == resource_uuid))
     await db.commit()
 
@@ -93,11 +106,35 @@ async def chat_endpoint(
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid resource_id")
 
-    resource = await db.scalar(
-        select(Resource).where(Resource.id == resource_uuid, Resource.user_id == user_id)
-    )
-    if not resource:
-        raise HTTPException(status_code=404, detail="Resource not found")
+    # The query embedding does not depend on the ownership check, so the
+    # provider call overlaps the database round trip.
+    timer = StageTimer()
+    query_embedding = asyncio.create_task(timer.timed("embed", get_query_embedding(request.query)))
 
-    stream = await generate_chat_response(request.query, request.resource_id, db)
-    return StreamingResponse(stream, media_type="text/event-stream")
+    try:
+        with timer.stage("ownership"):
+            documents_id = await db.scalar(
+                select(documents_resource_id_expr())
+                .where(Resource.id == resource_uuid, Resource.user_id == user_id, Resource.ready)
+            )
+        if not documents_id:
+            raise HTTPException(status_code=404, detail="Resource not found")
+
+        stream = await generate_chat_response(
+            request.query,
+            request.resource_id,
+            db,
+            query_embedding=query_embedding,
+            timer=timer,
+            documents_id=str(documents_id),
+        )
+    except BaseException:
+        query_embedding.cancel()
+        await asyncio.gather(query_embedding, return_exceptions=True)
+        raise
+
+    return StreamingResponse(
+        stream,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
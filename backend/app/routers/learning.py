@@ -1,11 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from app.database import get_db
 from app.core.auth import get_current_user_context
 from app.models.models import Resource
 from app.services.flashcard_service import generate_flashcards
+from app.services.provider_gateway import ProviderBusyError
 from app.services.quiz_service import generate_quiz
 from uuid import UUID
 
@@ -13,6 +14,8 @@ router = APIRouter(prefix="/learning", tags=["learning"])
 
 class LearningRequest(BaseModel):
     resource_id: str
+    count: int | None = Field(default=None, ge=1, le=50)
+    regenerate: bool = False
 
 @router.post("/generate-flashcards")
 async def create_flashcards(
@@ -24,14 +27,16 @@ async def create_flashcards(
         user_id, _ = user_context
         resource_uuid = UUID(request.resource_id)
         resource = await db.scalar(
-            select(Resource).where(Resource.id == resource_uuid, Resource.user_id == user_id)
+            select(Resource).where(Resource.id == resource_uuid, Resource.user_id == user_id, Resource.ready)
         )
         if not resource:
             raise HTTPException(status_code=404, detail="Resource not found")
 
-        cards = await generate_flashcards(request.resource_id, db)
+        cards = await generate_flashcards(
+            request.resource_id, db, count=request.count, regenerate=request.regenerate
+        )
         return {"flashcards": cards}
-    except HTTPException:
+    except (HTTPException, ProviderBusyError):
         raise
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid resource_id")
@@ -48,14 +53,16 @@ async def create_quiz(
         user_id, _ = user_context
         resource_uuid = UUID(request.resource_id)
         resource = await db.scalar(
-            select(Resource).where(Resource.id == resource_uuid, Resource.user_id == user_id)
+            select(Resource).where(Resource.id == resource_uuid, Resource.user_id == user_id, Resource.ready)
         )
         if not resource:
             raise HTTPException(status_code=404, detail="Resource not found")
 
-        quizzes = await generate_quiz(request.resource_id, db)
+        quizzes = await generate_quiz(
+            request.resource_id, db, count=request.count, regenerate=request.regenerate
+        )
         return {"quizzes": quizzes}
-    except HTTPException:
+    except (HTTPException, ProviderBusyError):
         raise
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid resource_id")
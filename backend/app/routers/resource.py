@@ -1,14 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+import asyncio
+import os
+import tempfile
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from pydantic import BaseModel
+from starlette.datastructures import UploadFile
+from starlette.formparsers import MultiPartException, MultiPartParser
 from uuid import UUID
 from app.database import get_db
 from app.core.auth import get_current_user_context
-from app.models.models import User, Resource, Document
-from app.services.transcript_service import get_transcript, extract_video_id, chunk_text
-from app.services.embedding_service import create_embedding
-from app.services.pdf_service import extract_pdf_text
+from app.core.config import settings
+from app.core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, encode_cursor
+from app.models.models import User, Resource, IngestionJob
+from app.services.transcript_service import extract_video_id
+from app.services.ingestion_service import TERMINAL_STAGES, enqueue_job, lease_new_job, spool_path
+from app.services.retrieval_service import warm_resource
 import logging
 
 logger = logging.getLogger(__name__)
@@ -19,44 +28,156 @@ class VideoRequest(BaseModel):
     url: str
 
 
-def _dedupe_chunks(chunks: list[str]) -> list[str]:
-    seen: set[str] = set()
-    deduped: list[str] = []
-    for chunk in chunks:
-        normalized = " ".join(chunk.split()).strip().lower()
-        if not normalized or normalized in seen:
-            continue
-        seen.add(normalized)
-        deduped.append(chunk)
-    return deduped
+async def _ensure_user(db: AsyncSession, user_id: UUID, email: str | None):
+    db_user = await db.scalar(select(User).where(User.id == user_id))
+    if not db_user:
+        if not email:
+            raise HTTPException(status_code=400, detail="Missing x-user-email header")
+        db.add(User(id=user_id, email=email))
+        await db.commit()
+
+
+# The endpoint parses its own body, so describe it for the OpenAPI docs.
+_PDF_UPLOAD_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                }
+            }
+        },
+    }
+}
+
+
+def _upload_too_large() -> HTTPException:
+    return HTTPException(status_code=413, detail=f"PDF must be at most {settings.pdf_upload_max_mb} MB")
+
+
+async def _capped_stream(request: Request, max_bytes: int):
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > max_bytes:
+            raise _upload_too_large()
+        yield chunk
+
+
+class _SpoolingParser(MultiPartParser):
+    """Writes file parts straight to a file in the ingestion spool directory,
+    so an accepted upload only has to be renamed, never copied."""
+
+    def on_headers_finished(self) -> None:
+        super().on_headers_finished()
+        if self._current_part.file is not None:
+            # Swap the SpooledTemporaryFile Starlette just opened for our own.
+            self._files_to_close_on_error.pop().close()
+            spool = tempfile.NamedTemporaryFile(dir=settings.ingestion_spool_dir, suffix=".part", delete=False)
+            self._files_to_close_on_error.append(spool)
+            self._current_part.file.file = spool
+
+    def discard(self):
+        for spool in self._files_to_close_on_error:
+            spool.close()
+            _remove_file(spool.name)
+
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+async def _receive_upload(request: Request) -> UploadFile:
+    """Parse a single-file multipart upload without buffering it in memory.
+
+    A declared Content-Length over the cap is rejected before any of the body
+    is read; otherwise the stream is counted while it is parsed, so a missing
+    or wrong header can't get around the cap. The file part is written to a
+    ``.part`` file in the spool directory; hand it to a job with
+    ``_move_upload`` and drop it with ``_discard_upload``.
+    """
+    max_bytes = settings.pdf_upload_max_mb * 1024 * 1024
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > max_bytes:
+        raise _upload_too_large()
+    if not request.headers.get("content-type", "").startswith("multipart/form-data"):
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload")
+
+    os.makedirs(settings.ingestion_spool_dir, exist_ok=True)
+    parser = _SpoolingParser(request.headers, _capped_stream(request, max_bytes), max_files=1, max_fields=10)
+    try:
+        form = await parser.parse()
+    except MultiPartException as e:
+        parser.discard()
+        raise HTTPException(status_code=400, detail=e.message)
+    except BaseException:
+        # A 413 from _capped_stream, or the client going away mid-upload.
+        parser.discard()
+        raise
+    file = form.get("file")
+    if not isinstance(file, UploadFile):
+        parser.discard()
+        raise HTTPException(status_code=400, detail="Missing file")
+    return file
+
+
+async def _receive_pdf(request: Request) -> UploadFile:
+    file = await _receive_upload(request)
+    # PDFs may carry a little junk before the header; the spec allows 1 KB.
+    if not (file.filename or "").lower().endswith(".pdf") or b"%PDF-" not in await file.read(1024):
+        await _discard_upload(file)
+        raise HTTPException(status_code=400, detail="File must be a PDF")
+    return file
+
+
+def _move_upload(file: UploadFile, path: str):
+    # Same directory, so this is a rename rather than a second copy.
+    file.file.flush()
+    os.replace(file.file.name, path)
+
+
+async def _discard_upload(file: UploadFile):
+    """Close an upload and delete its file unless it was moved to a job."""
+    await file.close()
+    await asyncio.to_thread(_remove_file, file.file.name)
 
 
 @router.get("")
 async def list_resources(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
     db: AsyncSession = Depends(get_db),
     user_context = Depends(get_current_user_context),
 ):
     user_id, _ = user_context
+    query = (
+        select(Resource.id, Resource.title, Resource.type, Resource.created_at)
+        .where(Resource.user_id == user_id, Resource.ready)
+        .order_by(Resource.created_at.desc(), Resource.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        query = query.where(tuple_(Resource.created_at, Resource.id) < decode_cursor(cursor))
+
     try:
-        result = await db.execute(
-            select(Resource).where(Resource.user_id == user_id).order_by(Resource.created_at.desc())
-        )
-        resources = result.scalars().all()
-        return {
-            "resources": [
-                {
-                    "id": str(resource.id),
-                    "title": resource.title,
-                    "type": resource.type,
-                    "created_at": resource.created_at.isoformat() if resource.created_at else None,
-                }
-                for resource in resources
-            ]
-        }
+        rows = (await db.execute(query)).mappings().all()
     except Exception as e:
         logger.error(f"Failed to list resources: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch resources")
 
+    page = rows[:limit]
+    next_cursor = encode_cursor(page[-1]["created_at"], page[-1]["id"]) if len(rows) > limit else None
+    return ORJSONResponse({
+        "resources": [dict(row) for row in page],
+        "next_cursor": next_cursor,
+    })
+
 
 @router.get("/{resource_id}")
 async def get_resource(
@@ -72,11 +193,14 @@ async def get_resource(
 
     try:
         resource = await db.scalar(
-            select(Resource).where(Resource.id == parsed_id, Resource.user_id == user_id)
+            select(Resource).where(Resource.id == parsed_id, Resource.user_id == user_id, Resource.ready)
         )
         if not resource:
             raise HTTPException(status_code=404, detail="Resource not found")
 
+        # The resource page is about to be chatted with; pull its embeddings into memory.
+        warm_resource(str(resource.documents_resource_id))
+
         return {
             "id": str(resource.id),
             "title": resource.title,
@@ -90,7 +214,38 @@ async def get_resource(
         raise HTTPException(status_code=500, detail="Failed to fetch resource")
 
 
-@router.post("/process-video")
+@router.get("/jobs/{job_id}")
+async def get_job(
+    job_id: str,
+    db: AsyncSession = Depends(get_db),
+    user_context = Depends(get_current_user_context),
+):
+    user_id, _ = user_context
+    try:
+        parsed_id = UUID(job_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid job ID")
+
+    job = await db.scalar(
+        select(IngestionJob).where(IngestionJob.id == parsed_id, IngestionJob.user_id == user_id)
+    )
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return {
+        "id": str(job.id),
+        "type": job.type,
+        "status": job.stage,
+        "resource_id": str(job.resource_id) if job.resource_id and job.stage == "completed" else None,
+        "chunks_total": job.chunks_total,
+        "chunks_embedded": job.chunks_embedded,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "updated_at": job.updated_at.isoformat() if job.updated_at else None,
+    }
+
+
+@router.post("/process-video", status_code=202)
 async def process_video(
     request: VideoRequest,
     db: AsyncSession = Depends(get_db),
@@ -98,117 +253,137 @@ async def process_video(
 ):
     try:
         user_id, email = user_context
-        
-        db_user = await db.scalar(select(User).where(User.id == user_id))
-        if not db_user:
-            if not email:
-                raise HTTPException(status_code=400, detail="Missing x-user-email header")
-            db_user = User(id=user_id, email=email)
-            db.add(db_user)
-            await db.commit()
-            
-        # 2. Extract Transcript
-        logger.info(f"Extracting transcript for {request.url}")
-        full_text = await get_transcript(request.url)
-        video_id = extract_video_id(request.url)
-        
-        # 3. Create Resource
-        resource = Resource(
-            user_id=user_id,
-            type="youtube",
-            title=f"YouTube Video: {video_id}"  # You'd normally fetch YouTube metadata here
-        )
-        db.add(resource)
-        await db.commit()
-        await db.refresh(resource)
-        
-        # 4. Chunk & Embed
-        logger.info("Chunking text...")
-        chunks = _dedupe_chunks(chunk_text(full_text))
-        
-        logger.info("Generating embeddings and saving...")
-        for chunk in chunks:
-            vector = create_embedding(chunk)
-            doc = Document(
-                resource_id=resource.id,
-                chunk_text=chunk,
-                embedding=vector
-            )
-            db.add(doc)
-            
+        extract_video_id(request.url)
+        await _ensure_user(db, user_id, email)
+
+        job = IngestionJob(user_id=user_id, type="youtube", source=request.url)
+        lease_new_job(job)
+        db.add(job)
         await db.commit()
-        logger.info(f"Successfully processed video. Resource ID: {resource.id}")
-        
-        return {"status": "success", "resource_id": str(resource.id)}
-        
+        await enqueue_job(job.id)
+        logger.info(f"Queued video ingestion job {job.id} for {request.url}")
+
+        return {"status": "queued", "job_id": str(job.id)}
+
     except ValueError as e:
         logger.warning(f"Video processing validation failed: {e}")
         raise HTTPException(status_code=400, detail=str(e))
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Failed to process video: {e}")
+        logger.error(f"Failed to queue video: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/process-pdf")
+@router.post("/process-pdf", status_code=202, openapi_extra=_PDF_UPLOAD_BODY)
 async def process_pdf(
-    file: UploadFile = File(...),
+    request: Request,
     db: AsyncSession = Depends(get_db),
     user_context = Depends(get_current_user_context),
 ):
+    file = None
     try:
-        if not file.filename.endswith(".pdf"):
-            raise HTTPException(status_code=400, detail="File must be a PDF")
+        file = await _receive_pdf(request)
 
         user_id, email = user_context
-        
-        db_user = await db.scalar(select(User).where(User.id == user_id))
-        if not db_user:
-            if not email:
-                raise HTTPException(status_code=400, detail="Missing x-user-email header")
-            db_user = User(id=user_id, email=email)
-            db.add(db_user)
-            await db.commit()
-            
-        # 2. Extract Text from PDF
-        logger.info(f"Extracting bytes from PDF {file.filename}")
-        file_bytes = await file.read()
-        full_text = await extract_pdf_text(file_bytes)
-        
-        if not full_text.strip():
-            raise HTTPException(status_code=400, detail="Could not extract text from PDF")
-            
-        # 3. Create Resource
-        resource = Resource(
+        await _ensure_user(db, user_id, email)
+
+        job = IngestionJob(user_id=user_id, type="pdf", source=file.filename)
+        lease_new_job(job)
+        db.add(job)
+        await db.flush()
+
+        # The upload is spooled to disk so the job can be resumed after a restart,
+        # and the parser opens it by path; it is never held in memory whole.
+        logger.info(f"Spooling PDF {file.filename} ({file.size} bytes) for job {job.id}")
+        _move_upload(file, spool_path(job.id))
+
+        await db.commit()
+        await enqueue_job(job.id)
+
+        return {"status": "queued", "job_id": str(job.id)}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to queue PDF: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if file is not None:
+            await _discard_upload(file)
+
+
+async def _ensure_not_processing(db: AsyncSession, resource_id: UUID):
+    pending = await db.scalar(
+        select(IngestionJob.id).where(
+            IngestionJob.resource_id == resource_id,
+            IngestionJob.stage.not_in(TERMINAL_STAGES),
+        ).limit(1)
+    )
+    if pending:
+        raise HTTPException(status_code=409, detail="The resource is still being processed")
+
+
+@router.put("/{resource_id}/content", status_code=202, openapi_extra=_PDF_UPLOAD_BODY)
+async def update_resource_content(
+    resource_id: str,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    user_context = Depends(get_current_user_context),
+):
+    """Replace a PDF resource's content with a revised file.
+
+    Only chunks that are not already stored for the resource get embedded;
+    unchanged documents are kept and removed ones deleted (see
+    ``ingestion_service._plan_update``).
+    """
+    user_id, _ = user_context
+    try:
+        parsed_id = UUID(resource_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid resource ID")
+
+    file = None
+    try:
+        resource = await db.scalar(
+            select(Resource).where(Resource.id == parsed_id, Resource.user_id == user_id)
+        )
+        if not resource:
+            raise HTTPException(status_code=404, detail="Resource not found")
+        if resource.type != "pdf":
+            raise HTTPException(status_code=400, detail="Only PDF resources can be updated")
+        await _ensure_not_processing(db, parsed_id)
+        # Don't hold a connection in a transaction while the upload streams in.
+        await db.rollback()
+
+        file = await _receive_pdf(request)
+        # Checked again under a row lock, held until the job is committed, so
+        # two concurrent updates can't both be queued.
+        await db.execute(select(Resource.id).where(Resource.id == parsed_id).with_for_update())
+        await _ensure_not_processing(db, parsed_id)
+        job = IngestionJob(
             user_id=user_id,
             type="pdf",
-            title=f"Document: {file.filename}"
+            action="update",
+            source=file.filename,
+            resource_id=parsed_id,
         )
-        db.add(resource)
-        await db.commit()
-        await db.refresh(resource)
-        
-        # 4. Chunk & Embed
-        logger.info("Chunking text...")
-        chunks = _dedupe_chunks(chunk_text(full_text))
-        
-        logger.info("Generating embeddings and saving...")
-        for chunk in chunks:
-            vector = create_embedding(chunk)
-            doc = Document(
-                resource_id=resource.id,
-                chunk_text=chunk,
-                embedding=vector
-            )
-            db.add(doc)
-            
+        lease_new_job(job)
+        db.add(job)
+        await db.flush()
+
+        logger.info(f"Spooling revised PDF {file.filename} ({file.size} bytes) for job {job.id}")
+        _move_upload(file, spool_path(job.id))
+
         await db.commit()
-        logger.info(f"Successfully processed PDF. Resource ID: {resource.id}")
-        
-        return {"status": "success", "resource_id": str(resource.id)}
-        
+        await enqueue_job(job.id)
+
+        return {"status": "queued", "job_id": str(job.id)}
+
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Failed to process PDF: {e}")
+        logger.error(f"Failed to queue update of resource {resource_id}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if file is not None:
+            await _discard_upload(file)
@@ -0,0 +1,104 @@
+import logging
+import time
+from collections import OrderedDict
+import numpy as np
+from app.core.config import settings
+from app.services.embedding_cache import normalize_chunk
+from app.services.embedding_service import create_embeddings
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """Bounded LRU mapping whose entries also expire after ``ttl_seconds``."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._items: OrderedDict = OrderedDict()
+
+    def get(self, key):
+        item = self._items.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._items[key]
+            return None
+        self._items.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self._items[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_entries:
+            self._items.popitem(last=False)
+
+    def pop(self, key, default=None):
+        item = self._items.pop(key, None)
+        return default if item is None else item[1]
+
+
+_query_embeddings = TTLCache(
+    settings.query_embedding_cache_max_entries,
+    settings.query_embedding_cache_ttl_seconds,
+)
+
+
+async def get_query_embedding(query: str) -> list[float]:
+    # Cached as float32 arrays, like the answer cache below; a list of Python
+    # floats is about eight times larger.
+    key = normalize_chunk(query)
+    vector = _query_embeddings.get(key)
+    if vector is None:
+        vector = np.asarray((await create_embeddings([query]))[0], dtype=np.float32)
+        _query_embeddings.put(key, vector)
+    return vector.tolist()
+
+
+class SemanticAnswerCache:
+    """Per-resource store of (unit query vector, answer) pairs.
+
+    A lookup returns the stored answer whose query is the most similar to the
+    new one, as long as the cosine similarity reaches ``threshold``.
+    """
+
+    def __init__(self, threshold: float, max_resources: int, max_answers_per_resource: int, ttl_seconds: float):
+        self.threshold = threshold
+        self.max_answers_per_resource = max_answers_per_resource
+        self._resources = TTLCache(max_resources, ttl_seconds)
+
+    @staticmethod
+    def _unit(vector: list[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+    def lookup(self, resource_id: str, query_vector: list[float]) -> str | None:
+        entries = self._resources.get(str(resource_id))
+        if not entries:
+            return None
+        matrix = np.stack([vector for vector, _ in entries])
+        scores = matrix @ self._unit(query_vector)
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+        return entries[best][1]
+
+    def store(self, resource_id: str, query_vector: list[float], answer: str):
+        if not answer:
+            return
+        entries = self._resources.get(str(resource_id)) or []
+        entries = (entries + [(self._unit(query_vector), answer)])[-self.max_answers_per_resource:]
+        self._resources.put(str(resource_id), entries)
+
+    def invalidate(self, resource_id: str):
+        self._resources.pop(str(resource_id))
+
+
+answer_cache = SemanticAnswerCache(
+    threshold=settings.answer_cache_similarity_threshold,
+    max_resources=settings.answer_cache_max_resources,
+    max_answers_per_resource=settings.answer_cache_max_answers_per_resource,
+    ttl_seconds=settings.answer_cache_ttl_seconds,
+)
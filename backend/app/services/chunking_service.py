@@ -0,0 +1,120 @@
+import re
+from collections import deque
+from functools import lru_cache
+from typing import Iterable, Iterator
+import tiktoken
+from app.core.config import settings
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+# Text without any sentence terminator is cut after this many characters per
+# allowed token, so a single run-on "sentence" can't grow the buffer forever.
+_MAX_CHARS_PER_TOKEN = 8
+
+
+@lru_cache(maxsize=1)
+def get_encoding():
+    return tiktoken.get_encoding("cl100k_base")
+
+
+class StreamingChunker:
+    """Pack sentences from a stream of text pieces into token-bounded chunks.
+
+    Pieces (e.g. one string per PDF page) are passed to ``feed`` as they
+    arrive, and ``finish`` flushes what is left. Each chunk holds at most
+    ``max_tokens`` tokens and repeats up to ``overlap_tokens`` tokens of
+    trailing sentences from the previous chunk. Sentences longer than
+    ``max_tokens`` are hard-split on token boundaries. Every sentence is
+    tokenized once, so the cost is linear in the input.
+    """
+
+    def __init__(self, max_tokens: int | None = None, overlap_tokens: int | None = None):
+        self.max_tokens = max_tokens or settings.chunk_max_tokens
+        overlap_tokens = settings.chunk_overlap_tokens if overlap_tokens is None else overlap_tokens
+        self.overlap_tokens = min(overlap_tokens, self.max_tokens // 2)
+        self._max_chars = self.max_tokens * _MAX_CHARS_PER_TOKEN
+        self._encoding = get_encoding()
+        self._tail = ""
+        self._window: deque[tuple[str, int]] = deque()
+        self._window_tokens = 0
+        # True once the window holds a sentence that hasn't been emitted yet.
+        self._has_new = False
+
+    def feed(self, piece: str) -> list[str]:
+        if not piece:
+            return []
+        parts = _SENTENCE_END.split(f"{self._tail} {piece}" if self._tail else piece)
+        self._tail = parts.pop()
+        while len(self._tail) > self._max_chars:
+            cut = self._tail.rfind(" ", 0, self._max_chars)
+            if cut <= 0:
+                cut = self._max_chars
+            parts.append(self._tail[:cut])
+            self._tail = self._tail[cut:]
+
+        chunks: list[str] = []
+        for sentence in parts:
+            self._add_sentence(sentence, chunks)
+        return chunks
+
+    def finish(self) -> list[str]:
+        chunks: list[str] = []
+        if self._tail.strip():
+            self._add_sentence(self._tail, chunks)
+        self._tail = ""
+        if self._has_new:
+            chunks.append(self._flush())
+        return chunks
+
+    def _flush(self) -> str:
+        chunk = " ".join(sentence for sentence, _ in self._window)
+        self._trim_window(self.overlap_tokens)
+        self._has_new = False
+        return chunk
+
+    def _trim_window(self, budget: int):
+        while self._window and self._window_tokens > budget:
+            _, count = self._window.popleft()
+            self._window_tokens -= count
+
+    def _add_sentence(self, raw_sentence: str, chunks: list[str]):
+        sentence = " ".join(raw_sentence.split())
+        if not sentence:
+            return
+        tokens = self._encoding.encode(sentence, disallowed_special=())
+
+        if len(tokens) > self.max_tokens:
+            if self._has_new:
+                chunks.append(self._flush())
+            self._trim_window(0)
+            step = self.max_tokens - self.overlap_tokens
+            for start in range(0, len(tokens), step):
+                chunks.append(self._encoding.decode(tokens[start:start + self.max_tokens]))
+                if start + self.max_tokens >= len(tokens):
+                    break
+            return
+
+        if self._window_tokens + len(tokens) > self.max_tokens:
+            if self._has_new:
+                chunks.append(self._flush())
+            # Overlap that doesn't fit next to this sentence is dropped rather
+            # than re-emitted on its own.
+            self._trim_window(self.max_tokens - len(tokens))
+        self._window.append((sentence, len(tokens)))
+        self._window_tokens += len(tokens)
+        self._has_new = True
+
+
+def iter_chunks(
+    pieces: Iterable[str],
+    max_tokens: int | None = None,
+    overlap_tokens: int | None = None,
+) -> Iterator[str]:
+    chunker = StreamingChunker(max_tokens, overlap_tokens)
+    for piece in pieces:
+        yield from chunker.feed(piece)
+    yield from chunker.finish()
+
+
+def chunk_text(text: str, max_tokens: int | None = None, overlap_tokens: int | None = None) -> list[str]:
+    return list(iter_chunks([text], max_tokens, overlap_tokens))
@@ -0,0 +1,92 @@
+import logging
+import struct
+from uuid import UUID
+import numpy as np
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.models.models import Document
+from app.services.embedding_cache import content_hash
+from app.services.embedding_service import get_embedding_provider
+
+logger = logging.getLogger(__name__)
+
+_COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+_COPY_TRAILER = struct.pack("!h", -1)
+_COLUMNS = ("resource_id", "chunk_text", "content_hash", "embedding_model", "embedding")
+
+
+def _encode_vector(vector) -> bytes:
+    # pgvector's binary format: uint16 dimensions, uint16 unused, big-endian float32 values.
+    values = np.asarray(vector, dtype=">f4")
+    return struct.pack("!HH", values.shape[0], 0) + values.tobytes()
+
+
+def encode_copy_rows(resource_id: UUID, chunks: list[str], vectors: list, model: str) -> bytes:
+    """Encode document rows as a PostgreSQL binary COPY stream."""
+    resource_bytes = resource_id.bytes
+    model_bytes = model.encode("utf-8")
+    buffer = bytearray(_COPY_HEADER)
+    for chunk, vector in zip(chunks, vectors):
+        chunk_bytes = chunk.encode("utf-8")
+        hash_bytes = content_hash(chunk).encode("ascii")
+        vector_bytes = _encode_vector(vector)
+        buffer += struct.pack("!hi", len(_COLUMNS), len(resource_bytes))
+        buffer += resource_bytes
+        buffer += struct.pack("!i", len(chunk_bytes))
+        buffer += chunk_bytes
+        buffer += struct.pack("!i", len(hash_bytes))
+        buffer += hash_bytes
+        buffer += struct.pack("!i", len(model_bytes))
+        buffer += model_bytes
+        buffer += struct.pack("!i", len(vector_bytes))
+        buffer += vector_bytes
+    buffer += _COPY_TRAILER
+    return bytes(buffer)
+
+
+async def _copy_documents(session: AsyncSession, resource_id: UUID, chunks: list[str], vectors: list):
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    driver_connection = raw_connection.driver_connection
+
+    # COPY goes straight to asyncpg, so make sure the session's transaction
+    # has actually begun; otherwise the rows would be committed on their own.
+    if not driver_connection.is_in_transaction():
+        await session.execute(text("SELECT 1"))
+
+    # asyncpg takes a plain ``bytes`` source for a file path; a memoryview
+    # is sent as the data itself.
+    await driver_connection.copy_to_table(
+        Document.__tablename__,
+        source=memoryview(encode_copy_rows(resource_id, chunks, vectors, get_embedding_provider().model)),
+        columns=list(_COLUMNS),
+        format="binary",
+    )
+
+
+async def write_documents(session: AsyncSession, resource_id: UUID, chunks: list[str], vectors: list):
+    """Write chunk/embedding pairs to ``documents`` in one round trip.
+
+    Rows are written inside the session's current transaction and become
+    visible when the caller commits.
+    """
+    if not chunks:
+        return
+
+    if settings.document_write_mode == "copy":
+        await _copy_documents(session, resource_id, chunks, vectors)
+    else:
+        await session.execute(
+            insert(Document),
+            [
+                {
+                    "resource_id": resource_id,
+                    "chunk_text": chunk,
+                    "content_hash": content_hash(chunk),
+                    "embedding_model": get_embedding_provider().model,
+                    "embedding": vector,
+                }
+                for chunk, vector in zip(chunks, vectors)
+            ],
+        )
@@ -0,0 +1,130 @@
+import hashlib
+import logging
+from collections import OrderedDict
+import numpy as np
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.core.config import settings
+from app.models.models import EmbeddingCache
+from app.services.embedding_service import create_embeddings, get_embedding_provider
+
+logger = logging.getLogger(__name__)
+
+# Keeps multi-row inserts well under asyncpg's 32767 bind-parameter limit.
+_INSERT_BATCH_SIZE = 1000
+
+
+def normalize_chunk(text: str) -> str:
+    return " ".join(text.split()).strip().lower()
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(normalize_chunk(text).encode("utf-8")).hexdigest()
+
+
+class _LRU:
+    """Vectors are kept as float32 arrays (~6 KB for 1536 dimensions, against
+    ~49 KB as a list of Python floats) and only become lists on the way out."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._items: OrderedDict[tuple[str, str], np.ndarray] = OrderedDict()
+
+    def get(self, key: tuple[str, str]) -> np.ndarray | None:
+        vector = self._items.get(key)
+        if vector is not None:
+            self._items.move_to_end(key)
+        return vector
+
+    def put(self, key: tuple[str, str], vector: np.ndarray):
+        self._items[key] = vector
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_entries:
+            self._items.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+_memory = _LRU(settings.embedding_cache_max_entries)
+_stats = {
+    "memory_hits": 0,
+    "db_hits": 0,
+    "misses": 0,
+    # UTF-8 size of the chunk text answered from the cache instead of being
+    # sent to the embedding API.
+    "text_bytes_not_embedded": 0,
+}
+
+
+def get_cache_stats() -> dict:
+    hits = _stats["memory_hits"] + _stats["db_hits"]
+    lookups = hits + _stats["misses"]
+    return {
+        **_stats,
+        "hit_rate": hits / lookups if lookups else 0.0,
+        "memory_entries": len(_memory),
+    }
+
+
+async def get_or_create_embeddings(texts: list[str], session: AsyncSession) -> list[list[float]]:
+    """Return embeddings for ``texts``, embedding only chunks never seen before.
+
+    Lookups go to the in-process LRU first, then in bulk to the
+    ``embedding_cache`` table. New vectors are added to ``session`` and are
+    persisted when the caller commits.
+    """
+    if not texts:
+        return []
+
+    model = get_embedding_provider().model
+    hashes = [content_hash(text) for text in texts]
+    found: dict[str, np.ndarray] = {}
+
+    for digest in hashes:
+        if digest in found:
+            continue
+        vector = _memory.get((model, digest))
+        if vector is not None:
+            found[digest] = vector
+            _stats["memory_hits"] += 1
+
+    pending = {digest for digest in hashes if digest not in found}
+    if pending:
+        result = await session.execute(
+            select(EmbeddingCache.content_hash, EmbeddingCache.embedding).where(
+                EmbeddingCache.model == model,
+                EmbeddingCache.content_hash.in_(list(pending)),
+            )
+        )
+        for digest, embedding in result.all():
+            vector = np.asarray(embedding, dtype=np.float32)
+            found[digest] = vector
+            _memory.put((model, digest), vector)
+            _stats["db_hits"] += 1
+
+    misses: dict[str, str] = {}
+    for text, digest in zip(texts, hashes):
+        if digest in found:
+            _stats["text_bytes_not_embedded"] += len(text.encode("utf-8"))
+        else:
+            misses.setdefault(digest, text)
+
+    if misses:
+        _stats["misses"] += len(misses)
+        logger.info(f"Embedding cache: {len(texts) - len(misses)} hits, {len(misses)} misses")
+        vectors = await create_embeddings(list(misses.values()))
+        rows = []
+        for digest, vector in zip(misses.keys(), vectors):
+            found[digest] = np.asarray(vector, dtype=np.float32)
+            _memory.put((model, digest), found[digest])
+            rows.append({"model": model, "content_hash": digest, "embedding": vector})
+        for start in range(0, len(rows), _INSERT_BATCH_SIZE):
+            await session.execute(
+                insert(EmbeddingCache)
+                .values(rows[start:start + _INSERT_BATCH_SIZE])
+                .on_conflict_do_nothing(index_elements=["model", "content_hash"])
+            )
+
+    return [found[digest].tolist() for digest in hashes]
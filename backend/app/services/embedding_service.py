@@ -1,14 +1,187 @@
+import asyncio
 import logging
-from app.client import client
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from app.services.provider_gateway import provider_gateway
+from app.core.config import settings
+from app.core.metrics import timed
+from app.services.chunking_service import get_encoding
 logger = logging.getLogger(__name__)
 
-def create_embedding(text: str) -> list[float]:
-    try:
-        response = client.embeddings.create(
-            model="text-embedding-3-small",
-            input=text
+# Provider limits for /embeddings: inputs per request, tokens per input, and tokens per request.
+MAX_INPUTS_PER_REQUEST = 2048
+MAX_TOKENS_PER_INPUT = 8191
+MAX_TOKENS_PER_REQUEST = 300_000
+
+
+def _count_tokens(text: str) -> int:
+    return len(get_encoding().encode(text, disallowed_special=()))
+
+
+def _truncate_to_token_limit(text: str, tokens: int) -> str:
+    if tokens <= MAX_TOKENS_PER_INPUT:
+        return text
+    encoding = get_encoding()
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:MAX_TOKENS_PER_INPUT])
+
+
+def _pack_batches(token_counts: list[int]) -> list[list[int]]:
+    # Greedily group input indexes so that every batch stays under both the
+    # per-request input count and the per-request token budget.
+    max_inputs = min(settings.embedding_batch_size, MAX_INPUTS_PER_REQUEST)
+    max_tokens = min(settings.embedding_batch_max_tokens, MAX_TOKENS_PER_REQUEST)
+
+    batches: list[list[int]] = []
+    current: list[int] = []
+    current_tokens = 0
+    for index, tokens in enumerate(token_counts):
+        if current and (len(current) >= max_inputs or current_tokens + tokens > max_tokens):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(index)
+        current_tokens += tokens
+
+    if current:
+        batches.append(current)
+    return batches
+
+
+class EmbeddingProvider(ABC):
+    """Turns texts into vectors of a fixed size.
+
+    ``model`` is recorded next to every stored vector so that vectors from
+    different providers are never compared with each other.
+    """
+
+    model: str
+    dimensions: int
+
+    @abstractmethod
+    async def embed(self, texts: list[str]) -> list[list[float]]:
+        """One vector of ``dimensions`` floats per text, in input order."""
+
+
+# Models that accept the ``dimensions`` request parameter, with their full size.
+_NATIVE_DIMENSIONS = {"text-embedding-3-small": 1536, "text-embedding-3-large": 3072}
+
+
+class OpenRouterEmbeddingProvider(EmbeddingProvider):
+    def __init__(self, model: str, dimensions: int):
+        self.api_model = model
+        self.dimensions = dimensions
+        native = _NATIVE_DIMENSIONS.get(model.rsplit("/", 1)[-1])
+        # Shortened vectors can't be compared with full-size ones from the same
+        # model, so they are stored and cached under their own name.
+        self.shortened = native is not None and dimensions < native
+        self.model = f"{model}@{dimensions}" if self.shortened else model
+
+    async def embed(self, texts: list[str]) -> list[list[float]]:
+        token_counts = [_count_tokens(text) for text in texts]
+        inputs = [_truncate_to_token_limit(text, tokens) for text, tokens in zip(texts, token_counts)]
+        batches = _pack_batches([min(tokens, MAX_TOKENS_PER_INPUT) for tokens in token_counts])
+        results: list[list[float] | None] = [None] * len(inputs)
+        semaphore = asyncio.Semaphore(max(1, settings.embedding_concurrency))
+
+        async def embed_batch(indexes: list[int]):
+            async with semaphore:
+                with timed("embedding_batch"):
+                    response = await provider_gateway.embeddings(
+                        model=self.api_model,
+                        input=[inputs[i] for i in indexes],
+                        **({"dimensions": self.dimensions} if self.shortened else {}),
+                    )
+            # The API tags every item with the position of its input in the request.
+            for item in response.data:
+                results[indexes[item.index]] = item.embedding
+
+        await asyncio.gather(*(embed_batch(indexes) for indexes in batches))
+
+        if any(vector is None for vector in results):
+            raise ValueError("Embedding response was missing vectors")
+        return results
+
+
+class LocalEmbeddingProvider(EmbeddingProvider):
+    """sentence-transformers model run on the CPU inside this process.
+
+    The model is loaded on first use, once per process, and can be
+    dynamically quantized to int8 to cut memory and CPU time.
+    """
+
+    def __init__(self, model: str, dimensions: int, batch_size: int, quantize: bool):
+        self.model = model
+        self.dimensions = dimensions
+        self.batch_size = batch_size
+        self.quantize = quantize
+        self._model = None
+        self._load_lock = asyncio.Lock()
+        # One encode at a time; torch already spreads a batch across cores.
+        self._encode_lock = asyncio.Lock()
+
+    def _load(self):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        model = SentenceTransformer(self.model, device="cpu")
+        if self.quantize:
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        actual = model.get_sentence_embedding_dimension()
+        if actual != self.dimensions:
+            raise ValueError(
+                f"{self.model} produces {actual}-dimensional vectors, "
+                f"but EMBEDDING_DIMENSIONS is {self.dimensions}"
+            )
+        return model
+
+    async def _get_model(self):
+        if self._model is None:
+            async with self._load_lock:
+                if self._model is None:
+                    logger.info(f"Loading local embedding model {self.model}")
+                    self._model = await asyncio.to_thread(self._load)
+        return self._model
+
+    async def embed(self, texts: list[str]) -> list[list[float]]:
+        model = await self._get_model()
+        async with self._encode_lock, timed("embedding_batch"):
+            vectors = await asyncio.to_thread(
+                model.encode,
+                texts,
+                batch_size=self.batch_size,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+            )
+        return vectors.tolist()
+
+
+@lru_cache(maxsize=1)
+def get_embedding_provider() -> EmbeddingProvider:
+    if settings.embedding_provider == "local":
+        return LocalEmbeddingProvider(
+            model=settings.local_embedding_model,
+            dimensions=settings.embedding_dimensions,
+            batch_size=settings.local_embedding_batch_size,
+            quantize=settings.local_embedding_quantize,
         )
-        return response.data[0].embedding
+    if settings.embedding_provider == "openrouter":
+        return OpenRouterEmbeddingProvider(
+            model=settings.embedding_model,
+            dimensions=settings.embedding_dimensions,
+        )
+    raise ValueError("EMBEDDING_PROVIDER must be 'openrouter' or 'local'")
+
+
+async def create_embeddings(texts: list[str]) -> list[list[float]]:
+    """Embed many texts with the configured provider.
+
+    The returned list is aligned with ``texts``.
+    """
+    if not texts:
+        return []
+
+    try:
+        return await get_embedding_provider().embed(texts)
     except Exception as e:
-        logger.error(f"Embedding failed: {e}")
-        raise
\ No newline at end of file
+        logger.error(f"Batch embedding failed: {e}")
+        raise
@@ -1,63 +1,132 @@
 import logging
+import uuid
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from app.client import async_client
-import json
+from app.services.provider_gateway import ProviderBusyError, provider_gateway
+from app.core.config import settings
+from app.core.metrics import timed
+from app.database import get_sessionmaker
+import orjson
 from app.models.models import Document, Flashcard
+from app.services.retrieval_service import documents_resource_id
+from app.services.single_flight import single_flight
+from app.services.study_generation import map_reduce_generate, resource_content_version
 
 logger = logging.getLogger(__name__)
 
-openai_client = async_client
 
-async def generate_flashcards(resource_id: str, session: AsyncSession) -> list[dict]:
-    # 1. Retrieve all text associated with this resource
-    result = await session.execute(select(Document).where(Document.resource_id == resource_id))
-    documents = result.scalars().all()
-    
-    if not documents:
-        raise ValueError("No content found for this resource")
-        
-    full_text = "\n\n".join([doc.chunk_text for doc in documents])
-    
-    # Token limits might require summarize first, but assuming we send it to gpt-4o-mini
-    # Max input chunking could be handled here
-    if len(full_text) > 50000:
-         full_text = full_text[:50000] # truncate safely for example
-
-    system_prompt = """
-    Generate 10-15 concise flashcards from the provided content.
+DEFAULT_FLASHCARD_COUNT = 12
+
+SYSTEM_PROMPT = """
+    Generate {count} concise flashcards from the provided content.
     Keep questions clear and exam-oriented.
     Answers should be short but conceptually strong.
-    Return strictly valid JSON in the exact format: [{"question": "...", "answer": "..."}]
+    Return strictly valid JSON in the exact format: [{{"question": "...", "answer": "..."}}]
     """
-    
-    try:
-        response = await openai_client.chat.completions.create(
+
+
+async def _flashcards_from_text(text: str, count: int) -> list[dict]:
+    with timed("llm_completion"):
+        response = await provider_gateway.chat(
             model="openai/gpt-4o-mini",
             response_format={ "type": "json_object" },
             messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Content:\n{full_text}\n\nReturn JSON object with key 'flashcards'."}
+                {"role": "system", "content": SYSTEM_PROMPT.format(count=count)},
+                {"role": "user", "content": f"Content:\n{text}\n\nReturn JSON object with key 'flashcards'."}
             ]
         )
-        
-        content = response.choices[0].message.content
-        if not content:
-            raise ValueError("Empty response from AI")
-            
-        data = json.loads(content)
-        flashcards_data = data.get("flashcards", [])
-        
+
+    content = response.choices[0].message.content
+    if not content:
+        raise ValueError("Empty response from AI")
+
+    return _parse_flashcards(content)
+
+
+def _parse_flashcards(content: str) -> list[dict]:
+    data = orjson.loads(content)
+    return [
+        {"question": fc["question"], "answer": fc["answer"]}
+        for fc in data.get("flashcards", [])
+    ]
+
+
+async def _latest_flashcards(session: AsyncSession, resource_id: str, version: str) -> list[dict]:
+    latest_set = (
+        select(Flashcard.set_id)
+        .where(Flashcard.resource_id == resource_id, Flashcard.content_version == version)
+        .order_by(Flashcard.created_at.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    result = await session.execute(
+        select(Flashcard.question, Flashcard.answer)
+        .where(Flashcard.resource_id == resource_id, Flashcard.set_id == latest_set)
+        .order_by(Flashcard.position.asc(), Flashcard.id.asc())
+    )
+    return [{"question": question, "answer": answer} for question, answer in result.all()]
+
+
+async def _generate_and_store(resource_id: str, documents_id: str, version: str, count: int) -> list[dict]:
+    # Runs detached from the request (see single_flight), so it uses its own session.
+    async with get_sessionmaker()() as session:
+        # 1. Retrieve all text associated with this resource
+        result = await session.execute(select(Document.chunk_text).where(Document.resource_id == documents_id))
+        chunks = result.scalars().all()
+
+        # 2. Generate over the whole resource, or over a truncated prefix in single mode
+        if settings.study_generation_mode == "map_reduce":
+            flashcards_data = await map_reduce_generate(chunks, count, _flashcards_from_text)
+        else:
+            full_text = "\n\n".join(chunks)[:50000]
+            flashcards_data = await _flashcards_from_text(full_text, count)
+
         # 3. Save to database
+        set_id = uuid.uuid4()
         new_flashcards = []
-        for fc in flashcards_data:
-            item = Flashcard(resource_id=resource_id, question=fc["question"], answer=fc["answer"])
+        for position, fc in enumerate(flashcards_data):
+            item = Flashcard(
+                resource_id=resource_id,
+                set_id=set_id,
+                content_version=version,
+                question=fc["question"],
+                answer=fc["answer"],
+                position=position,
+            )
             session.add(item)
             new_flashcards.append({"question": item.question, "answer": item.answer})
-            
+
         await session.commit()
         return new_flashcards
-        
+
+
+async def generate_flashcards(
+    resource_id: str,
+    session: AsyncSession,
+    count: int | None = None,
+    regenerate: bool = False,
+) -> list[dict]:
+    """Return the stored flashcard set for the resource's current content,
+    generating (and storing) a new one when there is none or ``regenerate``
+    is set. Concurrent identical requests share a single generation."""
+    documents_id = await documents_resource_id(session, resource_id)
+    version = await resource_content_version(session, documents_id)
+    if version is None:
+        raise ValueError("No content found for this resource")
+
+    if not regenerate:
+        stored = await _latest_flashcards(session, resource_id, version)
+        if stored and (count is None or len(stored) >= count):
+            return stored[:count]
+
+    count = count or DEFAULT_FLASHCARD_COUNT
+    try:
+        return await single_flight(
+            ("flashcards", str(resource_id), version, count),
+            lambda: _generate_and_store(resource_id, documents_id, version, count),
+        )
+    except ProviderBusyError:
+        raise
     except Exception as e:
         logger.error(f"Failed to generate flashcards: {e}")
         raise ValueError("AI Flashcard generation failed")
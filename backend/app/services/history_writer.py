@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from uuid import UUID
+from sqlalchemy import insert
+from app.core.config import settings
+from app.database import get_sessionmaker
+from app.models.models import ChatHistory
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryWriter:
+    """Write-behind buffer for chat history rows.
+
+    Requests enqueue rows and return immediately; a single background task
+    inserts them in batches once ``batch_size`` rows are waiting or
+    ``flush_interval`` has passed. The queue is bounded, so when the database
+    falls behind, ``write`` waits for space instead of growing without limit.
+    """
+
+    def __init__(self, max_entries: int, batch_size: int, flush_interval: float):
+        self.max_entries = max_entries
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        # Rows enqueued and rows handled (written or dropped) so far. Rows are
+        # handled in queue order, so a flush only waits for its own position.
+        self._enqueued = 0
+        self._handled = 0
+        self._flush_waiters: list[tuple[int, asyncio.Future]] = []
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.backpressure_waits = 0
+
+    def start(self):
+        if self._task is None or self._task.done():
+            if self._queue is None:
+                self._queue = asyncio.Queue(maxsize=self.max_entries)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush everything still buffered, then stop the background task."""
+        if self._task is None:
+            return
+        await self.flush()
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def write(self, resource_id, role: str, message: str):
+        self.start()
+        row = {
+            "resource_id": resource_id if isinstance(resource_id, UUID) else UUID(str(resource_id)),
+            "role": role,
+            "message": message,
+            # Stamped here: rows flushed together share one transaction, and
+            # now() would give them all the same created_at.
+            "created_at": datetime.now(timezone.utc),
+        }
+        if self._queue.full():
+            self.backpressure_waits += 1
+        await self._queue.put(row)
+        self._enqueued += 1
+
+    async def flush(self):
+        """Wait until every row enqueued before the call has been written.
+
+        Rows enqueued meanwhile are not waited for, so a flush finishes even
+        while other requests keep the queue busy.
+        """
+        if self._task is None or self._task.done() or self._handled >= self._enqueued:
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._flush_waiters.append((self._enqueued, waiter))
+        await waiter
+
+    def _wake_flushes(self):
+        waiting = []
+        for target, waiter in self._flush_waiters:
+            if waiter.done():
+                continue
+            if target <= self._handled:
+                waiter.set_result(None)
+            else:
+                waiting.append((target, waiter))
+        self._flush_waiters = waiting
+
+    async def _run(self):
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._insert(batch)
+            finally:
+                self._handled += len(batch)
+                self._wake_flushes()
+
+    async def _insert(self, batch: list[dict]):
+        try:
+            async with get_sessionmaker()() as session:
+                await session.execute(insert(ChatHistory), batch)
+                await session.commit()
+            self.written += len(batch)
+            self.batches += 1
+            return
+        except Exception as e:
+            if len(batch) == 1:
+                self.dropped += 1
+                logger.error(f"Failed to save chat history: {e}")
+                return
+            logger.warning(f"Chat history batch of {len(batch)} failed, retrying row by row: {e}")
+
+        # One bad row (e.g. its resource was deleted meanwhile) must not
+        # take the rest of the batch down with it.
+        for row in batch:
+            await self._insert([row])
+
+    def stats(self) -> dict:
+        return {
+            "buffered": self._queue.qsize() if self._queue is not None else 0,
+            "max_entries": self.max_entries,
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "backpressure_waits": self.backpressure_waits,
+        }
+
+
+history_writer = HistoryWriter(
+    max_entries=settings.history_buffer_max_entries,
+    batch_size=settings.history_flush_batch_size,
+    flush_interval=settings.history_flush_interval_seconds,
+)
@@ -0,0 +1,443 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import timedelta
+from uuid import UUID
+from sqlalchemy import delete, exists, func, text, update
+from sqlalchemy.future import select
+from app.core.config import settings
+from app.core.metrics import observe_stage, timed
+from app.database import get_sessionmaker
+from app.models.models import Document, IngestionJob, Resource
+from app.services.embedding_cache import content_hash, get_or_create_embeddings, normalize_chunk
+from app.services.embedding_service import get_embedding_provider
+from app.services.chunking_service import StreamingChunker, chunk_text
+from app.services.document_writer import write_documents
+from app.services.pdf_service import iter_pdf_pages
+from app.services.provider_gateway import background_calls
+from app.services.retrieval_service import documents_changed
+from app.services.transcript_service import get_transcript, extract_video_id
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STAGES = ("completed", "failed")
+
+# Rows per DELETE ... WHERE id IN (...), well under asyncpg's bind parameter limit.
+_DELETE_BATCH_SIZE = 5000
+
+_queue: asyncio.Queue[UUID] = asyncio.Queue()
+_workers: list[asyncio.Task] = []
+# Jobs queued or running in this process, so the sweeper doesn't queue them twice.
+_local_jobs: set[UUID] = set()
+
+# Identifies this process in ingestion_jobs.lease_owner.
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# A job is run by whoever holds its lease. Unleased and expired jobs can be
+# taken over; SKIP LOCKED makes two processes claiming at once pick one winner.
+_CLAIM_SQL = text("""
+    UPDATE ingestion_jobs
+    SET lease_owner = :owner, lease_until = now() + make_interval(secs => :lease_seconds)
+    WHERE id = (
+        SELECT id FROM ingestion_jobs
+        WHERE id = :job_id
+          AND stage NOT IN ('completed', 'failed')
+          AND (lease_until IS NULL OR lease_until < now() OR lease_owner = :owner)
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id
+""")
+
+_RENEW_SQL = text("""
+    UPDATE ingestion_jobs
+    SET lease_until = now() + make_interval(secs => :lease_seconds)
+    WHERE id = :job_id AND lease_owner = :owner
+    RETURNING id
+""")
+
+
+def _dedupe_chunks(chunks: list[str]) -> list[str]:
+    seen: set[str] = set()
+    deduped: list[str] = []
+    for chunk in chunks:
+        normalized = normalize_chunk(chunk)
+        if not normalized or normalized in seen:
+            continue
+        seen.add(normalized)
+        deduped.append(chunk)
+    return deduped
+
+
+def spool_path(job_id: UUID) -> str:
+    return os.path.join(settings.ingestion_spool_dir, f"{job_id}.pdf")
+
+
+def _remove_spool_file(job_id: UUID):
+    try:
+        os.remove(spool_path(job_id))
+    except FileNotFoundError:
+        pass
+
+
+async def _chunk_pdf(job: IngestionJob) -> list[str]:
+    # Pages are chunked as they come off the parser instead of after the
+    # whole document has been extracted.
+    chunker = StreamingChunker()
+    chunks: list[str] = []
+    started = time.perf_counter()
+    chunking = 0.0
+    async for page_text in iter_pdf_pages(spool_path(job.id)):
+        fed = time.perf_counter()
+        chunks.extend(chunker.feed(page_text))
+        chunking += time.perf_counter() - fed
+    fed = time.perf_counter()
+    chunks.extend(chunker.finish())
+    chunking += time.perf_counter() - fed
+    # Extraction and chunking interleave; split the wall time between them.
+    observe_stage("chunk", chunking)
+    observe_stage("pdf_extract", time.perf_counter() - started - chunking)
+    if not chunks:
+        raise ValueError("Could not extract text from PDF")
+    return chunks
+
+
+def lease_new_job(job: IngestionJob):
+    """Give a job created by this process a lease on it, so other processes
+    leave it (and its local spool file) to this one."""
+    job.lease_owner = WORKER_ID
+    job.lease_until = func.now() + timedelta(seconds=settings.ingestion_lease_seconds)
+
+
+def _set_chunks(job: IngestionJob, chunks: list[str]):
+    chunks = _dedupe_chunks(chunks)
+    job.chunks = chunks
+    job.chunks_total = len(chunks)
+    job.content = None
+    job.stage = "chunked"
+
+
+def _resource_title(job: IngestionJob) -> str:
+    if job.type == "youtube":
+        return f"YouTube Video: {extract_video_id(job.source)}"  # You'd normally fetch YouTube metadata here
+    return f"Document: {job.source}"
+
+
+async def _find_shared_content(session, video_id: str) -> tuple[UUID, int] | None:
+    """An ingested resource for the same video whose documents can be reused,
+    with its document count."""
+    unfinished = exists().where(
+        IngestionJob.resource_id == Resource.id, IngestionJob.stage.not_in(TERMINAL_STAGES)
+    )
+    result = await session.execute(
+        select(Resource.id, func.count(Document.id))
+        .join(Document, Document.resource_id == Resource.id)
+        .where(
+            Resource.video_id == video_id,
+            Resource.content_resource_id.is_(None),
+            Document.embedding_model == get_embedding_provider().model,
+            ~unfinished,
+        )
+        .group_by(Resource.id)
+        .order_by(Resource.created_at.asc())
+        .limit(1)
+    )
+    row = result.first()
+    return (row[0], row[1]) if row else None
+
+
+async def _share_existing_content(session, job: IngestionJob) -> bool:
+    """Complete a YouTube job by pointing a new resource at an already
+    ingested copy of the video. Returns False when there is none."""
+    video_id = extract_video_id(job.source)
+    shared = await _find_shared_content(session, video_id)
+    if shared is None:
+        return False
+
+    content_resource_id, document_count = shared
+    resource = Resource(
+        user_id=job.user_id,
+        type=job.type,
+        title=_resource_title(job),
+        video_id=video_id,
+        content_resource_id=content_resource_id,
+    )
+    session.add(resource)
+    await session.flush()
+    job.resource_id = resource.id
+    job.chunks_total = document_count
+    job.chunks_embedded = document_count
+    job.stage = "completed"
+    await session.commit()
+    logger.info(f"Job {job.id}: reused documents of resource {content_resource_id}. Resource ID: {resource.id}")
+    return True
+
+
+async def _delete_documents(session, document_ids: list):
+    for start in range(0, len(document_ids), _DELETE_BATCH_SIZE):
+        batch = document_ids[start:start + _DELETE_BATCH_SIZE]
+        await session.execute(delete(Document).where(Document.id.in_(batch)))
+
+
+async def _plan_update(session, job: IngestionJob):
+    """Cut an update job's chunk list down to what the resource lacks.
+
+    Documents whose chunk is still in the new content are kept untouched,
+    embedding and index entries included. The ones that are not are recorded
+    on the job and deleted only after the new chunks are written, so searches
+    never see the resource with part of its content missing. Rows embedded by
+    another model are invisible to search and go right away.
+    """
+    if job.resource_id is None:
+        raise ValueError("The resource was deleted")
+    model = get_embedding_provider().model
+    result = await session.execute(
+        select(Document.id, Document.content_hash, Document.embedding_model)
+        .where(Document.resource_id == job.resource_id)
+    )
+    existing: dict[str, UUID] = {}
+    other_model: list[UUID] = []
+    for document_id, digest, embedding_model in result:
+        if embedding_model == model:
+            existing[digest] = document_id
+        else:
+            other_model.append(document_id)
+    await _delete_documents(session, other_model)
+
+    chunks = job.chunks or []
+    hashes = [content_hash(chunk) for chunk in chunks]
+    wanted = set(hashes)
+    new_chunks = [chunk for chunk, digest in zip(chunks, hashes) if digest not in existing]
+    job.stale_document_ids = [str(document_id) for digest, document_id in existing.items() if digest not in wanted]
+    job.chunks = new_chunks
+    job.chunks_total = len(new_chunks)
+    logger.info(
+        f"Job {job.id}: updating resource {job.resource_id}: {len(chunks) - len(new_chunks)} chunks unchanged, "
+        f"{len(new_chunks)} to embed, {len(job.stale_document_ids)} to remove"
+    )
+
+
+async def run_job(job_id: UUID):
+    """Advance a job through its stages, committing after each one.
+
+    Every stage reads the output of the previous committed stage from the job
+    row, so a job interrupted by a restart picks up where it stopped.
+    """
+    async with get_sessionmaker()() as session:
+        job = await session.get(IngestionJob, job_id)
+        if job is None or job.stage in TERMINAL_STAGES:
+            return
+
+        try:
+            if job.stage == "queued" and job.type == "youtube" and settings.youtube_content_sharing:
+                if await _share_existing_content(session, job):
+                    return
+
+            if job.stage == "queued":
+                logger.info(f"Job {job.id}: extracting {job.type} content from {job.source}")
+                if job.type == "pdf":
+                    # The spooled file makes PDF extraction cheap to redo, so
+                    # extraction and chunking are committed as one stage.
+                    _set_chunks(job, await _chunk_pdf(job))
+                else:
+                    job.content = await get_transcript(job.source, session)
+                    job.stage = "extracted"
+                await session.commit()
+
+            if job.stage == "extracted":
+                logger.info(f"Job {job.id}: chunking text...")
+                with timed("chunk"):
+                    chunks = chunk_text(job.content)
+                _set_chunks(job, chunks)
+                await session.commit()
+
+            if job.stage == "chunked":
+                if job.action == "update":
+                    await _plan_update(session, job)
+                else:
+                    # Hidden from listings and chat until the documents are in.
+                    resource = Resource(
+                        user_id=job.user_id,
+                        type=job.type,
+                        title=_resource_title(job),
+                        video_id=extract_video_id(job.source) if job.type == "youtube" else None,
+                        ready=False,
+                    )
+                    session.add(resource)
+                    await session.flush()
+                    job.resource_id = resource.id
+                job.stage = "embedding"
+                await session.commit()
+
+            if job.stage == "embedding":
+                chunks = job.chunks or []
+                batch_size = max(1, settings.ingestion_commit_batch_size)
+                while job.chunks_embedded < len(chunks):
+                    batch = chunks[job.chunks_embedded:job.chunks_embedded + batch_size]
+                    vectors = await get_or_create_embeddings(batch, session)
+                    job.chunks_embedded += len(batch)
+                    await session.flush()
+                    await write_documents(session, job.resource_id, batch, vectors)
+                    await session.commit()
+                    logger.info(f"Job {job.id}: embedded {job.chunks_embedded}/{job.chunks_total} chunks")
+
+                # Committed with the completion so the switch to the new
+                # content is a single step for readers.
+                await _delete_documents(session, [UUID(document_id) for document_id in job.stale_document_ids or []])
+                if job.action == "create":
+                    await session.execute(update(Resource).where(Resource.id == job.resource_id).values(ready=True))
+                job.chunks = None
+                job.stale_document_ids = None
+                job.stage = "completed"
+                await session.commit()
+                documents_changed(str(job.resource_id))
+                if job.type == "pdf":
+                    _remove_spool_file(job.id)
+                logger.info(f"Job {job.id}: completed. Resource ID: {job.resource_id}")
+
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            await session.rollback()
+            await _fail_job(session, job_id, e)
+
+
+async def _fail_job(session, job_id: UUID, error: Exception):
+    job = await session.get(IngestionJob, job_id)
+    if job is None:
+        return
+    restored = False
+    if job.action == "update":
+        # Put the resource back to its old content: drop the chunks this job
+        # already added and keep the documents it would have removed.
+        added = [content_hash(chunk) for chunk in (job.chunks or [])[:job.chunks_embedded]]
+        if job.resource_id is not None and added:
+            for start in range(0, len(added), _DELETE_BATCH_SIZE):
+                await session.execute(delete(Document).where(
+                    Document.resource_id == job.resource_id,
+                    Document.content_hash.in_(added[start:start + _DELETE_BATCH_SIZE]),
+                ))
+            restored = True
+    elif job.resource_id is not None:
+        # Don't leave a Resource behind with partial (or no) documents.
+        await session.execute(delete(Resource).where(Resource.id == job.resource_id))
+        job.resource_id = None
+    job.stage = "failed"
+    job.error = str(error) if isinstance(error, ValueError) else "Ingestion failed"
+    job.content = None
+    job.chunks = None
+    job.stale_document_ids = None
+    await session.commit()
+    if restored:
+        documents_changed(str(job.resource_id))
+    if job.type == "pdf":
+        _remove_spool_file(job.id)
+
+
+async def enqueue_job(job_id: UUID):
+    if job_id in _local_jobs:
+        return
+    _local_jobs.add(job_id)
+    await _queue.put(job_id)
+
+
+async def _claim(job_id: UUID) -> bool:
+    async with get_sessionmaker()() as session:
+        claimed = await session.scalar(
+            _CLAIM_SQL,
+            {"job_id": job_id, "owner": WORKER_ID, "lease_seconds": settings.ingestion_lease_seconds},
+        )
+        await session.commit()
+    return claimed is not None
+
+
+async def _keep_lease(job_id: UUID, job_task: asyncio.Task):
+    """Renew the job's lease while it runs; stop the job if it was lost."""
+    while True:
+        await asyncio.sleep(settings.ingestion_lease_seconds / 3)
+        try:
+            async with get_sessionmaker()() as session:
+                renewed = await session.scalar(
+                    _RENEW_SQL,
+                    {"job_id": job_id, "owner": WORKER_ID, "lease_seconds": settings.ingestion_lease_seconds},
+                )
+                await session.commit()
+        except Exception as e:
+            logger.warning(f"Job {job_id}: could not renew lease: {e}")
+            continue
+        if renewed is None:
+            logger.error(f"Job {job_id}: lease taken over by another worker, stopping")
+            job_task.cancel()
+            return
+
+
+async def _run_leased(job_id: UUID):
+    if not await _claim(job_id):
+        logger.info(f"Job {job_id} is finished or held by another worker; skipping")
+        return
+
+    # Ingestion waits for provider capacity instead of failing the job
+    # when interactive traffic has the gateway busy.
+    with background_calls():
+        job_task = asyncio.create_task(run_job(job_id))
+    lease = asyncio.create_task(_keep_lease(job_id, job_task))
+    try:
+        await job_task
+    except asyncio.CancelledError:
+        # Re-raise when the worker itself is stopping; a lost lease only
+        # ends this job.
+        if asyncio.current_task().cancelling():
+            raise
+    finally:
+        lease.cancel()
+
+
+async def _worker(index: int):
+    while True:
+        job_id = await _queue.get()
+        try:
+            await _run_leased(job_id)
+        except Exception as e:
+            logger.error(f"Ingestion worker {index} crashed on job {job_id}: {e}")
+        finally:
+            _local_jobs.discard(job_id)
+            _queue.task_done()
+
+
+async def _sweep_unleased_jobs():
+    """Queue unfinished jobs that no live worker holds: jobs of a process
+    that restarted or died, once their lease runs out."""
+    while True:
+        try:
+            async with get_sessionmaker()() as session:
+                result = await session.execute(
+                    select(IngestionJob.id)
+                    .where(
+                        IngestionJob.stage.not_in(TERMINAL_STAGES),
+                        (IngestionJob.lease_until.is_(None)) | (IngestionJob.lease_until < func.now()),
+                    )
+                    .order_by(IngestionJob.created_at.asc())
+                )
+                pending = [job_id for job_id in result.scalars().all() if job_id not in _local_jobs]
+            if pending:
+                logger.info(f"Resuming {len(pending)} unfinished ingestion jobs")
+            for job_id in pending:
+                await enqueue_job(job_id)
+        except Exception as e:
+            logger.error(f"Could not resume ingestion jobs: {e}")
+        await asyncio.sleep(settings.ingestion_lease_seconds)
+
+
+async def start_workers():
+    os.makedirs(settings.ingestion_spool_dir, exist_ok=True)
+    for index in range(max(1, settings.ingestion_workers)):
+        _workers.append(asyncio.create_task(_worker(index)))
+    _workers.append(asyncio.create_task(_sweep_unleased_jobs()))
+
+
+async def stop_workers():
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
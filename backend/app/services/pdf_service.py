@@ -1,15 +1,76 @@
+import asyncio
 import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator
 import fitz  # PyMuPDF
+from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
-async def extract_pdf_text(file_bytes: bytes) -> str:
+_executor: ProcessPoolExecutor | None = None
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=max(1, settings.pdf_extract_workers))
+    return _executor
+
+
+def shutdown_pdf_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _page_count(path: str) -> int:
+    with fitz.open(path) as doc:
+        return doc.page_count
+
+
+def _extract_page_range(path: str, start: int, stop: int) -> list[str]:
+    # Runs in a worker process; each worker opens the file itself so only
+    # the path and the extracted text cross the process boundary.
+    with fitz.open(path) as doc:
+        return [doc.load_page(number).get_text() for number in range(start, stop)]
+
+
+async def iter_pdf_pages(path: str) -> AsyncIterator[str]:
+    """Yield the text of each page of the PDF at ``path``, in page order.
+
+    Page ranges are parsed in a process pool. Only a bounded window of ranges
+    is in flight at once, so memory stays flat however long the document is.
+    """
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
     try:
-        doc = fitz.open(stream=file_bytes, filetype="pdf")
-        text = ""
-        for page in doc:
-            text += page.get_text() + " "
-        return text.strip()
+        page_count = await asyncio.to_thread(_page_count, path)
+    except Exception as e:
+        logger.error(f"Error opening PDF: {e}")
+        raise ValueError("Failed to extract text from PDF.")
+
+    step = max(1, settings.pdf_pages_per_task)
+    ranges = deque((start, min(start + step, page_count)) for start in range(0, page_count, step))
+    window = max(1, settings.pdf_extract_workers) * 2
+    in_flight: deque[asyncio.Future] = deque()
+
+    try:
+        while ranges or in_flight:
+            while ranges and len(in_flight) < window:
+                start, stop = ranges.popleft()
+                in_flight.append(loop.run_in_executor(executor, _extract_page_range, path, start, stop))
+            for page_text in await in_flight.popleft():
+                yield page_text
     except Exception as e:
         logger.error(f"Error extracting PDF: {e}")
         raise ValueError("Failed to extract text from PDF.")
+    finally:
+        for future in in_flight:
+            future.cancel()
+
+
+async def extract_pdf_text(path: str) -> str:
+    pages = [page_text async for page_text in iter_pdf_pages(path)]
+    return " ".join(pages).strip()
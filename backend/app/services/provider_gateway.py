@@ -0,0 +1,328 @@
+import asyncio
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable
+import openai
+from app.client import async_client
+from app.core.config import settings
+from app.core.metrics import observe_stage
+
+logger = logging.getLogger(__name__)
+
+# Transient failures worth another attempt; anything else (bad request,
+# auth, ...) would fail the same way again.
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+
+# Retry tokens available at start-up and at most, whatever the request volume.
+_RETRY_BUDGET_INITIAL = 10.0
+_RETRY_BUDGET_MAX = 100.0
+
+# Set for background work (ingestion), which should wait its turn rather
+# than be rejected like an interactive request.
+_background: ContextVar[bool] = ContextVar("provider_background", default=False)
+
+
+@contextmanager
+def background_calls():
+    """Provider calls made inside the block wait for admission without a
+    deadline and are never rejected for a full queue."""
+    token = _background.set(True)
+    try:
+        yield
+    finally:
+        _background.reset(token)
+
+
+class ProviderBusyError(Exception):
+    """A provider call was not admitted in time. Routes answer with 503."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """``rate`` calls per second with bursts of up to ``capacity``.
+
+    ``reserve`` takes a token straight away, letting the balance go negative,
+    and returns how long the caller has to wait for it. Waiters are thereby
+    served in arrival order without a lock or a wake-up loop.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def reserve(self) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def refund(self):
+        self.tokens += 1
+
+
+class _ModelSlots:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.semaphore = asyncio.Semaphore(limit)
+        self.in_flight = 0
+        self.queued = 0
+
+
+class _StreamSlot:
+    """Holds a streamed response's concurrency slot until the stream ends,
+    is closed, or is garbage collected without ever being read."""
+
+    def __init__(self, stream, release: Callable[[], None]):
+        self._stream = stream
+        self._release = release
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        try:
+            async for chunk in self._stream:
+                yield chunk
+        finally:
+            self._free()
+
+    async def close(self):
+        try:
+            await self._stream.close()
+        finally:
+            self._free()
+
+    def _free(self):
+        release, self._release = self._release, None
+        if release is not None:
+            release()
+
+    def __del__(self):
+        self._free()
+
+
+class ProviderGateway:
+    """Admission control and retry policy in front of ``async_client``.
+
+    Every call takes a token from a bucket shared by all models and a slot
+    from its model's concurrency cap. Callers that would wait longer than
+    ``provider_queue_timeout_seconds``, or that find the model's queue full,
+    are rejected with ``ProviderBusyError`` instead of piling up, except
+    inside ``background_calls()``, where they just wait. Rate limit,
+    connection and 5xx errors are retried with exponential backoff and full
+    jitter, as long as the retry budget (a fraction of recent requests)
+    allows. Small embedding calls are hedged: a second identical request is
+    sent when the first has not answered after ``provider_hedge_delay_seconds``.
+    """
+
+    def __init__(self):
+        self._bucket = (
+            TokenBucket(settings.provider_requests_per_second, max(1, settings.provider_burst))
+            if settings.provider_requests_per_second > 0
+            else None
+        )
+        self._slots: dict[str, _ModelSlots] = {}
+        self._retry_tokens = _RETRY_BUDGET_INITIAL
+        self.requests = 0
+        self.retries = 0
+        self.retries_denied = 0
+        self.rejections = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def _slots_for(self, model: str) -> _ModelSlots:
+        slots = self._slots.get(model)
+        if slots is None:
+            limit = settings.provider_model_concurrency.get(model, settings.provider_default_concurrency)
+            slots = self._slots[model] = _ModelSlots(max(1, limit))
+        return slots
+
+    def _reject(self, model: str, reason: str) -> ProviderBusyError:
+        self.rejections += 1
+        logger.warning(f"Rejected {model} call: {reason}")
+        return ProviderBusyError(f"The AI provider is busy ({reason}), try again shortly", retry_after=1.0)
+
+    async def _admit(self, model: str) -> _ModelSlots:
+        slots = self._slots_for(model)
+        background = _background.get()
+        if not background and slots.queued >= settings.provider_max_queue:
+            raise self._reject(model, "queue full")
+
+        deadline = time.monotonic() + settings.provider_queue_timeout_seconds
+        started = time.perf_counter()
+        slots.queued += 1
+        try:
+            if self._bucket is not None:
+                delay = self._bucket.reserve()
+                if not background and delay > settings.provider_queue_timeout_seconds:
+                    # Rejecting now is better than a wait that ends in a timeout anyway.
+                    self._bucket.refund()
+                    raise self._reject(model, "rate limit")
+                if delay:
+                    await asyncio.sleep(delay)
+            if background:
+                await slots.semaphore.acquire()
+            else:
+                try:
+                    await asyncio.wait_for(slots.semaphore.acquire(), timeout=max(0.0, deadline - time.monotonic()))
+                except asyncio.TimeoutError:
+                    raise self._reject(model, "concurrency limit")
+        finally:
+            slots.queued -= 1
+            observe_stage("provider_queue", time.perf_counter() - started)
+        slots.in_flight += 1
+        return slots
+
+    async def _try_admit(self, model: str) -> _ModelSlots | None:
+        """A slot for a hedge, only if one is free without waiting."""
+        slots = self._slots_for(model)
+        if slots.semaphore.locked() or slots.queued:
+            return None
+        if self._bucket is not None:
+            if self._bucket.reserve() > 0:
+                self._bucket.refund()
+                return None
+        # Returns at once: a permit is free and nobody is waiting for one.
+        await slots.semaphore.acquire()
+        slots.in_flight += 1
+        return slots
+
+    @staticmethod
+    def _release(slots: _ModelSlots):
+        slots.in_flight -= 1
+        slots.semaphore.release()
+
+    def _take_retry_token(self) -> bool:
+        if self._retry_tokens < 1:
+            self.retries_denied += 1
+            return False
+        self._retry_tokens -= 1
+        return True
+
+    @staticmethod
+    def _backoff(attempt: int, error: Exception) -> float:
+        delay = random.uniform(0, min(settings.provider_backoff_max_seconds, settings.provider_backoff_base_seconds * 2 ** attempt))
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                delay = max(delay, min(float(retry_after), settings.provider_backoff_max_seconds))
+            except ValueError:
+                pass
+        return delay
+
+    async def _call(self, model: str, request: Callable[[], Awaitable], stream: bool = False):
+        self.requests += 1
+        self._retry_tokens = min(_RETRY_BUDGET_MAX, self._retry_tokens + settings.provider_retry_budget_ratio)
+        attempt = 0
+        while True:
+            slots = await self._admit(model)
+            try:
+                result = await request()
+            except RETRYABLE_ERRORS as e:
+                self._release(slots)
+                if attempt >= settings.provider_max_retries or not self._take_retry_token():
+                    raise
+                delay = self._backoff(attempt, e)
+                attempt += 1
+                self.retries += 1
+                logger.warning(f"{model} call failed ({type(e).__name__}), retry {attempt} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                self._release(slots)
+                raise
+            if stream:
+                return _StreamSlot(result, lambda: self._release(slots))
+            self._release(slots)
+            return result
+
+    async def _hedged(self, model: str, request: Callable[[], Awaitable]):
+        primary = asyncio.ensure_future(request())
+        tasks = [primary]
+        hedge_slots = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=settings.provider_hedge_delay_seconds)
+            if done:
+                return primary.result()
+            hedge_slots = await self._try_admit(model)
+            if hedge_slots is None:
+                return await primary
+
+            self.hedges += 1
+            hedge = asyncio.ensure_future(request())
+            tasks.append(hedge)
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if hedge_slots is not None:
+                self._release(hedge_slots)
+
+    async def embeddings(self, **kwargs):
+        """``async_client.embeddings.create`` under the gateway's policy."""
+        model = kwargs["model"]
+        inputs = kwargs.get("input")
+        hedge = (
+            settings.provider_hedge_delay_seconds > 0
+            and len(inputs if isinstance(inputs, list) else [inputs]) <= settings.provider_hedge_max_inputs
+        )
+
+        async def request():
+            if hedge:
+                return await self._hedged(model, lambda: async_client.embeddings.create(**kwargs))
+            return await async_client.embeddings.create(**kwargs)
+
+        return await self._call(model, request)
+
+    async def chat(self, **kwargs):
+        """``async_client.chat.completions.create`` under the gateway's policy.
+
+        Only opening the request is retried. A streamed response keeps its
+        concurrency slot until it has been read to the end or closed.
+        """
+        model = kwargs["model"]
+        return await self._call(
+            model,
+            lambda: async_client.chat.completions.create(**kwargs),
+            stream=bool(kwargs.get("stream")),
+        )
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "retries_denied": self.retries_denied,
+            "retry_budget": round(self._retry_tokens, 2),
+            "rejections": self.rejections,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "rate_limit_tokens": round(self._bucket.tokens, 2) if self._bucket is not None else None,
+            "models": {
+                model: {"limit": slots.limit, "in_flight": slots.in_flight, "queued": slots.queued}
+                for model, slots in self._slots.items()
+            },
+        }
+
+
+provider_gateway = ProviderGateway()
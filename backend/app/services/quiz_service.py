@@ -1,65 +1,107 @@
 import logging
+import uuid
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from app.client import async_client
+from app.services.provider_gateway import ProviderBusyError, provider_gateway
+from app.core.config import settings
+from app.core.metrics import timed
+from app.database import get_sessionmaker
 
-import json
+import orjson
 from app.models.models import Document, Quiz
+from app.services.retrieval_service import documents_resource_id
+from app.services.single_flight import single_flight
+from app.services.study_generation import map_reduce_generate, resource_content_version
 
 logger = logging.getLogger(__name__)
 
-openai_client = async_client
 
-async def generate_quiz(resource_id: str, session: AsyncSession) -> list[dict]:
-    # 1. Retrieve all text associated with this resource
-    result = await session.execute(select(Document).where(Document.resource_id == resource_id))
-    documents = result.scalars().all()
-    
-    if not documents:
-        raise ValueError("No content found for this resource")
-        
-    full_text = "\n\n".join([doc.chunk_text for doc in documents])
-    
-    if len(full_text) > 50000:
-         full_text = full_text[:50000] # truncate safely for example
+DEFAULT_QUIZ_COUNT = 8
 
-    system_prompt = """
-    Generate 5-10 multiple choice questions based on the provided content.
+SYSTEM_PROMPT = """
+    Generate {count} multiple choice questions based on the provided content.
     Each question must:
     - Have 4 options
     - Only one correct answer
     - Be conceptually challenging
     
     Return strictly valid JSON in the exact format:
-    [{"question": "...", "options": ["A", "B", "C", "D"], "correct_answer": "B"}]
+    [{{"question": "...", "options": ["A", "B", "C", "D"], "correct_answer": "B"}}]
     Return JSON object with key 'quizzes'.
     """
-    
-    try:
-        response = await openai_client.chat.completions.create(
+
+
+async def _quizzes_from_text(text: str, count: int) -> list[dict]:
+    with timed("llm_completion"):
+        response = await provider_gateway.chat(
              model="openai/gpt-4o-mini",
              response_format={ "type": "json_object" },
              messages=[
-                 {"role": "system", "content": system_prompt},
-                 {"role": "user", "content": f"Content:\n{full_text}\n\nReturn JSON object with key 'quizzes'."}
+                 {"role": "system", "content": SYSTEM_PROMPT.format(count=count)},
+                 {"role": "user", "content": f"Content:\n{text}\n\nReturn JSON object with key 'quizzes'."}
              ]
         )
-        
-        content = response.choices[0].message.content
-        if not content:
-            raise ValueError("Empty response from AI")
-            
-        data = json.loads(content)
-        quizzes_data = data.get("quizzes", [])
-        
+
+    content = response.choices[0].message.content
+    if not content:
+        raise ValueError("Empty response from AI")
+
+    return _parse_quizzes(content)
+
+
+def _parse_quizzes(content: str) -> list[dict]:
+    data = orjson.loads(content)
+    return [
+        {"question": q["question"], "options": q["options"], "correct_answer": q["correct_answer"]}
+        for q in data.get("quizzes", [])
+    ]
+
+
+async def _latest_quizzes(session: AsyncSession, resource_id: str, version: str) -> list[dict]:
+    latest_set = (
+        select(Quiz.set_id)
+        .where(Quiz.resource_id == resource_id, Quiz.content_version == version)
+        .order_by(Quiz.created_at.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    result = await session.execute(
+        select(Quiz.question, Quiz.options, Quiz.correct_answer)
+        .where(Quiz.resource_id == resource_id, Quiz.set_id == latest_set)
+        .order_by(Quiz.position.asc(), Quiz.id.asc())
+    )
+    return [
+        {"question": question, "options": options, "correct_answer": correct_answer}
+        for question, options, correct_answer in result.all()
+    ]
+
+
+async def _generate_and_store(resource_id: str, documents_id: str, version: str, count: int) -> list[dict]:
+    # Runs detached from the request (see single_flight), so it uses its own session.
+    async with get_sessionmaker()() as session:
+        # 1. Retrieve all text associated with this resource
+        result = await session.execute(select(Document.chunk_text).where(Document.resource_id == documents_id))
+        chunks = result.scalars().all()
+
+        # 2. Generate over the whole resource, or over a truncated prefix in single mode
+        if settings.study_generation_mode == "map_reduce":
+            quizzes_data = await map_reduce_generate(chunks, count, _quizzes_from_text)
+        else:
+            full_text = "\n\n".join(chunks)[:50000]
+            quizzes_data = await _quizzes_from_text(full_text, count)
+
         # 3. Save to database
+        set_id = uuid.uuid4()
         new_quizzes = []
-        for q in quizzes_data:
+        for position, q in enumerate(quizzes_data):
             item = Quiz(
                 resource_id=resource_id, 
+                set_id=set_id,
+                content_version=version,
                 question=q["question"], 
                 options=q["options"], 
-                correct_answer=q["correct_answer"]
+                correct_answer=q["correct_answer"],
+                position=position,
             )
             session.add(item)
             new_quizzes.append({
@@ -67,10 +109,38 @@ async def generate_quiz(resource_id: str, session: AsyncSession) -> list[dict]:
                 "options": item.options, 
                 "correct_answer": item.correct_answer
             })
-            
+
         await session.commit()
         return new_quizzes
-        
+
+
+async def generate_quiz(
+    resource_id: str,
+    session: AsyncSession,
+    count: int | None = None,
+    regenerate: bool = False,
+) -> list[dict]:
+    """Return the stored quiz for the resource's current content, generating
+    (and storing) a new one when there is none or ``regenerate`` is set.
+    Concurrent identical requests share a single generation."""
+    documents_id = await documents_resource_id(session, resource_id)
+    version = await resource_content_version(session, documents_id)
+    if version is None:
+        raise ValueError("No content found for this resource")
+
+    if not regenerate:
+        stored = await _latest_quizzes(session, resource_id, version)
+        if stored and (count is None or len(stored) >= count):
+            return stored[:count]
+
+    count = count or DEFAULT_QUIZ_COUNT
+    try:
+        return await single_flight(
+            ("quizzes", str(resource_id), version, count),
+            lambda: _generate_and_store(resource_id, documents_id, version, count),
+        )
+    except ProviderBusyError:
+        raise
     except Exception as e:
         logger.error(f"Failed to generate quiz: {e}")
         raise ValueError("AI Quiz generation failed")
@@ -1,71 +1,119 @@
+import asyncio
 import logging
+from typing import Awaitable
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text
-from app.services.embedding_service import create_embedding
-from app.client import async_client
-from app.models.models import ChatHistory
+from app.services.chat_cache import answer_cache, get_query_embedding
+from app.services.history_writer import history_writer
+from app.services.retrieval_service import search_resource_chunks
+from app.services.sse import HEARTBEAT, format_event, with_heartbeats
+from app.services.stage_timer import StageTimer
+from app.services.provider_gateway import ProviderBusyError, provider_gateway
+from app.core.config import settings
+from app.core.metrics import CHAT_TOTAL_SECONDS, CHAT_TTFT_SECONDS
 
 logger = logging.getLogger(__name__)
 
-openai_client = async_client
 
+CHAT_MODEL = "openai/gpt-4o-mini"
 
-def _novel_suffix(existing: str, incoming: str) -> str:
-    if not incoming:
-        return ""
-    if not existing:
-        return incoming
-    if incoming in existing or existing.endswith(incoming):
-        return ""
-    if incoming.startswith(existing):
-        return incoming[len(existing):]
 
-    max_overlap = min(len(existing), len(incoming))
-    for overlap in range(max_overlap, 0, -1):
-        if existing.endswith(incoming[:overlap]):
-            return incoming[overlap:]
+class DeltaNormalizer:
+    """Turns provider stream chunks into true deltas.
 
-    return incoming
+    Chunks are normally new text only and pass through untouched: two equal
+    chunks in a row ("000", "!") are real text. Models listed in
+    ``stream_cumulative_models`` resend the whole answer so far in every
+    chunk instead; for those, a chunk that starts with the full text emitted
+    so far only contributes what follows it, so resent chunks add nothing.
+    """
+
+    def __init__(self, cumulative: bool = False):
+        self.cumulative = cumulative
+        self.length = 0
+        self._emitted = ""
+
+    def push(self, incoming: str) -> str:
+        delta = incoming
+        if self.cumulative:
+            if incoming.startswith(self._emitted):
+                delta = incoming[len(self._emitted):]
+            self._emitted += delta
+        self.length += len(delta)
+        return delta
+
+
+async def generate_chat_response(
+    query: str,
+    resource_id: str,
+    session: AsyncSession,
+    query_embedding: Awaitable[list[float]] | None = None,
+    timer: StageTimer | None = None,
+    documents_id: str | None = None,
+):
+    """Answer ``query`` from the resource's content as a Server-Sent Events stream.
+
+    The stream carries ``message`` events with ``{"text": delta}``, SSE
+    comment heartbeats while the model is silent, and a final ``done`` event
+    with token usage and per-stage timings (or an ``error`` event).
+
+    Callers that already started embedding the query (to overlap it with
+    their own checks) pass the pending result as ``query_embedding``.
+    ``documents_id`` is the id the resource's documents are stored under when
+    it shares another resource's content; it defaults to ``resource_id``.
+    Retrieval and the answer cache are keyed by it, so resources sharing
+    content share cached answers too.
+    """
+    timer = timer or StageTimer()
+    documents_id = documents_id or resource_id
 
-async def generate_chat_response(query: str, resource_id: str, session: AsyncSession):
     # 1. Create embedding for the user query
-    query_vector = create_embedding(query)
-    vector_str = f"[{','.join(map(str, query_vector))}]"
-    
+    if query_embedding is None:
+        query_embedding = timer.timed("embed", get_query_embedding(query))
+    query_vector = await query_embedding
+
+    if settings.answer_cache_enabled:
+        with timer.stage("answer_cache"):
+            cached_answer = answer_cache.lookup(documents_id, query_vector)
+        if cached_answer is not None:
+            logger.info(f"Semantic answer cache hit for resource {resource_id}")
+            await history_writer.write(resource_id, "user", query)
+
+            async def cached_stream():
+                timer.first_token()
+                yield format_event({"text": cached_answer}, event_id=1)
+                # Before ``done``: a client that disconnects once it has the
+                # answer closes the generator at that yield.
+                await history_writer.write(resource_id, "assistant", cached_answer)
+                yield format_event(
+                    {"usage": None, "cached": True, "timing": _finish(timer, resource_id)},
+                    event="done",
+                    event_id=2,
+                )
+
+            return cached_stream()
+
     # 2. Perform similarity search (Postgres pgvector)
-    # Using cosine similarity (<=>) to get top 5 chunks
-    sql = text("""
-        SELECT chunk_text
-        FROM (
-            SELECT
-                chunk_text,
-                MIN(embedding <=> CAST(:vector AS vector)) AS distance
-            FROM documents
-            WHERE resource_id = :resource_id
-            GROUP BY chunk_text
-        ) ranked
-        ORDER BY distance
-        LIMIT 5;
-    """)
-    result = await session.execute(sql, {"resource_id": resource_id, "vector": vector_str})
-    chunks = result.scalars().all()
+    # Using cosine distance (<=>) to get top 5 chunks
+    with timer.stage("retrieve"):
+        chunks = await search_resource_chunks(session, documents_id, query_vector, limit=5)
     
     context = "\n\n".join(chunks)
 
     if not context.strip():
         async def empty_context_stream():
-            yield (
-                "I couldn't find enough extracted content for this resource yet. "
-                "Try re-processing the resource, then ask again."
+            yield format_event(
+                {
+                    "text": (
+                        "I couldn't find enough extracted content for this resource yet. "
+                        "Try re-processing the resource, then ask again."
+                    )
+                },
+                event_id=1,
             )
+            yield format_event({"usage": None, "timing": _finish(timer, resource_id)}, event="done", event_id=2)
         return empty_context_stream()
     
-    # 3. Save user message to history
-    user_msg = ChatHistory(resource_id=resource_id, role="user", message=query)
-    session.add(user_msg)
-    await session.commit()
-    
-    # 4. Interact with OpenAI (Streaming)
+    # 3. Interact with OpenAI (Streaming)
     system_prompt = (
         "You are Lumeris, an AI learning assistant. "
         "Answer using only the provided context. "
@@ -77,48 +125,81 @@ async def generate_chat_response(query: str, resource_id: str, session: AsyncSes
     )
     
     try:
-        response = await openai_client.chat.completions.create(
-            model="openai/gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Context:\n{context}\n\nQuestion: {query}"}
-            ],
-            stream=True
+        # The user message is buffered for the history writer while the
+        # request to the model is in flight.
+        response, _ = await asyncio.gather(
+            timer.timed(
+                "llm_connect",
+                provider_gateway.chat(
+                    model=CHAT_MODEL,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": f"Context:\n{context}\n\nQuestion: {query}"}
+                    ],
+                    stream=True,
+                    stream_options={"include_usage": True},
+                ),
+            ),
+            history_writer.write(resource_id, "user", query),
         )
         
-        full_response = ""
-        last_raw_chunk = ""
-        
         # Yield generator for streaming, but we should collect it for the DB
         async def stream_generator():
-            nonlocal full_response, last_raw_chunk
-            async for chunk in response:
-                content = chunk.choices[0].delta.content
-                if not content:
-                    continue
-
-                # Some providers may send repeated or cumulative chunk text.
-                # Normalize to true delta before emitting to client.
-                delta = _novel_suffix(full_response, content)
-                if content == last_raw_chunk:
-                    continue
-
-                last_raw_chunk = content
-
-                if delta:
-                    full_response += delta
-                    yield delta
-                    
-            # Save assistant response after streaming finishes
+            normalizer = DeltaNormalizer(cumulative=CHAT_MODEL in settings.stream_cumulative_models)
+            parts: list[str] = []
+            usage = None
+            event_id = 0
+
             try:
-                assistant_msg = ChatHistory(resource_id=resource_id, role="assistant", message=full_response)
-                session.add(assistant_msg)
-                await session.commit()
+                async for chunk in with_heartbeats(response, settings.stream_heartbeat_seconds):
+                    if chunk is None:
+                        yield HEARTBEAT
+                        continue
+                    if chunk.usage is not None:
+                        usage = chunk.usage.model_dump()
+                    if not chunk.choices:
+                        continue
+                    delta = normalizer.push(chunk.choices[0].delta.content or "")
+                    if not delta:
+                        continue
+
+                    timer.first_token()
+                    parts.append(delta)
+                    event_id += 1
+                    yield format_event({"text": delta}, event_id=event_id)
             except Exception as e:
-                logger.error(f"Failed to save assistant response: {e}")
+                logger.error(f"OpenAI stream error: {e}")
+                yield format_event({"error": "Failed to generate response"}, event="error", event_id=event_id + 1)
+                return
+
+            full_response = "".join(parts)
+            if settings.answer_cache_enabled:
+                answer_cache.store(documents_id, query_vector, full_response)
+
+            # Saved before ``done``, which may be the last event a client
+            # waits for before it disconnects and the generator is closed.
+            await history_writer.write(resource_id, "assistant", full_response)
+
+            yield format_event(
+                {"usage": usage, "timing": _finish(timer, resource_id)},
+                event="done",
+                event_id=event_id + 1,
+            )
 
         return stream_generator()
         
+    except ProviderBusyError:
+        raise
     except Exception as e:
         logger.error(f"OpenAI error: {e}")
         raise ValueError("Failed to generate response")
+
+
+def _finish(timer: StageTimer, resource_id: str) -> dict:
+    summary = timer.summary()
+    if settings.metrics_enabled:
+        if summary["ttft_ms"] is not None:
+            CHAT_TTFT_SECONDS.observe(summary["ttft_ms"] / 1000)
+        CHAT_TOTAL_SECONDS.observe(summary["total_ms"] / 1000)
+    logger.info(f"Chat timings for resource {resource_id}: {summary}")
+    return summary
@@ -0,0 +1,195 @@
+import asyncio
+import logging
+from datetime import timedelta
+from functools import lru_cache
+import numpy as np
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import Text, delete, func, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.core.config import settings
+from app.core.metrics import timed
+from app.database import get_sessionmaker
+from app.models.models import Resource, ResourceContentMove
+from app.services.chat_cache import answer_cache
+from app.services.embedding_service import get_embedding_provider
+from app.services.vector_index import vector_index
+
+logger = logging.getLogger(__name__)
+
+# Nearest chunks within one resource. Chunks are deduplicated at ingest
+# (unique resource_id + content_hash), so no GROUP BY is needed and the
+# planner can walk the HNSW index, filtering on resource_id as it goes.
+# The outer ORDER BY restores exact order after a relaxed iterative scan.
+SEARCH_SQL = text("""
+    WITH candidates AS MATERIALIZED (
+        SELECT chunk_text, embedding <=> CAST(:vector AS vector) AS distance
+        FROM documents
+        WHERE resource_id = :resource_id AND embedding_model = :model
+        ORDER BY distance
+        LIMIT :limit
+    )
+    SELECT chunk_text FROM candidates ORDER BY distance;
+""")
+
+
+# Compact modes walk an HNSW index built over a quantized expression of the
+# full-precision column (see migrations/006), fetch ``oversample`` times as
+# many candidates with their exact embeddings, and rerank them in NumPy.
+_COMPACT_ORDER_BY = {
+    "halfvec": "embedding::halfvec({d}) <=> CAST(:vector AS halfvec({d}))",
+    "binary": "binary_quantize(embedding)::bit({d}) <~> binary_quantize(CAST(:vector AS vector({d})))",
+}
+
+
+@lru_cache(maxsize=None)
+def compact_search_sql(storage: str, dimensions: int):
+    if storage not in _COMPACT_ORDER_BY:
+        raise ValueError("VECTOR_STORAGE must be 'full', 'halfvec' or 'binary'")
+    order_by = _COMPACT_ORDER_BY[storage].format(d=dimensions)
+    return text(f"""
+        SELECT chunk_text, embedding
+        FROM documents
+        WHERE resource_id = :resource_id AND embedding_model = :model
+        ORDER BY {order_by}
+        LIMIT :limit
+    """).columns(chunk_text=Text, embedding=Vector(dimensions))
+
+
+def rerank(chunks: list[str], embeddings: list, query_vector: list[float], limit: int) -> list[str]:
+    """Exact cosine top-``limit`` of the candidate chunks."""
+    if not chunks:
+        return []
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    query = np.asarray(query_vector, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query) or 1.0)
+    norms[norms == 0] = 1.0
+    scores = (matrix @ query) / norms
+    return [chunks[i] for i in np.argsort(-scores, kind="stable")[:limit]]
+
+
+def vector_literal(vector: list[float]) -> str:
+    return f"[{','.join(map(str, vector))}]"
+
+
+async def configure_vector_search(session: AsyncSession, candidates: int = 0):
+    """Apply per-transaction HNSW settings for a filtered search.
+
+    ``ef_search`` is raised to ``candidates`` when more rows than that are
+    wanted, since HNSW never returns more than ``ef_search`` rows.
+    """
+    if settings.hnsw_iterative_scan != "off":
+        await session.execute(
+            text("SELECT set_config('hnsw.iterative_scan', :mode, true)"),
+            {"mode": settings.hnsw_iterative_scan},
+        )
+    await session.execute(
+        text("SELECT set_config('hnsw.ef_search', :ef_search, true)"),
+        {"ef_search": str(max(settings.hnsw_ef_search, candidates))},
+    )
+
+
+def documents_resource_id_expr():
+    """SQL expression for the id a resource's documents are stored under
+    (its own, or the resource it shares YouTube content with)."""
+    return func.coalesce(Resource.content_resource_id, Resource.id)
+
+
+async def documents_resource_id(session: AsyncSession, resource_id: str) -> str:
+    documents_id = await session.scalar(
+        select(documents_resource_id_expr()).where(Resource.id == resource_id)
+    )
+    return str(documents_id or resource_id)
+
+
+def documents_changed(resource_id: str):
+    """Drop everything derived from a resource's documents after they change."""
+    vector_index.invalidate(resource_id)
+    answer_cache.invalidate(resource_id)
+
+
+# Moves are re-read for this long, so one committed late, behind a newer
+# one, is still seen; and kept in the table for a day.
+_MOVES_WINDOW_POLLS = 10
+_MOVES_RETENTION = timedelta(days=1)
+
+
+async def watch_content_moves():
+    """Drop this process's caches for resources whose documents were handed
+    to another resource when their owner was deleted (migrations/011), no
+    matter which process or session deleted it."""
+    seen: set[int] = set()
+    while True:
+        try:
+            window = timedelta(seconds=settings.content_moves_poll_seconds * _MOVES_WINDOW_POLLS)
+            async with get_sessionmaker()() as session:
+                result = await session.execute(
+                    select(
+                        ResourceContentMove.id,
+                        ResourceContentMove.old_resource_id,
+                        ResourceContentMove.new_resource_id,
+                    ).where(ResourceContentMove.moved_at > func.now() - window)
+                )
+                moves = result.all()
+                await session.execute(
+                    delete(ResourceContentMove).where(ResourceContentMove.moved_at < func.now() - _MOVES_RETENTION)
+                )
+                await session.commit()
+            for move_id, old_id, new_id in moves:
+                if move_id not in seen:
+                    logger.info(f"Documents of deleted resource {old_id} moved to {new_id}")
+                    documents_changed(str(old_id))
+                    documents_changed(str(new_id))
+            seen = {move_id for move_id, _, _ in moves}
+        except Exception as e:
+            logger.error(f"Could not check for moved documents: {e}")
+        await asyncio.sleep(settings.content_moves_poll_seconds)
+
+
+def warm_resource(resource_id: str):
+    if settings.vector_index_enabled:
+        vector_index.warm(resource_id)
+
+
+async def search_resource_chunks(
+    session: AsyncSession,
+    resource_id: str,
+    query_vector: list[float],
+    limit: int = 5,
+) -> list[str]:
+    if settings.vector_index_enabled:
+        with timed("vector_index_search"):
+            chunks = vector_index.search(resource_id, query_vector, limit)
+        if chunks is not None:
+            return chunks
+
+    provider = get_embedding_provider()
+    if settings.vector_storage == "full":
+        with timed("vector_search"):
+            await configure_vector_search(session)
+            result = await session.execute(
+                SEARCH_SQL,
+                {
+                    "resource_id": resource_id,
+                    "model": provider.model,
+                    "vector": vector_literal(query_vector),
+                    "limit": limit,
+                },
+            )
+            return list(result.scalars().all())
+
+    candidates = limit * max(1, settings.vector_rerank_oversample)
+    with timed("vector_search"):
+        await configure_vector_search(session, candidates)
+        result = await session.execute(
+            compact_search_sql(settings.vector_storage, provider.dimensions),
+            {
+                "resource_id": resource_id,
+                "model": provider.model,
+                "vector": vector_literal(query_vector),
+                "limit": candidates,
+            },
+        )
+        rows = result.all()
+    with timed("vector_rerank"):
+        return rerank([row.chunk_text for row in rows], [row.embedding for row in rows], query_vector, limit)
@@ -0,0 +1,20 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+_in_flight: dict[Hashable, asyncio.Task] = {}
+
+
+async def single_flight(key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+    """Run ``factory()`` once for concurrent callers that share ``key``.
+
+    Callers arriving while a call for ``key`` is in progress wait for and
+    receive that call's result (or exception). The shared call is shielded,
+    so one caller disconnecting doesn't cancel it for the others; it must
+    therefore not depend on a caller's request-scoped resources.
+    """
+    task = _in_flight.get(key)
+    if task is None:
+        task = asyncio.create_task(factory())
+        _in_flight[key] = task
+        task.add_done_callback(lambda _: _in_flight.pop(key, None))
+    return await asyncio.shield(task)
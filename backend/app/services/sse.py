@@ -0,0 +1,42 @@
+import asyncio
+from typing import AsyncIterator, TypeVar
+import orjson
+
+T = TypeVar("T")
+
+HEARTBEAT = ": heartbeat\n\n"
+
+
+def format_event(data: dict, event: str | None = None, event_id: int | None = None) -> str:
+    """Frame one Server-Sent Event. ``data`` is JSON-encoded, so it never
+    contains the newlines that would end the event early."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event is not None:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {orjson.dumps(data).decode()}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def with_heartbeats(source: AsyncIterator[T], interval: float) -> AsyncIterator[T | None]:
+    """Yield items from ``source``, and ``None`` whenever ``interval`` seconds
+    pass without one, so the caller can keep idle connections alive."""
+    iterator = source.__aiter__()
+    pending: asyncio.Task | None = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+            done, _ = await asyncio.wait({pending}, timeout=interval)
+            if not done:
+                yield None
+                continue
+            task, pending = pending, None
+            try:
+                yield task.result()
+            except StopAsyncIteration:
+                return
+    finally:
+        if pending is not None:
+            pending.cancel()
@@ -0,0 +1,42 @@
+import time
+from contextlib import contextmanager
+from app.core.metrics import observe_stage
+
+
+class StageTimer:
+    """Wall-clock durations of the named stages of one request.
+
+    Stages may overlap (e.g. one running in a task while another is awaited
+    inline), so their sum can exceed the total. Each stage is also exported
+    as ``chat_<name>`` to the metrics histograms and Server-Timing.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: dict[str, float] = {}
+        self.first_token_at: float | None = None
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = time.perf_counter() - start
+            observe_stage(f"chat_{name}", self.stages[name])
+
+    async def timed(self, name: str, awaitable):
+        with self.stage(name):
+            return await awaitable
+
+    def first_token(self):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+
+    def summary(self) -> dict:
+        now = time.perf_counter()
+        return {
+            "ttft_ms": round((self.first_token_at - self.started) * 1000, 1) if self.first_token_at else None,
+            "total_ms": round((now - self.started) * 1000, 1),
+            "stages": {name: round(seconds * 1000, 1) for name, seconds in self.stages.items()},
+        }
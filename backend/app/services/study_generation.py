@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import math
+from typing import Awaitable, Callable
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.services.embedding_cache import normalize_chunk
+
+logger = logging.getLogger(__name__)
+
+GenerateFn = Callable[[str, int], Awaitable[list[dict]]]
+
+
+async def resource_content_version(session: AsyncSession, resource_id: str) -> str | None:
+    """Hash of a resource's document set; None when it has no documents.
+
+    Study sets are stored against this value, so they are reused until the
+    resource's content changes.
+    """
+    return await session.scalar(
+        text("""
+            SELECT md5(string_agg(content_hash, ',' ORDER BY content_hash))
+            FROM documents
+            WHERE resource_id = :resource_id
+        """),
+        {"resource_id": resource_id},
+    )
+
+
+def _sample_chunks(chunks: list[str], stride: float) -> list[str]:
+    # Keeps one chunk per ``stride`` times its own length of text, so the
+    # picks are spread evenly from the first chunk to the last.
+    sampled: list[str] = []
+    position = 0.0
+    next_pick = 0.0
+    for chunk in chunks:
+        if position >= next_pick:
+            sampled.append(chunk)
+            next_pick += len(chunk) * stride
+        position += len(chunk)
+    return sampled
+
+
+def _pack_groups(chunks: list[str], max_chars: int) -> list[str]:
+    groups: list[str] = []
+    current: list[str] = []
+    current_chars = 0
+    for chunk in chunks:
+        chunk = chunk[:max_chars]
+        if current and current_chars + len(chunk) > max_chars:
+            groups.append("\n\n".join(current))
+            current = []
+            current_chars = 0
+        current.append(chunk)
+        current_chars += len(chunk)
+    if current:
+        groups.append("\n\n".join(current))
+    return groups
+
+
+def build_groups(chunks: list[str]) -> list[str]:
+    """Split a resource's chunks into at most ``study_max_groups`` prompts.
+
+    Groups are contiguous runs of chunks of up to ``study_group_max_chars``.
+    When the resource is larger than that budget allows, chunks are sampled
+    evenly across the whole resource instead of keeping only the start. The
+    sampling stride is widened until the packed groups fit, since packing
+    leaves some room unused in every group; groups are never cut off the end.
+    """
+    max_chars = settings.study_group_max_chars
+    max_groups = max(1, settings.study_max_groups)
+
+    total_chars = sum(len(chunk) for chunk in chunks)
+    stride = total_chars / (max_chars * max_groups)
+    if stride <= 1:
+        groups = _pack_groups(chunks, max_chars)
+        if len(groups) <= max_groups:
+            return groups
+        stride = 1.0
+
+    while True:
+        groups = _pack_groups(_sample_chunks(chunks, stride), max_chars)
+        if len(groups) <= max_groups:
+            return groups
+        stride *= max(1.05, len(groups) / max_groups)
+
+
+def merge_items(partials: list[list[dict]], count: int) -> list[dict]:
+    """Deduplicate items by question and pick ``count`` of them round-robin,
+    so every part of the resource is represented."""
+    seen: set[str] = set()
+    queues: list[list[dict]] = []
+    for items in partials:
+        unique = []
+        for item in items:
+            key = normalize_chunk(item["question"])
+            if key and key not in seen:
+                seen.add(key)
+                unique.append(item)
+        queues.append(unique)
+
+    merged: list[dict] = []
+    depth = 0
+    while len(merged) < count and any(depth < len(queue) for queue in queues):
+        for queue in queues:
+            if depth < len(queue) and len(merged) < count:
+                merged.append(queue[depth])
+        depth += 1
+    return merged
+
+
+async def map_reduce_generate(chunks: list[str], count: int, generate: GenerateFn) -> list[dict]:
+    """Run ``generate`` over every chunk group concurrently and merge the results.
+
+    ``generate(text, n)`` returns up to ``n`` items with a ``"question"`` key.
+    Groups that fail are skipped; if every group fails the last error is raised.
+    """
+    groups = build_groups(chunks)
+    if len(groups) == 1:
+        return (await generate(groups[0], count))[:count]
+
+    # Ask each group for a few extra items to leave room for deduplication.
+    per_group = math.ceil(count / len(groups)) + 1
+    semaphore = asyncio.Semaphore(max(1, settings.study_generation_concurrency))
+
+    async def run(group: str) -> list[dict]:
+        async with semaphore:
+            return await generate(group, per_group)
+
+    results = await asyncio.gather(*(run(group) for group in groups), return_exceptions=True)
+    partials = [result for result in results if not isinstance(result, BaseException)]
+    failures = [result for result in results if isinstance(result, BaseException)]
+    if failures:
+        logger.warning(f"{len(failures)} of {len(groups)} study generation groups failed: {failures[0]}")
+    if not partials:
+        raise failures[-1]
+    return merge_items(partials, count)
@@ -1,11 +1,18 @@
 import logging
 import re
 import asyncio
+from datetime import datetime, timedelta, timezone
 from urllib.parse import urlparse, parse_qs
 from xml.etree.ElementTree import ParseError
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
 from youtube_transcript_api import (
     YouTubeTranscriptApi, NoTranscriptFound, TranscriptsDisabled, VideoUnavailable
 )
+from app.core.config import settings
+from app.core.metrics import timed
+from app.models.models import TranscriptCache
 
 logger = logging.getLogger(__name__)
 
@@ -22,15 +29,47 @@ def extract_video_id(url: str) -> str:
         return match.group(1)
     raise ValueError("Invalid YouTube URL")
 
-async def get_transcript(url: str) -> str:
+async def get_transcript(url: str, session: AsyncSession | None = None) -> str:
+    """Transcript text for a YouTube URL.
+
+    With a session, transcripts fetched within ``transcript_cache_ttl_seconds``
+    are served from the transcript_cache table and fresh fetches are stored
+    there (flushed with the caller's transaction).
+    """
     video_id = extract_video_id(url)
-    
+    if session is None:
+        return await fetch_transcript(video_id)
+
+    fresh_after = datetime.now(timezone.utc) - timedelta(seconds=settings.transcript_cache_ttl_seconds)
+    cached = await session.scalar(
+        select(TranscriptCache.transcript).where(
+            TranscriptCache.video_id == video_id, TranscriptCache.fetched_at > fresh_after
+        )
+    )
+    if cached is not None:
+        logger.info(f"Transcript cache hit for video {video_id}")
+        return cached
+
+    full_text = await fetch_transcript(video_id)
+    stmt = insert(TranscriptCache).values(
+        video_id=video_id, transcript=full_text, fetched_at=datetime.now(timezone.utc)
+    )
+    await session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["video_id"],
+            set_={"transcript": stmt.excluded.transcript, "fetched_at": stmt.excluded.fetched_at},
+        )
+    )
+    return full_text
+
+async def fetch_transcript(video_id: str) -> str:
     def fetch():
         api = YouTubeTranscriptApi()
         return api.fetch(video_id)
     
     try:
-        transcript_items = await asyncio.to_thread(fetch)
+        with timed("transcript_fetch"):
+            transcript_items = await asyncio.to_thread(fetch)
         full_text = " ".join([item.text for item in transcript_items])
         if not full_text.strip():
             raise ValueError("Transcript is empty")
@@ -44,22 +83,3 @@ async def get_transcript(url: str) -> str:
     except Exception as e:
         logger.error(f"Unexpected error for video {video_id}: {e}")
         raise ValueError("Could not extract transcript from the provided video URL.")
-
-def chunk_text(text: str, max_chars: int = 2000) -> list[str]:
-    # Simple chunking by paragraph or length
-    chunks = []
-    current_chunk = ""
-    
-    sentences = text.replace('\n', ' ').split('. ')
-    for sentence in sentences:
-        if len(current_chunk) + len(sentence) < max_chars:
-            current_chunk += sentence + ". "
-        else:
-            if current_chunk:
-                chunks.append(current_chunk.strip())
-            current_chunk = sentence + ". "
-            
-    if current_chunk:
-        chunks.append(current_chunk.strip())
-        
-    return chunks
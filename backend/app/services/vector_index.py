@@ -0,0 +1,112 @@
+import asyncio
+import logging
+from collections import OrderedDict
+import numpy as np
+from sqlalchemy.future import select
+from app.core.config import settings
+from app.database import get_sessionmaker
+from app.models.models import Document
+from app.services.embedding_service import get_embedding_provider
+
+logger = logging.getLogger(__name__)
+
+
+class _ResourceMatrix:
+    def __init__(self, chunks: list[str], embeddings: np.ndarray):
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        # Rows are stored unit-length so cosine similarity is a single matrix-vector product.
+        self.matrix = np.ascontiguousarray(embeddings / norms, dtype=np.float32)
+        self.chunks = chunks
+        self.nbytes = self.matrix.nbytes + sum(len(chunk) for chunk in chunks)
+
+    def search(self, query_vector: list[float], limit: int) -> list[str]:
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        scores = self.matrix @ query
+        limit = min(limit, len(self.chunks))
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        return [self.chunks[i] for i in top]
+
+
+class VectorIndex:
+    """LRU of per-resource embedding matrices, bounded by a memory budget."""
+
+    def __init__(self, memory_budget_bytes: int):
+        self.memory_budget_bytes = memory_budget_bytes
+        self._resources: OrderedDict[str, _ResourceMatrix] = OrderedDict()
+        self._loading: dict[str, asyncio.Task] = {}
+        self._nbytes = 0
+
+    def search(self, resource_id: str, query_vector: list[float], limit: int) -> list[str] | None:
+        """Top-``limit`` chunks by cosine similarity, or None if not loaded."""
+        entry = self._resources.get(str(resource_id))
+        if entry is None:
+            return None
+        self._resources.move_to_end(str(resource_id))
+        return entry.search(query_vector, limit)
+
+    def put(self, resource_id: str, chunks: list[str], embeddings: np.ndarray):
+        self._evict(str(resource_id))
+        entry = _ResourceMatrix(chunks, embeddings)
+        if entry.nbytes > self.memory_budget_bytes:
+            return
+        self._resources[str(resource_id)] = entry
+        self._nbytes += entry.nbytes
+        while self._nbytes > self.memory_budget_bytes:
+            _, evicted = self._resources.popitem(last=False)
+            self._nbytes -= evicted.nbytes
+
+    def _evict(self, key: str):
+        entry = self._resources.pop(key, None)
+        if entry is not None:
+            self._nbytes -= entry.nbytes
+
+    def invalidate(self, resource_id: str):
+        self._evict(str(resource_id))
+        # A load that started before the change would bring back stale rows.
+        task = self._loading.pop(str(resource_id), None)
+        if task is not None:
+            task.cancel()
+
+    def warm(self, resource_id: str):
+        """Load a resource's embeddings in the background if not resident."""
+        key = str(resource_id)
+        if key in self._resources or key in self._loading:
+            return
+        self._loading[key] = asyncio.create_task(self._load(key))
+
+    async def _load(self, resource_id: str):
+        try:
+            async with get_sessionmaker()() as session:
+                result = await session.execute(
+                    select(Document.chunk_text, Document.embedding).where(
+                        Document.resource_id == resource_id,
+                        Document.embedding_model == get_embedding_provider().model,
+                    )
+                )
+                rows = result.all()
+            if not rows:
+                return
+            chunks = [chunk for chunk, _ in rows]
+            embeddings = np.stack([np.asarray(embedding, dtype=np.float32) for _, embedding in rows])
+            self.put(resource_id, chunks, embeddings)
+            logger.info(f"Loaded {len(chunks)} embeddings for resource {resource_id} into memory")
+        except Exception as e:
+            logger.error(f"Failed to load vector index for resource {resource_id}: {e}")
+        finally:
+            if self._loading.get(resource_id) is asyncio.current_task():
+                del self._loading[resource_id]
+
+    def stats(self) -> dict:
+        return {
+            "resources": len(self._resources),
+            "bytes": self._nbytes,
+            "memory_budget_bytes": self.memory_budget_bytes,
+        }
+
+
+vector_index = VectorIndex(settings.vector_index_memory_budget_mb * 1024 * 1024)
@@ -0,0 +1,75 @@
+"""Throughput of the streaming token chunker against the old character chunker.
+
+Run from ``backend/``::
+
+    python -m benchmarks.bench_chunker --sentences 200000
+
+tiktoken needs the ``cl100k_base`` file in its cache (``TIKTOKEN_CACHE_DIR``)
+when there is no network access.
+"""
+import argparse
+import random
+import time
+from app.services.chunking_service import chunk_text
+
+
+def legacy_chunk_text(text: str, max_chars: int = 2000) -> list[str]:
+    # The sentence/character chunker that transcript_service used before.
+    chunks = []
+    current_chunk = ""
+
+    sentences = text.replace('\n', ' ').split('. ')
+    for sentence in sentences:
+        if len(current_chunk) + len(sentence) < max_chars:
+            current_chunk += sentence + ". "
+        else:
+            if current_chunk:
+                chunks.append(current_chunk.strip())
+            current_chunk = sentence + ". "
+
+    if current_chunk:
+        chunks.append(current_chunk.strip())
+
+    return chunks
+
+
+WORDS = (
+    "gradient descent converges when the learning rate is small enough and the loss "
+    "surface is smooth around the optimum so each update reduces the error"
+).split()
+
+
+def make_text(sentences: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    return " ".join(
+        " ".join(rng.choices(WORDS, k=rng.randint(6, 30))).capitalize() + "."
+        for _ in range(sentences)
+    )
+
+
+def measure(fn, text: str, repeat: int) -> tuple[float, int]:
+    best = float("inf")
+    count = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = len(fn(text))
+        best = min(best, time.perf_counter() - start)
+    return best, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sentences", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    text = make_text(args.sentences)
+    megabytes = len(text.encode("utf-8")) / 1e6
+    print(f"input: {args.sentences} sentences, {megabytes:.1f} MB")
+    for name, fn in (("legacy chunk_text", legacy_chunk_text), ("token chunk_text", chunk_text)):
+        seconds, count = measure(fn, text, args.repeat)
+        print(f"{name:>18}: {seconds:8.3f}s  {megabytes / seconds:7.2f} MB/s  {count} chunks")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Rows per second for the three ways of writing Document rows.
+
+Needs a reachable Postgres with pgvector and the schema applied; it reads
+DATABASE_URL like the app does. Run from ``backend/``::
+
+    python -m benchmarks.bench_document_writer --rows 5000
+
+Each run writes into a temporary ``documents`` table that shadows the real
+one for the duration of a rolled-back transaction, so nothing is persisted.
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from sqlalchemy import text
+from app.core.config import settings
+from app.database import get_sessionmaker
+from app.models.models import Document
+from app.services.document_writer import write_documents
+from app.services.embedding_cache import content_hash
+from app.services.embedding_service import get_embedding_provider
+
+DIMENSIONS = settings.embedding_dimensions
+
+
+def make_rows(count: int, seed: int = 0) -> tuple[list[str], list[list[float]]]:
+    rng = random.Random(seed)
+    chunks = [f"Chunk {i}: " + "lorem ipsum dolor sit amet " * 60 for i in range(count)]
+    vectors = [[rng.uniform(-1, 1) for _ in range(DIMENSIONS)] for _ in range(count)]
+    return chunks, vectors
+
+
+async def orm_add(session, resource_id, chunks, vectors):
+    # What ingestion did before: one ORM object per chunk.
+    for chunk, vector in zip(chunks, vectors):
+        session.add(Document(
+            resource_id=resource_id,
+            chunk_text=chunk,
+            content_hash=content_hash(chunk),
+            embedding_model=get_embedding_provider().model,
+            embedding=vector,
+        ))
+    await session.flush()
+
+
+async def multi_row_insert(session, resource_id, chunks, vectors):
+    settings.document_write_mode = "insert"
+    await write_documents(session, resource_id, chunks, vectors)
+
+
+async def binary_copy(session, resource_id, chunks, vectors):
+    settings.document_write_mode = "copy"
+    await write_documents(session, resource_id, chunks, vectors)
+
+
+async def measure(writer, chunks, vectors) -> float:
+    async with get_sessionmaker()() as session:
+        await session.execute(text(
+            "CREATE TEMP TABLE documents (LIKE public.documents INCLUDING DEFAULTS) ON COMMIT DROP"
+        ))
+        start = time.perf_counter()
+        await writer(session, uuid.uuid4(), chunks, vectors)
+        elapsed = time.perf_counter() - start
+        await session.rollback()
+    return elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2000)
+    args = parser.parse_args()
+
+    chunks, vectors = make_rows(args.rows)
+    print(f"rows: {args.rows}, dimensions: {DIMENSIONS}")
+    for name, writer in (
+        ("ORM add + flush", orm_add),
+        ("multi-row INSERT", multi_row_insert),
+        ("binary COPY", binary_copy),
+    ):
+        seconds = await measure(writer, chunks, vectors)
+        print(f"{name:>17}: {seconds:8.3f}s  {args.rows / seconds:10.0f} rows/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
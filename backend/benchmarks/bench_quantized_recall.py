@@ -0,0 +1,112 @@
+"""Recall and latency of the compact VECTOR_STORAGE modes against exact search.
+
+Runs offline on synthetic clustered embeddings (no network or database).
+Run from ``backend/``::
+
+    python -m benchmarks.bench_quantized_recall --rows 20000 --queries 200
+
+For each mode the candidate search is simulated the way Postgres ranks the
+index expression (float16 cosine for ``halfvec``, Hamming distance over sign
+bits for ``binary``), ``limit * oversample`` candidates are kept and then
+reranked with ``retrieval_service.rerank`` on the full-precision vectors.
+Recall@k is measured against an exact float32 scan. Latencies are for
+brute-force NumPy scans, so compare them between modes rather than with
+HNSW; the ``index MB`` column is the per-row payload the ANN index holds.
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from app.services.retrieval_service import rerank
+
+# Bytes per dimension each mode's index stores.
+INDEX_BYTES = {"full": 4, "halfvec": 2, "binary": 1 / 8}
+
+
+def make_vectors(rows: int, dimensions: int, clusters: int, seed: int = 0) -> np.ndarray:
+    # Real chunk embeddings are far from uniform: chunks of one resource sit
+    # close together, which is what makes quantization lose ranking order.
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dimensions)).astype(np.float32)
+    vectors = centres[rng.integers(0, clusters, rows)] + 0.6 * rng.standard_normal((rows, dimensions)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    k = min(k, len(scores))
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class Index:
+    def __init__(self, mode: str, vectors: np.ndarray):
+        self.mode = mode
+        if mode == "halfvec":
+            # Rounded to float16 but scored in float32: NumPy has no fast
+            # float16 matmul, and only the rounding matters for recall.
+            self.data = vectors.astype(np.float16).astype(np.float32)
+        elif mode == "binary":
+            self.data = np.packbits(vectors > 0, axis=1)
+        else:
+            self.data = vectors
+
+    def candidates(self, query: np.ndarray, count: int) -> np.ndarray:
+        if self.mode == "binary":
+            bits = np.packbits(query > 0)
+            distances = np.unpackbits(np.bitwise_xor(self.data, bits), axis=1).sum(axis=1)
+            return top_k(-distances.astype(np.float32), count)
+        if self.mode == "halfvec":
+            return top_k(self.data @ query.astype(np.float16).astype(np.float32), count)
+        return top_k(self.data @ query, count)
+
+
+def run(args) -> list[dict]:
+    vectors = make_vectors(args.rows, args.dimensions, args.clusters)
+    queries = make_vectors(args.queries, args.dimensions, args.clusters, seed=1)
+    chunks = [str(i) for i in range(args.rows)]
+    exact = [set(top_k(vectors @ query, args.limit).tolist()) for query in queries]
+
+    rows = []
+    for mode in ("full", "halfvec", "binary"):
+        index = Index(mode, vectors)
+        for oversample in ([1] if mode == "full" else args.oversample):
+            recalls, timings = [], []
+            for query, truth in zip(queries, exact):
+                start = time.perf_counter()
+                ids = index.candidates(query, args.limit * oversample)
+                found = rerank([chunks[i] for i in ids], vectors[ids], query, args.limit)
+                timings.append(time.perf_counter() - start)
+                recalls.append(len(truth & {int(chunk) for chunk in found}) / args.limit)
+            rows.append({
+                "mode": mode,
+                "oversample": oversample,
+                f"recall@{args.limit}": statistics.mean(recalls),
+                "p50_ms": statistics.median(timings) * 1000,
+                "index_mb": args.rows * args.dimensions * INDEX_BYTES[mode] / 2**20,
+            })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--clusters", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=5, help="chunks returned per search")
+    parser.add_argument("--oversample", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    recall = f"recall@{args.limit}"
+    print(f"{'mode':<8} {'oversample':>10} {recall:>10} {'p50 ms':>8} {'index MB':>9}")
+    for row in run(args):
+        print(
+            f"{row['mode']:<8} {row['oversample']:>10} {row[recall]:>10.3f} "
+            f"{row['p50_ms']:>8.2f} {row['index_mb']:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
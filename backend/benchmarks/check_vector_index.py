@@ -0,0 +1,103 @@
+"""Check with EXPLAIN that per-resource retrieval walks the HNSW index.
+
+Needs a reachable Postgres with pgvector >= 0.8 and the schema applied; it
+reads DATABASE_URL like the app does. Run from ``backend/``::
+
+    python -m benchmarks.check_vector_index
+
+Random rows for several resources are written into a temporary copy of
+``documents`` (indexes included) inside a rolled-back transaction, then the
+plan of the query used by ``search_resource_chunks`` is inspected (the
+candidate query for VECTOR_STORAGE=halfvec/binary, whose index must exist in
+``public.documents``; see migrations/006). Exits non-zero if the HNSW index
+is not used.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import uuid
+from sqlalchemy import text
+from app.core.config import settings
+from app.database import get_sessionmaker
+from app.services.document_writer import write_documents
+from app.services.embedding_service import get_embedding_provider
+from app.services.retrieval_service import (
+    SEARCH_SQL,
+    compact_search_sql,
+    configure_vector_search,
+    vector_literal,
+)
+
+DIMENSIONS = settings.embedding_dimensions
+
+
+def _random_vector(rng: random.Random) -> list[float]:
+    return [rng.uniform(-1, 1) for _ in range(DIMENSIONS)]
+
+
+def _hnsw_scans(plan: dict) -> list[dict]:
+    found = []
+    # An HNSW scan is an index scan ordered by a distance operator.
+    order_by = plan.get("Order By", "")
+    if plan.get("Node Type") in ("Index Scan", "Index Only Scan") and ("<=>" in order_by or "<~>" in order_by):
+        found.append(plan)
+    for child in plan.get("Plans", []):
+        found.extend(_hnsw_scans(child))
+    return found
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--resources", type=int, default=50)
+    parser.add_argument("--rows-per-resource", type=int, default=400)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    resource_ids = [uuid.uuid4() for _ in range(args.resources)]
+
+    async with get_sessionmaker()() as session:
+        await session.execute(text(
+            "CREATE TEMP TABLE documents (LIKE public.documents INCLUDING ALL) ON COMMIT DROP"
+        ))
+        for resource_id in resource_ids:
+            chunks = [f"{resource_id} chunk {i}" for i in range(args.rows_per_resource)]
+            vectors = [_random_vector(rng) for _ in chunks]
+            await write_documents(session, resource_id, chunks, vectors)
+        await session.execute(text("ANALYZE documents"))
+
+        limit = 5
+        if settings.vector_storage == "full":
+            query = SEARCH_SQL
+        else:
+            query = compact_search_sql(settings.vector_storage, DIMENSIONS)
+            limit *= max(1, settings.vector_rerank_oversample)
+        await configure_vector_search(session, limit)
+        compiled = query.text.strip().rstrip(";")
+        result = await session.execute(
+            text(f"EXPLAIN (FORMAT JSON) {compiled}"),
+            {
+                "resource_id": str(resource_ids[0]),
+                "model": get_embedding_provider().model,
+                "vector": vector_literal(_random_vector(rng)),
+                "limit": limit,
+            },
+        )
+        plan = result.scalar()
+        await session.rollback()
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    root = plan[0]["Plan"]
+    print(json.dumps(root, indent=2))
+
+    if _hnsw_scans(root):
+        print(f"OK: per-resource search uses the HNSW index (VECTOR_STORAGE={settings.vector_storage})")
+        return 0
+    print("FAIL: per-resource search does not use the HNSW index", file=sys.stderr)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,195 @@
+"""Local stand-in for the OpenAI-compatible API the app calls through OpenRouter.
+
+Run from ``backend/``::
+
+    python -m benchmarks.loadtest.fake_openai --port 9100 --embedding-latency-ms 40 --tokens-per-second 60
+
+and start the app with ``OPENROUTER_BASE_URL=http://127.0.0.1:9100/v1``.
+
+Embeddings are deterministic per input text (so the embedding cache and
+retrieval behave as they would for real), returned as base64 float32 like
+the OpenAI client asks for. Chat completions stream synthetic tokens after
+``--ttft-ms`` at ``--tokens-per-second``; JSON-mode completions return as
+many flashcards or quizzes as the system prompt asks for. ``--error-rate``
+answers that share of requests with a 429, to exercise the app's retries.
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import random
+import re
+import time
+import uuid
+
+import numpy as np
+import orjson
+from fastapi import FastAPI, Request
+from fastapi.responses import ORJSONResponse, StreamingResponse
+
+WORDS = (
+    "the model answers from context so each retrieved chunk about gradient descent "
+    "learning rates loss surfaces and optimisation steps shapes the final explanation"
+).split()
+
+app = FastAPI(title="Fake OpenAI")
+config = argparse.Namespace(
+    embedding_latency_ms=40.0,
+    embedding_ms_per_input=0.5,
+    ttft_ms=300.0,
+    tokens_per_second=60.0,
+    answer_tokens=120,
+    completion_latency_ms=1500.0,
+    error_rate=0.0,
+)
+
+
+def _rate_limited() -> ORJSONResponse | None:
+    if config.error_rate and random.random() < config.error_rate:
+        return ORJSONResponse(
+            {"error": {"message": "Rate limit exceeded", "type": "rate_limit_error"}},
+            status_code=429,
+            headers={"retry-after": "0"},
+        )
+    return None
+
+
+def _vector(text: str, dimensions: int) -> np.ndarray:
+    seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+    vector = np.random.default_rng(seed).standard_normal(dimensions).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    limited = _rate_limited()
+    if limited is not None:
+        return limited
+    body = orjson.loads(await request.body())
+    inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+    dimensions = body.get("dimensions") or 1536
+    await asyncio.sleep((config.embedding_latency_ms + config.embedding_ms_per_input * len(inputs)) / 1000)
+
+    data = []
+    for index, text in enumerate(inputs):
+        vector = _vector(text, dimensions)
+        embedding = (
+            base64.b64encode(vector.tobytes()).decode()
+            if body.get("encoding_format") == "base64"
+            else vector.tolist()
+        )
+        data.append({"object": "embedding", "index": index, "embedding": embedding})
+    tokens = sum(len(text.split()) for text in inputs)
+    return ORJSONResponse({
+        "object": "list",
+        "data": data,
+        "model": body["model"],
+        "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+    })
+
+
+def _json_items(key: str, count: int) -> dict:
+    if key == "quizzes":
+        items = [
+            {
+                "question": f"Question {i + 1} about {WORDS[i % len(WORDS)]}?",
+                "options": ["A", "B", "C", "D"],
+                "correct_answer": "B",
+            }
+            for i in range(count)
+        ]
+    else:
+        items = [
+            {"question": f"What is {WORDS[i % len(WORDS)]} ({i + 1})?", "answer": " ".join(WORDS[:8])}
+            for i in range(count)
+        ]
+    return {key: items}
+
+
+def _chunk(completion_id: str, model: str, delta: dict, finish_reason=None, usage=None) -> bytes:
+    payload = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [] if usage else [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    if usage:
+        payload["usage"] = usage
+    return b"data: " + orjson.dumps(payload) + b"\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    limited = _rate_limited()
+    if limited is not None:
+        return limited
+    body = orjson.loads(await request.body())
+    model = body.get("model", "fake")
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    prompt_tokens = sum(len(str(message.get("content", "")).split()) for message in body["messages"])
+
+    if not body.get("stream"):
+        await asyncio.sleep(config.completion_latency_ms / 1000)
+        system = body["messages"][0]["content"]
+        user = body["messages"][-1]["content"]
+        requested = re.search(r"Generate (\d+)", system)
+        count = int(requested.group(1)) if requested else 5
+        key = "quizzes" if "'quizzes'" in user else "flashcards"
+        content = orjson.dumps(_json_items(key, count)).decode()
+        return ORJSONResponse({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": count * 20, "total_tokens": prompt_tokens + count * 20},
+        })
+
+    include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+    async def stream():
+        await asyncio.sleep(config.ttft_ms / 1000)
+        interval = 1 / config.tokens_per_second if config.tokens_per_second > 0 else 0
+        yield _chunk(completion_id, model, {"role": "assistant", "content": ""})
+        for i in range(config.answer_tokens):
+            yield _chunk(completion_id, model, {"content": WORDS[i % len(WORDS)] + " "})
+            if interval:
+                await asyncio.sleep(interval)
+        yield _chunk(completion_id, model, {}, finish_reason="stop")
+        if include_usage:
+            yield _chunk(completion_id, model, {}, usage={
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": config.answer_tokens,
+                "total_tokens": prompt_tokens + config.answer_tokens,
+            })
+        yield b"data: [DONE]\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--embedding-latency-ms", type=float, default=config.embedding_latency_ms)
+    parser.add_argument("--embedding-ms-per-input", type=float, default=config.embedding_ms_per_input)
+    parser.add_argument("--ttft-ms", type=float, default=config.ttft_ms)
+    parser.add_argument("--tokens-per-second", type=float, default=config.tokens_per_second)
+    parser.add_argument("--answer-tokens", type=int, default=config.answer_tokens)
+    parser.add_argument("--completion-latency-ms", type=float, default=config.completion_latency_ms)
+    parser.add_argument("--error-rate", type=float, default=config.error_rate, help="share of requests answered with 429")
+    args = parser.parse_args()
+    for name in vars(config):
+        setattr(config, name, getattr(args, name))
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
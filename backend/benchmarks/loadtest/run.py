@@ -0,0 +1,278 @@
+"""Drive a mixed ingest / chat / quiz workload against a running API.
+
+Start the fake provider and the stubbed app first (see ``fake_openai`` and
+``serve``), or pass ``--spawn`` to have this script start both. Then, from
+``backend/``::
+
+    python -m benchmarks.loadtest.run --rps 20 --duration 60 --mix ingest=1,chat=6,quiz=2
+
+Requests arrive open-loop (Poisson at ``--rps``), so a slow server shows up
+as latency rather than as a lower offered load. Each run first ingests
+``--resources-per-user`` videos per user so chat and quiz have something to
+work on. The report gives throughput, error count, p50/p99 latency per
+endpoint, time-to-first-token for chat, and queue-to-completed time for
+ingestion jobs.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import string
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+import httpx
+from benchmarks.loadtest.setup_db import user_id
+
+QUESTIONS = (
+    "What is the main topic?",
+    "Summarise the key idea in two sentences.",
+    "How does the learning rate affect convergence?",
+    "What example does the speaker use?",
+    "Which steps reduce the error?",
+)
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+        self.skipped = 0
+
+    def record(self, name: str, seconds: float, ok: bool = True):
+        if ok:
+            self.latencies[name].append(seconds)
+        else:
+            self.errors[name] += 1
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def random_video_id(rng: random.Random, pool: int) -> str:
+    # A bounded pool makes some ingests hit the shared-content path.
+    seeded = random.Random(rng.randrange(pool))
+    return "".join(seeded.choices(string.ascii_letters + string.digits + "_-", k=11))
+
+
+def headers(index: int) -> dict:
+    return {"x-user-id": str(user_id(index)), "x-user-email": f"loadtest-{index}@example.com"}
+
+
+async def wait_for_job(client: httpx.AsyncClient, job_id: str, user: int, recorder: Recorder, started: float):
+    while True:
+        await asyncio.sleep(0.25)
+        response = await client.get(f"/api/resources/jobs/{job_id}", headers=headers(user))
+        if response.status_code != 200:
+            recorder.record("ingest_job", 0, ok=False)
+            return None
+        job = response.json()
+        if job["status"] == "completed":
+            recorder.record("ingest_job", time.perf_counter() - started)
+            return job["resource_id"]
+        if job["status"] == "failed":
+            recorder.record("ingest_job", 0, ok=False)
+            return None
+
+
+async def ingest(client, rng, args, recorder, resources):
+    user = rng.randrange(args.users)
+    started = time.perf_counter()
+    try:
+        response = await client.post(
+            "/api/resources/process-video",
+            json={"url": f"https://www.youtube.com/watch?v={random_video_id(rng, args.video_pool)}"},
+            headers=headers(user),
+        )
+        recorder.record("POST /process-video", time.perf_counter() - started, response.status_code == 202)
+        if response.status_code != 202:
+            return
+        resource_id = await wait_for_job(client, response.json()["job_id"], user, recorder, started)
+        if resource_id:
+            resources.append((user, resource_id))
+    except httpx.HTTPError:
+        recorder.record("POST /process-video", 0, ok=False)
+
+
+async def chat(client, rng, args, recorder, resources):
+    user, resource_id = rng.choice(resources)
+    started = time.perf_counter()
+    first_token = None
+    ok = False
+    try:
+        async with client.stream(
+            "POST", "/api/chat/",
+            json={"query": rng.choice(QUESTIONS), "resource_id": resource_id},
+            headers=headers(user),
+        ) as response:
+            buffer = ""
+            async for text in response.aiter_text():
+                buffer += text
+                while "\n\n" in buffer:
+                    event, buffer = buffer.split("\n\n", 1)
+                    if first_token is None and '"text"' in event and "event:" not in event:
+                        first_token = time.perf_counter()
+                    if "event: done" in event:
+                        ok = True
+                    elif "event: error" in event:
+                        ok = False
+    except httpx.HTTPError:
+        ok = False
+    recorder.record("POST /chat", time.perf_counter() - started, ok)
+    if ok and first_token is not None:
+        recorder.record("chat TTFT", first_token - started)
+
+
+async def quiz(client, rng, args, recorder, resources):
+    user, resource_id = rng.choice(resources)
+    started = time.perf_counter()
+    try:
+        response = await client.post(
+            "/api/learning/generate-quiz",
+            json={"resource_id": resource_id, "count": 5, "regenerate": rng.random() < args.quiz_regenerate},
+            headers=headers(user),
+        )
+        recorder.record("POST /generate-quiz", time.perf_counter() - started, response.status_code == 200)
+    except httpx.HTTPError:
+        recorder.record("POST /generate-quiz", 0, ok=False)
+
+
+WORKLOADS = {"ingest": ingest, "chat": chat, "quiz": quiz}
+
+
+def parse_mix(mix: str) -> tuple[list[str], list[float]]:
+    names, weights = [], []
+    for part in mix.split(","):
+        name, weight = part.split("=")
+        if name not in WORKLOADS:
+            raise SystemExit(f"unknown workload {name!r}; choose from {', '.join(WORKLOADS)}")
+        names.append(name)
+        weights.append(float(weight))
+    return names, weights
+
+
+async def seed_resources(client, args, recorder, resources):
+    rng = random.Random(args.seed + 1)
+    await asyncio.gather(*(
+        ingest(client, rng, args, recorder, resources)
+        for _ in range(args.users * args.resources_per_user)
+    ))
+    if not resources:
+        raise SystemExit("seeding ingested no resources; check the app and fake provider logs")
+
+
+async def drive(args) -> tuple[Recorder, float]:
+    names, weights = parse_mix(args.mix)
+    limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        resources: list[tuple[int, str]] = []
+        print(f"seeding {args.users * args.resources_per_user} resources...")
+        await seed_resources(client, args, Recorder(), resources)
+
+        recorder = Recorder()
+        rng = random.Random(args.seed)
+        in_flight: set[asyncio.Task] = set()
+        print(f"driving {args.rps} rps for {args.duration}s, mix {args.mix}")
+        started = time.perf_counter()
+        next_at = started
+        while next_at - started < args.duration:
+            await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+            next_at += rng.expovariate(args.rps)
+            if len(in_flight) >= args.max_in_flight:
+                recorder.skipped += 1
+                continue
+            workload = WORKLOADS[rng.choices(names, weights)[0]]
+            task = asyncio.create_task(workload(client, rng, args, recorder, resources))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        await asyncio.gather(*in_flight)
+        elapsed = time.perf_counter() - started
+    return recorder, elapsed
+
+
+def report(recorder: Recorder, elapsed: float, args) -> dict:
+    rows = {}
+    for name in sorted(set(recorder.latencies) | set(recorder.errors)):
+        values = recorder.latencies.get(name, [])
+        rows[name] = {
+            "ok": len(values),
+            "errors": recorder.errors.get(name, 0),
+            "throughput_rps": round(len(values) / elapsed, 2),
+            "p50_ms": round(percentile(values, 0.50) * 1000, 1) if values else None,
+            "p99_ms": round(percentile(values, 0.99) * 1000, 1) if values else None,
+        }
+
+    print(f"\n{'endpoint':<24} {'ok':>7} {'errors':>7} {'rps':>8} {'p50 ms':>9} {'p99 ms':>9}")
+    for name, row in rows.items():
+        print(
+            f"{name:<24} {row['ok']:>7} {row['errors']:>7} {row['throughput_rps']:>8} "
+            f"{row['p50_ms'] if row['p50_ms'] is not None else '-':>9} "
+            f"{row['p99_ms'] if row['p99_ms'] is not None else '-':>9}"
+        )
+    if recorder.skipped:
+        print(f"\n{recorder.skipped} arrivals skipped at --max-in-flight {args.max_in_flight}")
+    return {"args": vars(args), "elapsed_s": round(elapsed, 2), "skipped": recorder.skipped, "endpoints": rows}
+
+
+def spawn(args) -> list[subprocess.Popen]:
+    env = {
+        **os.environ,
+        "OPENROUTER_BASE_URL": f"http://127.0.0.1:{args.fake_port}/v1",
+        "OPENROUTER_API_KEY": os.environ.get("OPENROUTER_API_KEY", "fake"),
+    }
+    port = httpx.URL(args.base_url).port or 8000
+    processes = [
+        subprocess.Popen([sys.executable, "-m", "benchmarks.loadtest.fake_openai", "--port", str(args.fake_port)], env=env),
+        subprocess.Popen([sys.executable, "-m", "benchmarks.loadtest.serve", "--port", str(port)], env=env),
+    ]
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{args.base_url}/health", timeout=1).status_code == 200:
+                return processes
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    for process in processes:
+        process.terminate()
+    raise SystemExit("app did not become healthy within 30s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--rps", type=float, default=10)
+    parser.add_argument("--duration", type=float, default=60, help="seconds of load after seeding")
+    parser.add_argument("--mix", default="ingest=1,chat=6,quiz=2", help="relative workload weights")
+    parser.add_argument("--users", type=int, default=20, help="must not exceed setup_db --users")
+    parser.add_argument("--resources-per-user", type=int, default=1)
+    parser.add_argument("--video-pool", type=int, default=1_000_000, help="distinct video ids ingests draw from")
+    parser.add_argument("--quiz-regenerate", type=float, default=0.3, help="share of quiz requests that regenerate")
+    parser.add_argument("--max-in-flight", type=int, default=500)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", help="write the report to this JSON file")
+    parser.add_argument("--spawn", action="store_true", help="start the fake provider and the stubbed app")
+    parser.add_argument("--fake-port", type=int, default=9100)
+    args = parser.parse_args()
+
+    processes = spawn(args) if args.spawn else []
+    try:
+        recorder, elapsed = asyncio.run(drive(args))
+    finally:
+        for process in processes:
+            process.terminate()
+    result = report(recorder, elapsed, args)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nsaved {args.save}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Prepare a plain local Postgres + pgvector for the load test.
+
+Run from ``backend/`` with DATABASE_URL set like the app's::
+
+    python -m benchmarks.loadtest.setup_db --users 50
+
+``schema.sql`` targets Supabase, where ``auth.users`` already exists; this
+creates a minimal stand-in for it, applies the schema, and registers the
+load-test users (``00000000-0000-4000-8000-<n>``) so their ids pass the
+foreign keys.
+"""
+import argparse
+import asyncio
+import os
+import uuid
+import asyncpg
+from app.database import DATABASE_URL
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "schema.sql")
+
+AUTH_STUB = """
+    create schema if not exists auth;
+    create table if not exists auth.users (id uuid primary key, email text);
+"""
+
+
+def user_id(index: int) -> uuid.UUID:
+    return uuid.UUID(f"00000000-0000-4000-8000-{index:012d}")
+
+
+async def setup(users: int):
+    connection = await asyncpg.connect(DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://"))
+    try:
+        await connection.execute(AUTH_STUB)
+        with open(SCHEMA_PATH) as f:
+            await connection.execute(f.read())
+        # The schema's trigger mirrors these into public.users.
+        await connection.executemany(
+            "insert into auth.users (id, email) values ($1, $2) on conflict (id) do nothing",
+            [(user_id(i), f"loadtest-{i}@example.com") for i in range(users)],
+        )
+    finally:
+        await connection.close()
+    print(f"schema applied, {users} users ready")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(setup(args.users))
+
+
+if __name__ == "__main__":
+    main()
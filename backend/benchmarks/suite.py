@@ -0,0 +1,327 @@
+"""Offline micro-benchmarks for the text, streaming and retrieval hot paths.
+
+Run from ``backend/``::
+
+    python -m benchmarks.suite --save benchmarks/results/main.json
+    python -m benchmarks.suite --compare benchmarks/results/main.json
+
+Nothing here touches the network or a database. Results are JSON keyed by
+case name (best and median seconds over ``--repeat`` runs), so two result
+files from the same machine can be compared; ``--compare`` exits non-zero
+when any case got slower than ``--threshold`` times its old best.
+
+``chunk_text`` needs tiktoken's ``cl100k_base`` file in its cache
+(``TIKTOKEN_CACHE_DIR``) when offline; without it that case is skipped.
+"""
+import argparse
+import asyncio
+import fnmatch
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Callable
+
+import fitz  # PyMuPDF
+
+from app.services.document_writer import encode_copy_rows
+from app.services.flashcard_service import _parse_flashcards
+from app.services.ingestion_service import _dedupe_chunks
+from app.services.pdf_service import _extract_page_range, extract_pdf_text, shutdown_pdf_executor
+from app.services.quiz_service import _parse_quizzes
+from app.services.rag_service import DeltaNormalizer
+from app.services.retrieval_service import vector_literal
+from benchmarks.bench_chunker import legacy_chunk_text, make_text
+
+# name -> setup(scale) returning the callable to time
+CASES: dict[str, Callable[[float], Callable[[], object]]] = {}
+
+
+def case(name: str):
+    def register(setup):
+        CASES[name] = setup
+        return setup
+    return register
+
+
+def legacy_novel_suffix(existing: str, incoming: str) -> str:
+    # What generate_chat_response used before DeltaNormalizer: compares each
+    # chunk against the whole response so far.
+    if not incoming:
+        return ""
+    if not existing:
+        return incoming
+    if incoming in existing or existing.endswith(incoming):
+        return ""
+    if incoming.startswith(existing):
+        return incoming[len(existing):]
+
+    max_overlap = min(len(existing), len(incoming))
+    for overlap in range(max_overlap, 0, -1):
+        if existing.endswith(incoming[:overlap]):
+            return incoming[overlap:]
+
+    return incoming
+
+
+def legacy_normalize(chunks: list[str]) -> str:
+    full_response = ""
+    last_raw_chunk = ""
+    for content in chunks:
+        delta = legacy_novel_suffix(full_response, content)
+        if content == last_raw_chunk:
+            continue
+        last_raw_chunk = content
+        if delta:
+            full_response += delta
+    return full_response
+
+
+def normalize(chunks: list[str], cumulative: bool = False) -> str:
+    normalizer = DeltaNormalizer(cumulative=cumulative)
+    return "".join(normalizer.push(content) for content in chunks)
+
+
+def make_stream(tokens: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    words = make_text(max(1, tokens // 10), seed).split(" ")
+    return [" " + rng.choice(words) for _ in range(tokens)]
+
+
+def make_pdf(path: str, pages: int):
+    text = make_text(40)
+    with fitz.open() as doc:
+        for _ in range(pages):
+            page = doc.new_page()
+            page.insert_textbox(fitz.Rect(36, 36, 576, 806), text, fontsize=9)
+        doc.save(path)
+
+
+def make_llm_json(key: str, items: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    words = make_text(50, seed).split(" ")
+
+    def sentence(length: int) -> str:
+        return " ".join(rng.choice(words) for _ in range(length))
+
+    if key == "flashcards":
+        data = [{"question": sentence(15) + "?", "answer": sentence(30)} for _ in range(items)]
+    else:
+        data = [
+            {"question": sentence(15) + "?", "options": [sentence(6) for _ in range(4)], "correct_answer": sentence(6)}
+            for _ in range(items)
+        ]
+    return json.dumps({key: data})
+
+
+@case("chunk_text.token")
+def _chunk_token(scale):
+    from app.services.chunking_service import chunk_text, get_encoding
+    get_encoding()  # fails fast (and the case is skipped) without the BPE file
+    text = make_text(int(20_000 * scale))
+    return lambda: chunk_text(text)
+
+
+@case("chunk_text.legacy")
+def _chunk_legacy(scale):
+    text = make_text(int(20_000 * scale))
+    return lambda: legacy_chunk_text(text)
+
+
+@case("dedupe_chunks")
+def _dedupe(scale):
+    rng = random.Random(0)
+    unique = [make_text(20, seed) for seed in range(int(2_000 * scale))]
+    # A third of the chunks repeat earlier ones with different spacing/case.
+    chunks = unique + [rng.choice(unique).upper().replace(" ", "  ") for _ in range(len(unique) // 2)]
+    rng.shuffle(chunks)
+    return lambda: _dedupe_chunks(chunks)
+
+
+@case("stream_deltas.normalizer")
+def _deltas(scale):
+    chunks = make_stream(int(20_000 * scale))
+    return lambda: normalize(chunks)
+
+
+@case("stream_deltas.legacy")
+def _deltas_legacy(scale):
+    chunks = make_stream(int(20_000 * scale))
+    return lambda: legacy_normalize(chunks)
+
+
+# A typical chat answer is well under 2k tokens, where both versions cost
+# well under a millisecond per answer; these time a batch of 50 such answers.
+@case("stream_deltas.answer.normalizer")
+def _answer_deltas(scale):
+    streams = [make_stream(int(800 * scale), seed) for seed in range(50)]
+    return lambda: [normalize(chunks) for chunks in streams]
+
+
+@case("stream_deltas.answer.legacy")
+def _answer_deltas_legacy(scale):
+    streams = [make_stream(int(800 * scale), seed) for seed in range(50)]
+    return lambda: [legacy_normalize(chunks) for chunks in streams]
+
+
+@case("stream_deltas.cumulative.normalizer")
+def _cumulative(scale):
+    tokens = make_stream(int(2_000 * scale))
+    chunks = ["".join(tokens[:i + 1]) for i in range(len(tokens))]
+    return lambda: normalize(chunks, cumulative=True)
+
+
+@case("stream_deltas.cumulative.legacy")
+def _cumulative_legacy(scale):
+    tokens = make_stream(int(2_000 * scale))
+    chunks = ["".join(tokens[:i + 1]) for i in range(len(tokens))]
+    return lambda: legacy_normalize(chunks)
+
+
+@case("vector_literal")
+def _vector_literal(scale):
+    rng = random.Random(0)
+    vectors = [[rng.uniform(-1, 1) for _ in range(1536)] for _ in range(int(200 * scale))]
+    return lambda: [vector_literal(vector) for vector in vectors]
+
+
+@case("copy_rows.encode")
+def _copy_rows(scale):
+    rng = random.Random(0)
+    count = int(256 * scale)
+    chunks = [make_text(15, seed) for seed in range(count)]
+    vectors = [[rng.uniform(-1, 1) for _ in range(1536)] for _ in range(count)]
+    resource_id = uuid.uuid4()
+    return lambda: encode_copy_rows(resource_id, chunks, vectors, "text-embedding-3-small")
+
+
+def _pdf_path(scale) -> str:
+    path = os.path.join(tempfile.gettempdir(), f"lumeris-bench-{int(300 * scale)}p.pdf")
+    if not os.path.exists(path):
+        make_pdf(path, int(300 * scale))
+    return path
+
+
+@case("pdf_extract.serial")
+def _pdf_serial(scale):
+    path = _pdf_path(scale)
+    pages = int(300 * scale)
+    return lambda: _extract_page_range(path, 0, pages)
+
+
+@case("pdf_extract.pool")
+def _pdf_pool(scale):
+    path = _pdf_path(scale)
+    return lambda: asyncio.run(extract_pdf_text(path))
+
+
+@case("llm_json.flashcards")
+def _flashcards_json(scale):
+    content = make_llm_json("flashcards", int(50 * scale))
+    return lambda: [_parse_flashcards(content) for _ in range(1000)]
+
+
+@case("llm_json.quizzes")
+def _quizzes_json(scale):
+    content = make_llm_json("quizzes", int(50 * scale))
+    return lambda: [_parse_quizzes(content) for _ in range(1000)]
+
+
+def run_case(setup, scale: float, repeat: int) -> dict:
+    fn = setup(scale)
+    fn()  # warm-up: imports, process pool start, caches
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return {"best_s": min(timings), "median_s": statistics.median(timings), "repeat": repeat}
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old: dict, new: dict, threshold: float) -> bool:
+    ok = True
+    print(f"\n{'case':<38} {'old best':>10} {'new best':>10} {'ratio':>7}")
+    for name, result in new["results"].items():
+        before = old["results"].get(name)
+        if not before or "best_s" not in before or "best_s" not in result:
+            continue
+        ratio = result["best_s"] / before["best_s"]
+        flag = ""
+        if ratio > threshold:
+            flag = "  REGRESSION"
+            ok = False
+        print(f"{name:<38} {before['best_s']:>10.4f} {result['best_s']:>10.4f} {ratio:>6.2f}x{flag}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", default="*", help="glob over case names, e.g. 'stream_deltas.*'")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier for input sizes")
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--compare", help="results file to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown ratio that counts as a regression")
+    args = parser.parse_args()
+
+    results: dict[str, dict] = {}
+    try:
+        for name, setup in CASES.items():
+            if not fnmatch.fnmatch(name, args.only):
+                continue
+            try:
+                result = run_case(setup, args.scale, args.repeat)
+            except Exception as e:
+                reason = f"{type(e).__name__}: {str(e).splitlines()[0][:120] if str(e) else ''}"
+                results[name] = {"skipped": reason}
+                print(f"{name:<38} skipped ({reason})")
+                continue
+            results[name] = result
+            print(f"{name:<38} best {result['best_s']:.4f}s  median {result['median_s']:.4f}s")
+    finally:
+        shutdown_pdf_executor()
+
+    report = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "scale": args.scale,
+        },
+        "results": results,
+    }
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nsaved {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline["meta"].get("scale") != args.scale:
+            print("warning: baseline was recorded with a different --scale")
+        if not compare(baseline, report, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+-- Adds documents.content_hash, removes duplicate chunks per resource, and adds
+-- the indexes used by per-resource vector search. Safe to run more than once.
+
+create extension if not exists pgcrypto;
+
+alter table documents add column if not exists content_hash text;
+
+-- Same normalization as the app: collapse whitespace, trim, lowercase.
+update documents
+set content_hash = encode(
+    digest(lower(btrim(regexp_replace(chunk_text, '\s+', ' ', 'g'))), 'sha256'),
+    'hex'
+)
+where content_hash is null;
+
+delete from documents d
+using documents keep
+where d.resource_id = keep.resource_id
+  and d.content_hash = keep.content_hash
+  and d.id > keep.id;
+
+alter table documents alter column content_hash set not null;
+
+do $$
+begin
+    if not exists (
+        select 1 from pg_constraint where conname = 'documents_resource_content_hash_key'
+    ) then
+        alter table documents
+            add constraint documents_resource_content_hash_key unique (resource_id, content_hash);
+    end if;
+end $$;
+
+create index if not exists documents_resource_id_idx on documents (resource_id);
@@ -0,0 +1,20 @@
+-- Records which embedding model produced each document vector, so search
+-- never compares vectors from different providers. Existing rows were all
+-- embedded with text-embedding-3-small. Safe to run more than once.
+
+alter table documents add column if not exists embedding_model text;
+
+update documents set embedding_model = 'text-embedding-3-small' where embedding_model is null;
+
+alter table documents alter column embedding_model set not null;
+
+-- To switch to a provider with a different dimension (e.g. the local
+-- all-MiniLM-L6-v2 model, 384), the vector columns have to be recreated
+-- at that size and the corpus re-ingested:
+--
+--   drop index if exists documents_embedding_hnsw_idx;
+--   delete from documents;
+--   delete from embedding_cache;
+--   alter table documents alter column embedding type vector(384);
+--   alter table embedding_cache alter column embedding type vector(384);
+--   create index documents_embedding_hnsw_idx on documents using hnsw (embedding vector_cosine_ops);
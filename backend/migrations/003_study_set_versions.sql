@@ -0,0 +1,25 @@
+-- Groups flashcards and quizzes into generated sets tagged with the hash of
+-- the documents they came from, so unchanged resources reuse their set.
+-- Existing rows get one set per resource and a version that matches nothing,
+-- so the next request regenerates them. Safe to run more than once.
+
+alter table flashcards add column if not exists set_id uuid;
+alter table flashcards add column if not exists content_version text;
+update flashcards f
+set set_id = coalesce(f.set_id, f.resource_id),
+    content_version = coalesce(f.content_version, 'legacy')
+where f.set_id is null or f.content_version is null;
+alter table flashcards alter column set_id set not null;
+alter table flashcards alter column content_version set not null;
+
+alter table quizzes add column if not exists set_id uuid;
+alter table quizzes add column if not exists content_version text;
+update quizzes q
+set set_id = coalesce(q.set_id, q.resource_id),
+    content_version = coalesce(q.content_version, 'legacy')
+where q.set_id is null or q.content_version is null;
+alter table quizzes alter column set_id set not null;
+alter table quizzes alter column content_version set not null;
+
+create index if not exists flashcards_resource_version_idx on flashcards (resource_id, content_version, created_at);
+create index if not exists quizzes_resource_version_idx on quizzes (resource_id, content_version, created_at);
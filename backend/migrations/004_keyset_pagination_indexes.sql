@@ -0,0 +1,4 @@
+-- Composite indexes backing keyset pagination of resource lists and chat history.
+
+create index if not exists resources_user_created_idx on resources (user_id, created_at, id);
+create index if not exists chat_history_resource_created_idx on chat_history (resource_id, created_at, id);
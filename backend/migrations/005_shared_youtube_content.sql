@@ -0,0 +1,20 @@
+-- Persistent transcript cache, and resources for an already-ingested YouTube
+-- video pointing at that video's documents instead of storing a copy.
+-- Existing YouTube resources get their video id back from the generated
+-- title. Safe to run more than once.
+
+create table if not exists transcript_cache (
+    video_id text primary key,
+    transcript text not null,
+    fetched_at timestamp with time zone default timezone('utc'::text, now()) not null
+);
+
+alter table resources add column if not exists video_id text;
+alter table resources add column if not exists content_resource_id uuid references resources(id) on delete set null;
+
+update resources
+set video_id = substring(title from 'YouTube Video: ([0-9A-Za-z_-]{11})$')
+where type = 'youtube' and video_id is null;
+
+create index if not exists resources_shared_video_idx
+    on resources (video_id) where content_resource_id is null and video_id is not null;
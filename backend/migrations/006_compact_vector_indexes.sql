@@ -0,0 +1,18 @@
+-- Compact HNSW indexes for VECTOR_STORAGE=halfvec or binary (pgvector >= 0.7).
+-- documents.embedding keeps full precision for the exact rerank, so existing
+-- rows need no rewrite; only the index is built from them. Run outside a
+-- transaction (CONCURRENTLY keeps ingestion writing meanwhile), build the
+-- index for the mode you enable, and once VECTOR_STORAGE is switched over,
+-- drop the full-precision index to reclaim its memory. The dimension must
+-- match EMBEDDING_DIMENSIONS. Safe to run more than once.
+
+-- VECTOR_STORAGE=halfvec: half the size of the full-precision index.
+create index concurrently if not exists documents_embedding_halfvec_hnsw_idx
+    on documents using hnsw ((embedding::halfvec(1536)) halfvec_cosine_ops);
+
+-- VECTOR_STORAGE=binary: 1 bit per dimension; raise VECTOR_RERANK_OVERSAMPLE.
+-- create index concurrently if not exists documents_embedding_binary_hnsw_idx
+--     on documents using hnsw ((binary_quantize(embedding)::bit(1536)) bit_hamming_ops);
+
+-- After switching:
+-- drop index concurrently if exists documents_embedding_hnsw_idx;
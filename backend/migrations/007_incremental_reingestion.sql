@@ -0,0 +1,13 @@
+-- Ingestion jobs that replace the content of an existing resource
+-- (PUT /api/resources/{id}/content). Safe to run more than once.
+
+alter table ingestion_jobs add column if not exists action text not null default 'create';
+alter table ingestion_jobs add column if not exists stale_document_ids jsonb;
+
+do $$
+begin
+    if not exists (select 1 from pg_constraint where conname = 'ingestion_jobs_action_check') then
+        alter table ingestion_jobs
+            add constraint ingestion_jobs_action_check check (action in ('create', 'update'));
+    end if;
+end $$;
@@ -0,0 +1,18 @@
+-- Ingestion jobs are claimed with a lease so that several API processes
+-- never run the same job, and resources stay hidden until their ingestion
+-- job has written all their documents. Safe to run more than once.
+
+alter table ingestion_jobs add column if not exists lease_owner text;
+alter table ingestion_jobs add column if not exists lease_until timestamp with time zone;
+
+alter table resources add column if not exists ready boolean not null default true;
+
+-- Resources still being ingested.
+update resources r
+set ready = false
+where exists (
+    select 1 from ingestion_jobs j
+    where j.resource_id = r.id
+      and j.action = 'create'
+      and j.stage not in ('completed', 'failed')
+);
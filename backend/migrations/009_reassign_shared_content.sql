@@ -0,0 +1,43 @@
+-- Deleting a resource whose documents other resources share (see 005) used to
+-- take the documents with it, leaving the sharers empty. The oldest surviving
+-- sharer now inherits the documents and becomes the owner the others point
+-- at. Safe to run more than once.
+
+create or replace function public.reassign_shared_content()
+returns trigger
+language plpgsql
+set search_path = public
+as $$
+declare
+  heir uuid;
+begin
+  if old.content_resource_id is not null then
+    return old;
+  end if;
+
+  -- Sharers whose user is being deleted are left alone: they are about to be
+  -- deleted by the same cascade, which fails on rows a trigger changed.
+  select r.id into heir
+  from resources r
+  where r.content_resource_id = old.id
+    and exists (select 1 from users u where u.id = r.user_id)
+  order by r.created_at, r.id
+  limit 1;
+
+  if heir is null then
+    return old;
+  end if;
+
+  update documents set resource_id = heir where resource_id = old.id;
+  update resources set content_resource_id = null where id = heir;
+  update resources r set content_resource_id = heir
+  where r.content_resource_id = old.id
+    and exists (select 1 from users u where u.id = r.user_id);
+  return old;
+end;
+$$;
+
+drop trigger if exists resources_reassign_shared_content on resources;
+create trigger resources_reassign_shared_content
+  before delete on resources
+  for each row execute function public.reassign_shared_content();
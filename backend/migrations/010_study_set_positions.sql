@@ -0,0 +1,7 @@
+-- Flashcards and quizzes of one set are inserted in a single transaction and
+-- share created_at, so ordering by it returned a stored set shuffled. Rows
+-- now record their position in the set as generated. Existing rows keep
+-- position 0 and fall back to id order. Safe to run more than once.
+
+alter table flashcards add column if not exists position integer not null default 0;
+alter table quizzes add column if not exists position integer not null default 0;
@@ -0,0 +1,50 @@
+-- API processes cache data per documents owner (the answer cache, the
+-- in-memory vector index), so they need to hear when reassign_shared_content
+-- (see 009) moves a deleted owner's documents to a sharer. The trigger now
+-- records each move; every process polls the table and drops its caches for
+-- both resources. Safe to run more than once.
+
+-- Documents moved by reassign_shared_content, read by every API process to
+-- drop its caches for both resources.
+create table if not exists resource_content_moves (
+    id bigserial primary key,
+    old_resource_id uuid not null,
+    new_resource_id uuid not null,
+    moved_at timestamp with time zone default now() not null
+);
+create index if not exists resource_content_moves_moved_at_idx on resource_content_moves (moved_at);
+
+create or replace function public.reassign_shared_content()
+returns trigger
+language plpgsql
+set search_path = public
+as $$
+declare
+  heir uuid;
+begin
+  if old.content_resource_id is not null then
+    return old;
+  end if;
+
+  -- Sharers whose user is being deleted are left alone: they are about to be
+  -- deleted by the same cascade, which fails on rows a trigger changed.
+  select r.id into heir
+  from resources r
+  where r.content_resource_id = old.id
+    and exists (select 1 from users u where u.id = r.user_id)
+  order by r.created_at, r.id
+  limit 1;
+
+  if heir is null then
+    return old;
+  end if;
+
+  update documents set resource_id = heir where resource_id = old.id;
+  update resources set content_resource_id = null where id = heir;
+  update resources r set content_resource_id = heir
+  where r.content_resource_id = old.id
+    and exists (select 1 from users u where u.id = r.user_id);
+  insert into resource_content_moves (old_resource_id, new_resource_id) values (old.id, heir);
+  return old;
+end;
+$$;
@@ -14,23 +14,83 @@ create table if not exists resources (
     user_id uuid references users(id) on delete cascade not null,
     type text not null check (type in ('youtube', 'pdf')),
     title text not null,
+    video_id text,
+    -- Resources for an already-ingested video reuse that resource's documents.
+    content_resource_id uuid references resources(id) on delete set null,
+    -- False while the resource's ingestion job is still writing documents.
+    ready boolean not null default true,
     created_at timestamp with time zone default timezone('utc'::text, now()) not null
 );
 
+create index if not exists resources_user_created_idx on resources (user_id, created_at, id);
+create index if not exists resources_shared_video_idx
+    on resources (video_id) where content_resource_id is null and video_id is not null;
+
 -- Documents for RAG (vector store)
 create table if not exists documents (
     id uuid default gen_random_uuid() primary key,
     resource_id uuid references resources(id) on delete cascade not null,
     chunk_text text not null,
-    embedding vector(1536) not null
+    content_hash text not null,
+    embedding_model text not null,
+    -- Dimension must match EMBEDDING_DIMENSIONS (1536 for text-embedding-3-small, 384 for all-MiniLM-L6-v2).
+    embedding vector(1536) not null,
+    constraint documents_resource_content_hash_key unique (resource_id, content_hash)
+);
+
+create index if not exists documents_resource_id_idx on documents (resource_id);
+
+-- Embedding cache shared across resources and users, keyed by model + normalized chunk hash
+create table if not exists embedding_cache (
+    model text not null,
+    content_hash text not null,
+    embedding vector(1536) not null,
+    created_at timestamp with time zone default timezone('utc'::text, now()) not null,
+    primary key (model, content_hash)
+);
+
+-- YouTube transcripts, refetched once older than TRANSCRIPT_CACHE_TTL_SECONDS
+create table if not exists transcript_cache (
+    video_id text primary key,
+    transcript text not null,
+    fetched_at timestamp with time zone default timezone('utc'::text, now()) not null
+);
+
+-- Background ingestion jobs; each stage is committed so jobs resume after a restart
+create table if not exists ingestion_jobs (
+    id uuid default gen_random_uuid() primary key,
+    user_id uuid references users(id) on delete cascade not null,
+    type text not null check (type in ('youtube', 'pdf')),
+    source text not null,
+    action text not null default 'create' check (action in ('create', 'update')),
+    stage text not null default 'queued'
+        check (stage in ('queued', 'extracted', 'chunked', 'embedding', 'completed', 'failed')),
+    resource_id uuid references resources(id) on delete set null,
+    content text,
+    chunks jsonb,
+    stale_document_ids jsonb,
+    chunks_total integer not null default 0,
+    chunks_embedded integer not null default 0,
+    error text,
+    lease_owner text,
+    lease_until timestamp with time zone,
+    created_at timestamp with time zone default timezone('utc'::text, now()) not null,
+    updated_at timestamp with time zone default timezone('utc'::text, now()) not null
 );
 
+create index if not exists ingestion_jobs_unfinished_idx
+    on ingestion_jobs (created_at) where stage not in ('completed', 'failed');
+
 -- Flashcards
 create table if not exists flashcards (
     id uuid default gen_random_uuid() primary key,
     resource_id uuid references resources(id) on delete cascade not null,
+    set_id uuid not null,
+    content_version text not null,
     question text not null,
     answer text not null,
+    -- Order within the set, as generated (rows of a set share created_at).
+    position integer not null default 0,
     created_at timestamp with time zone default timezone('utc'::text, now()) not null
 );
 
@@ -38,12 +98,18 @@ create table if not exists flashcards (
 create table if not exists quizzes (
     id uuid default gen_random_uuid() primary key,
     resource_id uuid references resources(id) on delete cascade not null,
+    set_id uuid not null,
+    content_version text not null,
     question text not null,
     options jsonb not null,
     correct_answer text not null,
+    position integer not null default 0,
     created_at timestamp with time zone default timezone('utc'::text, now()) not null
 );
 
+create index if not exists flashcards_resource_version_idx on flashcards (resource_id, content_version, created_at);
+create index if not exists quizzes_resource_version_idx on quizzes (resource_id, content_version, created_at);
+
 -- Chat History
 create table if not exists chat_history (
     id uuid default gen_random_uuid() primary key,
@@ -53,8 +119,67 @@ create table if not exists chat_history (
     created_at timestamp with time zone default timezone('utc'::text, now()) not null
 );
 
+create index if not exists chat_history_resource_created_idx on chat_history (resource_id, created_at, id);
+
 -- Indexes for vector similarity search
-create index on documents using hnsw (embedding vector_cosine_ops);
+-- Per-resource queries rely on filtered/iterative HNSW scans (pgvector >= 0.8).
+create index if not exists documents_embedding_hnsw_idx on documents using hnsw (embedding vector_cosine_ops);
+-- With VECTOR_STORAGE=halfvec or binary, replace it with a compact index over the
+-- same column instead (candidates are reranked exactly); see migrations/006.
+-- create index if not exists documents_embedding_halfvec_hnsw_idx
+--     on documents using hnsw ((embedding::halfvec(1536)) halfvec_cosine_ops);
+
+-- Documents moved by reassign_shared_content, read by every API process to
+-- drop its caches for both resources.
+create table if not exists resource_content_moves (
+    id bigserial primary key,
+    old_resource_id uuid not null,
+    new_resource_id uuid not null,
+    moved_at timestamp with time zone default now() not null
+);
+create index if not exists resource_content_moves_moved_at_idx on resource_content_moves (moved_at);
+
+-- When a resource whose documents others share is deleted, the oldest
+-- surviving sharer inherits the documents instead of losing them.
+create or replace function public.reassign_shared_content()
+returns trigger
+language plpgsql
+set search_path = public
+as $$
+declare
+  heir uuid;
+begin
+  if old.content_resource_id is not null then
+    return old;
+  end if;
+
+  -- Sharers whose user is being deleted are left alone: they are about to be
+  -- deleted by the same cascade, which fails on rows a trigger changed.
+  select r.id into heir
+  from resources r
+  where r.content_resource_id = old.id
+    and exists (select 1 from users u where u.id = r.user_id)
+  order by r.created_at, r.id
+  limit 1;
+
+  if heir is null then
+    return old;
+  end if;
+
+  update documents set resource_id = heir where resource_id = old.id;
+  update resources set content_resource_id = null where id = heir;
+  update resources r set content_resource_id = heir
+  where r.content_resource_id = old.id
+    and exists (select 1 from users u where u.id = r.user_id);
+  insert into resource_content_moves (old_resource_id, new_resource_id) values (old.id, heir);
+  return old;
+end;
+$$;
+
+drop trigger if exists resources_reassign_shared_content on resources;
+create trigger resources_reassign_shared_content
+  before delete on resources
+  for each row execute function public.reassign_shared_content();
 
 -- Keep public.users synced with auth.users
 create or replace function public.handle_new_auth_user()
@@ -0,0 +1,49 @@
+import asyncio
+
+from app.core.config import settings
+from app.services import rag_service
+from app.services.chat_cache import SemanticAnswerCache
+
+
+def test_lookup_returns_answer_of_similar_query():
+    cache = SemanticAnswerCache(threshold=0.95, max_resources=10, max_answers_per_resource=10, ttl_seconds=60)
+    cache.store("r1", [1.0, 0.0, 0.0], "first")
+    cache.store("r1", [0.0, 1.0, 0.0], "second")
+    assert cache.lookup("r1", [0.99, 0.05, 0.0]) == "first"
+    assert cache.lookup("r1", [0.5, 0.5, 0.7]) is None
+    assert cache.lookup("r2", [1.0, 0.0, 0.0]) is None
+
+
+def test_invalidate_drops_resource_answers():
+    cache = SemanticAnswerCache(threshold=0.9, max_resources=10, max_answers_per_resource=10, ttl_seconds=60)
+    cache.store("r1", [1.0, 0.0], "answer")
+    cache.invalidate("r1")
+    assert cache.lookup("r1", [1.0, 0.0]) is None
+
+
+def test_cached_answer_is_saved_before_done_event(monkeypatch):
+    written = []
+
+    async def write(resource_id, role, message):
+        written.append((role, message))
+
+    cache = SemanticAnswerCache(threshold=0.9, max_resources=10, max_answers_per_resource=10, ttl_seconds=60)
+    cache.store("r1", [1.0, 0.0], "cached answer")
+    monkeypatch.setattr(settings, "answer_cache_enabled", True)
+    monkeypatch.setattr(settings, "metrics_enabled", False)
+    monkeypatch.setattr(rag_service, "answer_cache", cache)
+    monkeypatch.setattr(rag_service.history_writer, "write", write)
+
+    async def run():
+        async def embedding():
+            return [1.0, 0.0]
+
+        stream = await rag_service.generate_chat_response("q", "r1", session=None, query_embedding=embedding())
+        async for event in stream:
+            if "event: done" in event:
+                # The client hangs up as soon as it sees ``done``.
+                await stream.aclose()
+                break
+
+    asyncio.run(run())
+    assert written == [("user", "q"), ("assistant", "cached answer")]
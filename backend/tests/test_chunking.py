@@ -0,0 +1,60 @@
+import pytest
+
+from app.services import chunking_service
+from app.services.chunking_service import chunk_text, iter_chunks
+
+
+class WordEncoding:
+    """One token per word, so expected chunks can be written out by hand."""
+
+    def encode(self, text, disallowed_special=()):
+        return text.split(" ")
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+
+@pytest.fixture(autouse=True)
+def words(monkeypatch):
+    monkeypatch.setattr(chunking_service, "get_encoding", WordEncoding)
+
+
+def _tokens(chunk: str) -> int:
+    return len(chunk.split(" "))
+
+
+def test_sentences_are_packed_with_overlap():
+    text = "One two three. Four five. Six seven eight. Nine ten."
+    assert chunk_text(text, max_tokens=6, overlap_tokens=2) == [
+        "One two three. Four five.",
+        "Four five. Six seven eight.",
+        "Nine ten.",
+    ]
+
+
+def test_chunks_stay_within_max_tokens_and_keep_every_word():
+    sentences = [" ".join(f"w{i}_{j}" for j in range(1 + i % 7)) + "." for i in range(200)]
+    chunks = chunk_text(" ".join(sentences), max_tokens=16, overlap_tokens=4)
+
+    assert all(_tokens(chunk) <= 16 for chunk in chunks)
+    emitted = {word for chunk in chunks for word in chunk.split(" ")}
+    assert emitted == {word for sentence in sentences for word in sentence.split(" ")}
+
+
+def test_long_sentence_is_split_on_token_boundaries():
+    sentence = " ".join(f"w{i}" for i in range(10))
+    assert chunk_text(sentence, max_tokens=4, overlap_tokens=1) == [
+        "w0 w1 w2 w3",
+        "w3 w4 w5 w6",
+        "w6 w7 w8 w9",
+    ]
+
+
+def test_piece_boundaries_do_not_change_chunks():
+    pages = ["First page ends mid", "sentence here. Second page.", "", "Third page has more words. End"]
+    assert list(iter_chunks(pages, max_tokens=5, overlap_tokens=2)) == chunk_text(" ".join(pages), 5, 2)
+
+
+def test_whitespace_is_collapsed_and_empty_input_yields_nothing():
+    assert chunk_text("  a \n b\t c.  ", max_tokens=10, overlap_tokens=0) == ["a b c."]
+    assert chunk_text("   ", max_tokens=10) == []
@@ -0,0 +1,37 @@
+from app.services.rag_service import DeltaNormalizer
+
+
+def normalize(chunks: list[str], cumulative: bool = False) -> str:
+    normalizer = DeltaNormalizer(cumulative=cumulative)
+    return "".join(normalizer.push(chunk) for chunk in chunks)
+
+
+def test_repeated_tokens_are_kept():
+    assert normalize(["1", "000", "000", "000"]) == "1000000000"
+    assert normalize(["ha", " ha", " ha", "!", "!", "!"]) == "ha ha ha!!!"
+
+
+def test_text_seen_earlier_in_the_answer_is_kept():
+    tokens = ["The", " cat", " sat", " on", " the", " mat", ".", " The", " cat", " ran", "."]
+    assert normalize(tokens) == "The cat sat on the mat. The cat ran."
+
+
+def test_empty_chunks_add_nothing():
+    assert normalize(["", "a", "", "b"]) == "ab"
+
+
+def test_cumulative_chunks_keep_only_new_text():
+    tokens = ["1", "000", "000", " ha", " ha", "!", "!"]
+    chunks = ["".join(tokens[:i + 1]) for i in range(len(tokens))]
+    assert normalize(chunks, cumulative=True) == "1000000 ha ha!!"
+
+
+def test_cumulative_resent_chunk_adds_nothing():
+    assert normalize(["Hello", "Hello", "Hello world", "Hello world"], cumulative=True) == "Hello world"
+
+
+def test_length_counts_emitted_text():
+    normalizer = DeltaNormalizer(cumulative=True)
+    for chunk in ["ab", "abcd", "abcd"]:
+        normalizer.push(chunk)
+    assert normalizer.length == 4
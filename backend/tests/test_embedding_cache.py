@@ -0,0 +1,84 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.services import embedding_cache
+from app.services.embedding_cache import _LRU, content_hash, get_or_create_embeddings
+
+
+class _Result:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def all(self):
+        return self._rows
+
+
+class FakeSession:
+    """Answers the embedding_cache lookup from ``stored`` and records inserts."""
+
+    def __init__(self, stored: dict[str, list[float]]):
+        self.stored = stored
+        self.inserts = 0
+
+    async def execute(self, statement):
+        if statement.is_select:
+            return _Result(list(self.stored.items()))
+        self.inserts += 1
+        return _Result([])
+
+
+@pytest.fixture
+def embedded(monkeypatch):
+    calls = []
+
+    async def create_embeddings(texts):
+        calls.append(list(texts))
+        return [[float(len(text)), 1.0] for text in texts]
+
+    monkeypatch.setattr(embedding_cache, "create_embeddings", create_embeddings)
+    monkeypatch.setattr(embedding_cache, "_memory", _LRU(100))
+    monkeypatch.setattr(embedding_cache, "_stats", dict.fromkeys(embedding_cache._stats, 0))
+    return calls
+
+
+def test_content_hash_ignores_case_and_spacing():
+    assert content_hash("Hello   World\n") == content_hash("hello world")
+    assert content_hash("hello world") != content_hash("hello there")
+
+
+def test_lru_evicts_least_recently_used():
+    lru = _LRU(2)
+    lru.put(("m", "a"), np.zeros(2, dtype=np.float32))
+    lru.put(("m", "b"), np.zeros(2, dtype=np.float32))
+    assert lru.get(("m", "a")) is not None
+    lru.put(("m", "c"), np.zeros(2, dtype=np.float32))
+    assert lru.get(("m", "b")) is None
+    assert len(lru) == 2
+
+
+def test_only_unseen_chunks_are_embedded(embedded):
+    session = FakeSession({content_hash("stored"): [9.0, 9.0]})
+    texts = ["stored", "new", "NEW", "other"]
+
+    vectors = asyncio.run(get_or_create_embeddings(texts, session))
+
+    assert embedded == [["new", "other"]]
+    assert vectors == [[9.0, 9.0], [3.0, 1.0], [3.0, 1.0], [5.0, 1.0]]
+    assert all(isinstance(vector, list) for vector in vectors)
+    assert session.inserts == 1
+    stats = embedding_cache.get_cache_stats()
+    assert stats["db_hits"] == 1
+    assert stats["misses"] == 2
+    assert stats["text_bytes_not_embedded"] == len("stored")
+
+
+def test_memory_hits_skip_the_database(embedded):
+    asyncio.run(get_or_create_embeddings(["alpha", "beta"], FakeSession({})))
+    session = FakeSession({})
+    vectors = asyncio.run(get_or_create_embeddings(["alpha", "beta"], session))
+
+    assert len(embedded) == 1
+    assert vectors == [[5.0, 1.0], [4.0, 1.0]]
+    assert embedding_cache.get_cache_stats()["memory_hits"] == 2
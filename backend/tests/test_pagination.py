@@ -0,0 +1,40 @@
+from datetime import datetime, timezone
+from uuid import uuid4
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.pagination import decode_cursor, encode_cursor
+
+
+@pytest.mark.parametrize(
+    "created_at",
+    [
+        datetime(2024, 5, 1, 12, 30, 45, 123456, tzinfo=timezone.utc),
+        datetime(2024, 5, 1, 12, 30, 45, tzinfo=timezone.utc),
+        datetime(2024, 5, 1, 12, 30, 45),
+    ],
+)
+def test_cursor_round_trips(created_at):
+    row_id = uuid4()
+    cursor = encode_cursor(created_at, row_id)
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (created_at, row_id)
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "",
+        "not a cursor",
+        "%%%",
+        encode_cursor(datetime(2024, 5, 1), uuid4())[:-6],
+        "bm8gc2VwYXJhdG9y",  # "no separator"
+        "MjAyNC0wNS0wMXxub3QtYS11dWlk",  # "2024-05-01|not-a-uuid"
+    ],
+)
+def test_malformed_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
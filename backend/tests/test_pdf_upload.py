@@ -0,0 +1,59 @@
+import os
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.routers import resource
+
+PDF = b"%PDF-1.4\n" + b"0" * (2 * 1024 * 1024)
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "ingestion_spool_dir", str(tmp_path))
+    monkeypatch.setattr(settings, "pdf_upload_max_mb", 3)
+    app = FastAPI()
+
+    @app.post("/upload")
+    async def upload(request: Request):
+        file = await resource._receive_pdf(request)
+        try:
+            part = file.file.name
+            resource._move_upload(file, str(tmp_path / "job.pdf"))
+            return {"size": file.size, "part": os.path.basename(part)}
+        finally:
+            await resource._discard_upload(file)
+
+    return TestClient(app)
+
+
+def _spooled(tmp_path) -> list[str]:
+    return sorted(os.listdir(tmp_path))
+
+
+def test_upload_is_moved_into_the_spool_path(client, tmp_path):
+    response = client.post("/upload", files={"file": ("a.pdf", PDF)})
+    assert response.status_code == 200
+    assert response.json()["part"].endswith(".part")
+    assert _spooled(tmp_path) == ["job.pdf"]
+    assert (tmp_path / "job.pdf").read_bytes() == PDF
+
+
+def test_oversized_upload_leaves_no_files(client, tmp_path):
+    def body():
+        yield b"--b\r\nContent-Disposition: form-data; name=\"file\"; filename=\"a.pdf\"\r\n\r\n%PDF-"
+        for _ in range(8):
+            yield b"0" * (1024 * 1024)
+
+    response = client.post("/upload", content=body(), headers={"content-type": "multipart/form-data; boundary=b"})
+    assert response.status_code == 413
+    assert _spooled(tmp_path) == []
+
+
+def test_rejected_uploads_leave_no_files(client, tmp_path):
+    assert client.post("/upload", files={"file": ("a.txt", PDF)}).status_code == 400
+    assert client.post("/upload", files={"other": ("a.pdf", PDF)}).status_code == 400
+    assert client.post("/upload", files={"file": ("a.pdf", b"not a pdf")}).status_code == 400
+    assert _spooled(tmp_path) == []
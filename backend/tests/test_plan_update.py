@@ -0,0 +1,83 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from app.models.models import IngestionJob
+from app.services import ingestion_service
+from app.services.embedding_cache import content_hash
+from app.services.ingestion_service import _plan_update
+
+MODEL = "current-model"
+
+
+class FakeSession:
+    """Answers the document lookup with ``rows`` and records deleted ids."""
+
+    def __init__(self, rows: list[tuple]):
+        self.rows = rows
+        self.deleted: list[uuid.UUID] = []
+
+    async def execute(self, statement):
+        if statement.is_select:
+            return iter(self.rows)
+        for ids in statement.compile().params.values():
+            self.deleted.extend(ids)
+
+
+@pytest.fixture(autouse=True)
+def provider(monkeypatch):
+    monkeypatch.setattr(ingestion_service, "get_embedding_provider", lambda: SimpleNamespace(model=MODEL))
+
+
+def _document(chunk: str, model: str = MODEL) -> tuple:
+    return uuid.uuid4(), content_hash(chunk), model
+
+
+def _job(chunks: list[str]) -> IngestionJob:
+    return IngestionJob(id=uuid.uuid4(), resource_id=uuid.uuid4(), action="update", chunks=chunks)
+
+
+def test_only_changed_chunks_are_embedded_and_removed():
+    kept, edited, dropped = _document("Kept."), _document("Old text."), _document("Removed.")
+    session = FakeSession([kept, edited, dropped])
+    job = _job(["kept.", "New text.", "Added."])
+
+    asyncio.run(_plan_update(session, job))
+
+    assert job.chunks == ["New text.", "Added."]
+    assert job.chunks_total == 2
+    assert sorted(job.stale_document_ids) == sorted([str(edited[0]), str(dropped[0])])
+    # Stale rows of the current model wait until the new chunks are written.
+    assert session.deleted == []
+
+
+def test_rows_of_another_model_are_deleted_and_reembedded():
+    current, other = _document("Same."), _document("Other model.", model="old-model")
+    session = FakeSession([current, other])
+    job = _job(["Same.", "Other model."])
+
+    asyncio.run(_plan_update(session, job))
+
+    assert session.deleted == [other[0]]
+    assert job.chunks == ["Other model."]
+    assert job.stale_document_ids == []
+
+
+def test_unchanged_content_has_nothing_to_do():
+    session = FakeSession([_document("A."), _document("B.")])
+    job = _job(["A.", "B."])
+
+    asyncio.run(_plan_update(session, job))
+
+    assert job.chunks == []
+    assert job.chunks_total == 0
+    assert job.stale_document_ids == []
+
+
+def test_deleted_resource_fails_the_job():
+    job = _job(["A."])
+    job.resource_id = None
+    with pytest.raises(ValueError):
+        asyncio.run(_plan_update(FakeSession([]), job))
@@ -0,0 +1,104 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from app.core.config import settings
+from app.services import provider_gateway as gateway_module
+from app.services.provider_gateway import ProviderGateway
+
+MODEL = "test-embedding-model"
+
+
+class FlakyEmbeddings:
+    """Fails the first ``failures`` calls with ``error``, then answers."""
+
+    def __init__(self, failures: int, error: type[Exception] = openai.APIConnectionError):
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        if self.calls <= self.failures:
+            request = httpx.Request("POST", "http://provider.test/embeddings")
+            if self.error is openai.APIConnectionError:
+                raise openai.APIConnectionError(request=request)
+            raise self.error("bad request", response=httpx.Response(400, request=request), body=None)
+        return "ok"
+
+
+@pytest.fixture
+def gateway(monkeypatch):
+    monkeypatch.setattr(settings, "provider_requests_per_second", 0)
+    monkeypatch.setattr(settings, "provider_hedge_delay_seconds", 0)
+    monkeypatch.setattr(settings, "provider_backoff_base_seconds", 0)
+    monkeypatch.setattr(settings, "provider_max_retries", 3)
+    monkeypatch.setattr(settings, "provider_retry_budget_ratio", 0.5)
+    return ProviderGateway()
+
+
+def _use(monkeypatch, embeddings: FlakyEmbeddings):
+    monkeypatch.setattr(gateway_module, "async_client", SimpleNamespace(embeddings=embeddings))
+
+
+def _embed(gateway: ProviderGateway):
+    return asyncio.run(gateway.embeddings(model=MODEL, input=["text"]))
+
+
+def test_transient_errors_are_retried(gateway, monkeypatch):
+    embeddings = FlakyEmbeddings(failures=2)
+    _use(monkeypatch, embeddings)
+
+    assert _embed(gateway) == "ok"
+    assert embeddings.calls == 3
+    stats = gateway.stats()
+    assert stats["retries"] == 2
+    assert stats["retry_budget"] == 10 + 0.5 - 2
+    assert stats["models"][MODEL]["in_flight"] == 0
+
+
+def test_retries_stop_after_max_retries(gateway, monkeypatch):
+    embeddings = FlakyEmbeddings(failures=10)
+    _use(monkeypatch, embeddings)
+
+    with pytest.raises(openai.APIConnectionError):
+        _embed(gateway)
+    assert embeddings.calls == settings.provider_max_retries + 1
+    assert gateway.stats()["models"][MODEL]["in_flight"] == 0
+
+
+def test_empty_retry_budget_fails_fast(gateway, monkeypatch):
+    gateway._retry_tokens = 0
+    embeddings = FlakyEmbeddings(failures=1)
+    _use(monkeypatch, embeddings)
+
+    # Half a token earned by this request is not enough for a retry.
+    with pytest.raises(openai.APIConnectionError):
+        _embed(gateway)
+    assert embeddings.calls == 1
+    assert gateway.stats()["retries_denied"] == 1
+
+    # The next request tops the budget up to a full token.
+    embeddings.failures = 2
+    assert _embed(gateway) == "ok"
+    assert gateway.stats()["retries"] == 1
+
+
+def test_budget_refills_with_requests_up_to_its_cap(gateway, monkeypatch):
+    _use(monkeypatch, FlakyEmbeddings(failures=0))
+    for _ in range(300):
+        _embed(gateway)
+    assert gateway.stats()["retry_budget"] == 100
+
+
+def test_other_errors_are_not_retried(gateway, monkeypatch):
+    embeddings = FlakyEmbeddings(failures=1, error=openai.BadRequestError)
+    _use(monkeypatch, embeddings)
+
+    with pytest.raises(openai.BadRequestError):
+        _embed(gateway)
+    assert embeddings.calls == 1
+    assert gateway.stats()["retries"] == 0
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.services.study_generation import build_groups, map_reduce_generate, merge_items
+
+
+@pytest.fixture
+def budget(monkeypatch):
+    monkeypatch.setattr(settings, "study_group_max_chars", 100)
+    monkeypatch.setattr(settings, "study_max_groups", 4)
+
+
+def _chunks(n: int, size: int = 30) -> list[str]:
+    return [f"c{i:03d}".ljust(size, ".") for i in range(n)]
+
+
+def test_small_resource_is_packed_in_order(budget):
+    chunks = _chunks(5)
+    groups = build_groups(chunks)
+
+    assert groups == ["\n\n".join(chunks[:3]), "\n\n".join(chunks[3:])]
+
+
+def test_large_resource_is_sampled_from_start_to_end(budget):
+    chunks = _chunks(200)
+    groups = build_groups(chunks)
+
+    assert 1 < len(groups) <= settings.study_max_groups
+    assert all(len(group) <= 100 + 2 * 3 for group in groups)
+    picked = [chunk for group in groups for chunk in group.split("\n\n")]
+    assert picked == sorted(picked)
+    assert picked[0] == chunks[0]
+    # The last group reaches the final stretch of the resource.
+    assert int(picked[-1][1:4]) >= 200 * 3 // 4
+
+
+def test_uneven_chunks_never_exceed_the_group_limit(budget):
+    chunks = [("x" * (10 + (i * 37) % 90)) for i in range(500)]
+    assert len(build_groups(chunks)) <= settings.study_max_groups
+
+
+def test_merge_items_dedupes_and_alternates_between_groups():
+    partials = [
+        [{"question": "A?"}, {"question": "B?"}, {"question": "C?"}],
+        [{"question": "  a? "}, {"question": "D?"}],
+        [{"question": "E?"}],
+    ]
+    merged = merge_items(partials, 4)
+    assert [item["question"] for item in merged] == ["A?", "D?", "E?", "B?"]
+    assert len(merge_items(partials, 10)) == 5
+
+
+def test_failed_groups_are_skipped(budget):
+    async def generate(text: str, n: int) -> list[dict]:
+        if text.startswith("c003"):
+            raise RuntimeError("provider error")
+        return [{"question": f"{text[:4]} {i}"} for i in range(n)]
+
+    # Two groups, each asked for ceil(4 / 2) + 1 items; only the first answers.
+    items = asyncio.run(map_reduce_generate(_chunks(5), 4, generate))
+    assert [item["question"] for item in items] == ["c000 0", "c000 1", "c000 2"]
+
+
+def test_all_groups_failing_raises(budget):
+    async def generate(text: str, n: int) -> list[dict]:
+        raise RuntimeError("provider error")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(map_reduce_generate(_chunks(5), 4, generate))
@@ -0,0 +1,117 @@
+"""EXPLAIN checks that per-resource retrieval walks the HNSW index.
+
+Needs ``DATABASE_URL`` pointing at a Postgres with pgvector and is skipped
+without it. Each test fills a temporary ``documents`` table (dropped on
+rollback) with the indexes a deployment of that ``VECTOR_STORAGE`` mode has,
+then inspects the plan of the query ``search_resource_chunks`` runs.
+"""
+import asyncio
+import json
+import os
+import uuid
+
+import numpy as np
+import pytest
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.database import get_sessionmaker
+from app.services.document_writer import write_documents
+from app.services.embedding_service import get_embedding_provider
+from app.services.retrieval_service import (
+    SEARCH_SQL,
+    compact_search_sql,
+    configure_vector_search,
+    vector_literal,
+)
+
+pytestmark = pytest.mark.skipif(
+    not os.getenv("DATABASE_URL", settings.database_url),
+    reason="needs DATABASE_URL pointing at Postgres with pgvector",
+)
+
+# Small vectors keep the index build fast; the plan does not depend on them.
+DIMENSIONS = 64
+RESOURCES = 20
+ROWS_PER_RESOURCE = 500
+LIMIT = 5
+
+# Index each mode searches, as created by schema.sql and migrations/006.
+INDEXES = {
+    "full": "embedding vector_cosine_ops",
+    "halfvec": f"(embedding::halfvec({DIMENSIONS})) halfvec_cosine_ops",
+    "binary": f"(binary_quantize(embedding)::bit({DIMENSIONS})) bit_hamming_ops",
+}
+
+
+def _index_scans(plan: dict) -> list[dict]:
+    found = []
+    if plan.get("Node Type") in ("Index Scan", "Index Only Scan"):
+        found.append(plan)
+    for child in plan.get("Plans", []):
+        found.extend(_index_scans(child))
+    return found
+
+
+async def _plan(storage: str, monkeypatch) -> dict:
+    rng = np.random.default_rng(0)
+    resource_ids = [uuid.uuid4() for _ in range(RESOURCES)]
+
+    async with get_sessionmaker()() as session:
+        version = await session.scalar(text("SELECT extversion FROM pg_extension WHERE extname = 'vector'"))
+        if version is None:
+            pytest.skip("pgvector is not installed")
+        if storage != "full" and await session.scalar(text("SELECT to_regtype('halfvec')")) is None:
+            pytest.skip(f"VECTOR_STORAGE={storage} needs pgvector >= 0.7, found {version}")
+        if tuple(int(part) for part in version.split(".")[:2]) < (0, 8):
+            # hnsw.iterative_scan only exists from 0.8 on.
+            monkeypatch.setattr(settings, "hnsw_iterative_scan", "off")
+
+        await session.execute(text(f"""
+            CREATE TEMP TABLE documents (
+                id uuid DEFAULT gen_random_uuid() PRIMARY KEY,
+                resource_id uuid NOT NULL,
+                chunk_text text NOT NULL,
+                content_hash text NOT NULL,
+                embedding_model text NOT NULL,
+                embedding vector({DIMENSIONS}) NOT NULL,
+                UNIQUE (resource_id, content_hash)
+            ) ON COMMIT DROP
+        """))
+        await session.execute(text("CREATE INDEX ON documents (resource_id)"))
+        for resource_id in resource_ids:
+            chunks = [f"{resource_id} chunk {i}" for i in range(ROWS_PER_RESOURCE)]
+            vectors = rng.standard_normal((ROWS_PER_RESOURCE, DIMENSIONS)).astype(np.float32)
+            await write_documents(session, resource_id, chunks, vectors)
+        await session.execute(text(f"CREATE INDEX documents_test_hnsw_idx ON documents USING hnsw ({INDEXES[storage]})"))
+        await session.execute(text("ANALYZE documents"))
+
+        limit = LIMIT
+        if storage == "full":
+            query = SEARCH_SQL
+        else:
+            query = compact_search_sql(storage, DIMENSIONS)
+            limit *= max(1, settings.vector_rerank_oversample)
+        await configure_vector_search(session, limit)
+        result = await session.execute(
+            text(f"EXPLAIN (FORMAT JSON) {query.text.strip().rstrip(';')}"),
+            {
+                "resource_id": str(resource_ids[0]),
+                "model": get_embedding_provider().model,
+                "vector": vector_literal(rng.standard_normal(DIMENSIONS).tolist()),
+                "limit": limit,
+            },
+        )
+        plan = result.scalar()
+        await session.rollback()
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+@pytest.mark.parametrize("storage", ["full", "halfvec", "binary"])
+def test_per_resource_search_uses_hnsw_index(storage, monkeypatch):
+    plan = asyncio.run(_plan(storage, monkeypatch))
+    scans = [scan["Index Name"] for scan in _index_scans(plan)]
+    assert "documents_test_hnsw_idx" in scans, json.dumps(plan, indent=2)
@@ -9,12 +9,64 @@ import { Tabs, TabsContent, TabsList, TabsTrigger } from "@/components/ui/tabs";
 import { Youtube, FileText, UploadCloud } from "lucide-react";
 import { getBackendAuthHeaders } from "@/utils/backend-auth";
 
+type IngestionJob = {
+  status: "queued" | "extracted" | "chunked" | "embedding" | "completed" | "failed";
+  resource_id: string | null;
+  chunks_total: number;
+  chunks_embedded: number;
+  error: string | null;
+};
+
+const JOB_POLL_INTERVAL_MS = 1500;
+// Keep in step with PDF_UPLOAD_MAX_MB on the backend, which enforces it.
+const MAX_PDF_MB = 200;
+
 export function AddResourceForm() {
   const [youtubeUrl, setYoutubeUrl] = useState("");
   const [file, setFile] = useState<File | null>(null);
   const [loading, setLoading] = useState(false);
+  const [progress, setProgress] = useState<string | null>(null);
   const router = useRouter();
 
+  const waitForJob = async (jobId: string): Promise<IngestionJob> => {
+    while (true) {
+      const authHeaders = await getBackendAuthHeaders();
+      const res = await fetch(`${process.env.NEXT_PUBLIC_API_URL}/api/resources/jobs/${jobId}`, {
+        cache: "no-store",
+        headers: authHeaders,
+      });
+      if (!res.ok) {
+        throw new Error("Failed to fetch job status");
+      }
+
+      const job: IngestionJob = await res.json();
+      if (job.status === "completed" || job.status === "failed") {
+        return job;
+      }
+      setProgress(
+        job.status === "embedding" && job.chunks_total > 0
+          ? `Embedding ${job.chunks_embedded}/${job.chunks_total} chunks...`
+          : "Extracting content..."
+      );
+      await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+    }
+  };
+
+  const finishIngestion = async (data: { job_id?: string; detail?: string }, failureMessage: string) => {
+    if (!data.job_id) {
+      alert(data.detail || failureMessage);
+      return;
+    }
+
+    const job = await waitForJob(data.job_id);
+    if (job.status === "completed" && job.resource_id) {
+      window.dispatchEvent(new Event("resources:refresh"));
+      router.push(`/dashboard/resource/${job.resource_id}`);
+    } else {
+      alert(job.error || failureMessage);
+    }
+  };
+
   const handleYoutubeSubmit = async (e: React.FormEvent) => {
     e.preventDefault();
     setLoading(true);
@@ -26,23 +78,23 @@ export function AddResourceForm() {
         body: JSON.stringify({ url: youtubeUrl }),
       });
       const data = await res.json();
-      if (data.resource_id) {
-        window.dispatchEvent(new Event("resources:refresh"));
-        router.push(`/dashboard/resource/${data.resource_id}`);
-      } else {
-        alert("Failed to process video");
-      }
+      await finishIngestion(data, "Failed to process video");
     } catch (err) {
       console.error(err);
       alert("Error processing video");
     } finally {
       setLoading(false);
+      setProgress(null);
     }
   };
 
   const handlePdfSubmit = async (e: React.FormEvent) => {
     e.preventDefault();
     if (!file) return;
+    if (file.size > MAX_PDF_MB * 1024 * 1024) {
+      alert(`PDF must be at most ${MAX_PDF_MB} MB`);
+      return;
+    }
     setLoading(true);
     try {
       const authHeaders = await getBackendAuthHeaders();
@@ -55,17 +107,13 @@ export function AddResourceForm() {
         body: formData,
       });
       const data = await res.json();
-      if (data.resource_id) {
-        window.dispatchEvent(new Event("resources:refresh"));
-        router.push(`/dashboard/resource/${data.resource_id}`);
-      } else {
-        alert("Failed to process pdf");
-      }
+      await finishIngestion(data, "Failed to process pdf");
     } catch (err) {
       console.error(err);
       alert("Error processing file");
     } finally {
       setLoading(false);
+      setProgress(null);
     }
   };
 
@@ -97,7 +145,7 @@ export function AddResourceForm() {
               />
             </div>
             <Button type="submit" disabled={loading || !youtubeUrl} className="w-full btn-neon font-semibold py-6">
-              {loading ? "Processing Video..." : "Synthesize Video"}
+              {loading ? progress ?? "Processing Video..." : "Synthesize Video"}
             </Button>
           </form>
         </TabsContent>
@@ -109,7 +157,7 @@ export function AddResourceForm() {
               <div className="border-2 border-dashed border-white/20 rounded-2xl p-12 text-center hover:border-primary/50 transition-colors bg-white/5 cursor-pointer flex flex-col items-center justify-center">
                 <UploadCloud className="w-12 h-12 text-white/40 mb-4" />
                 <p className="text-white/80 font-medium mb-1">Click to upload or drag and drop</p>
-                <p className="text-white/50 text-sm mb-4">PDF up to 10MB</p>
+                <p className="text-white/50 text-sm mb-4">PDF up to {MAX_PDF_MB}MB</p>
                 <Input
                   id="pdf-upload"
                   type="file"
@@ -129,7 +177,7 @@ export function AddResourceForm() {
               </div>
             </div>
             <Button type="submit" disabled={loading || !file} className="w-full btn-neon font-semibold py-6">
-              {loading ? "Processing PDF..." : "Synthesize PDF"}
+              {loading ? progress ?? "Processing PDF..." : "Synthesize PDF"}
             </Button>
           </form>
         </TabsContent>
@@ -6,13 +6,36 @@ import { Button } from "@/components/ui/button";
 import { Input } from "@/components/ui/input";
 import { getBackendAuthHeaders } from "@/utils/backend-auth";
 
+type ChatMessage = { role: "user" | "assistant"; content: string };
+
+const historyUrl = (resourceId: string, cursor?: string | null) =>
+  `${process.env.NEXT_PUBLIC_API_URL}/api/chat/history/${resourceId}` +
+  (cursor ? `?cursor=${encodeURIComponent(cursor)}` : "");
+
+const parseHistory = (data: { messages?: unknown }): ChatMessage[] =>
+  Array.isArray(data.messages)
+    ? data.messages
+        .filter(
+          (message: { role?: string; message?: string }) =>
+            message && (message.role === "user" || message.role === "assistant")
+        )
+        .map((message: { role: "user" | "assistant"; message: string }) => ({
+          role: message.role,
+          content: message.message ?? "",
+        }))
+    : [];
+
 export function ChatInterface({ resourceId }: { resourceId: string }) {
-  const [messages, setMessages] = useState<{ role: "user" | "assistant"; content: string }[]>([]);
+  const [messages, setMessages] = useState<ChatMessage[]>([]);
   const [input, setInput] = useState("");
   const [loadingReply, setLoadingReply] = useState(false);
   const [loadingHistory, setLoadingHistory] = useState(true);
   const [clearing, setClearing] = useState(false);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingOlder, setLoadingOlder] = useState(false);
   const scrollRef = useRef<HTMLDivElement | null>(null);
+  // Scroll height before older messages were prepended, so the view can stay put.
+  const prependedFromHeight = useRef<number | null>(null);
 
   useEffect(() => {
     let cancelled = false;
@@ -21,7 +44,7 @@ export function ChatInterface({ resourceId }: { resourceId: string }) {
       setLoadingHistory(true);
       try {
         const authHeaders = await getBackendAuthHeaders();
-        const res = await fetch(`${process.env.NEXT_PUBLIC_API_URL}/api/chat/history/${resourceId}`, {
+        const res = await fetch(historyUrl(resourceId), {
           cache: "no-store",
           headers: authHeaders,
         });
@@ -31,19 +54,10 @@ export function ChatInterface({ resourceId }: { resourceId: string }) {
         }
 
         const data = await res.json();
-        const parsedMessages = Array.isArray(data.messages)
-          ? data.messages
-              .filter(
-                (message: { role?: string; message?: string }) =>
-                  message && (message.role === "user" || message.role === "assistant")
-              )
-              .map((message: { role: "user" | "assistant"; message: string }) => ({
-                role: message.role,
-                content: message.message ?? "",
-              }))
-          : [];
+        const parsedMessages = parseHistory(data);
 
         if (!cancelled) {
+          setNextCursor(data.next_cursor ?? null);
           if (parsedMessages.length > 0) {
             setMessages(parsedMessages);
           } else {
@@ -72,6 +86,7 @@ export function ChatInterface({ resourceId }: { resourceId: string }) {
       }
     }
 
+    setNextCursor(null);
     loadChatHistory();
     return () => {
       cancelled = true;
@@ -81,23 +96,44 @@ export function ChatInterface({ resourceId }: { resourceId: string }) {
   useEffect(() => {
     const viewport = scrollRef.current;
     if (!viewport) return;
+    if (prependedFromHeight.current !== null) {
+      viewport.scrollTop += viewport.scrollHeight - prependedFromHeight.current;
+      prependedFromHeight.current = null;
+      return;
+    }
     viewport.scrollTop = viewport.scrollHeight;
   }, [messages, loadingReply, loadingHistory]);
 
-  const appendNovelText = (existing: string, incoming: string) => {
-    if (!incoming) return existing;
-    if (!existing) return incoming;
-    if (existing.includes(incoming) || existing.endsWith(incoming)) return existing;
-    if (incoming.startsWith(existing)) return incoming;
-
-    const maxOverlap = Math.min(existing.length, incoming.length);
-    for (let overlap = maxOverlap; overlap > 0; overlap--) {
-      if (existing.endsWith(incoming.slice(0, overlap))) {
-        return existing + incoming.slice(overlap);
+  const loadOlderMessages = async () => {
+    if (!nextCursor || loadingOlder) return;
+    setLoadingOlder(true);
+    try {
+      const authHeaders = await getBackendAuthHeaders();
+      const res = await fetch(historyUrl(resourceId, nextCursor), { cache: "no-store", headers: authHeaders });
+      if (!res.ok) {
+        throw new Error("Failed to load older messages");
       }
+      const data = await res.json();
+      prependedFromHeight.current = scrollRef.current?.scrollHeight ?? null;
+      setMessages((prev) => [...parseHistory(data), ...prev]);
+      setNextCursor(data.next_cursor ?? null);
+    } catch (error) {
+      console.error(error);
+    } finally {
+      setLoadingOlder(false);
     }
+  };
 
-    return existing + incoming;
+  // Parses one Server-Sent Event block ("id:", "event:", "data:" lines).
+  const parseSseEvent = (block: string) => {
+    let event = "message";
+    const dataLines: string[] = [];
+    for (const line of block.split("\n")) {
+      if (line.startsWith("event:")) event = line.slice(6).trim();
+      else if (line.startsWith("data:")) dataLines.push(line.slice(5).trimStart());
+    }
+    if (dataLines.length === 0) return null;
+    return { event, data: JSON.parse(dataLines.join("\n")) };
   };
 
   const sendMessage = async (e: React.FormEvent) => {
@@ -126,16 +162,29 @@ export function ChatInterface({ resourceId }: { resourceId: string }) {
 
       const reader = res.body.getReader();
       const decoder = new TextDecoder("utf-8");
+      let buffer = "";
 
       while (true) {
         const { value, done } = await reader.read();
         if (done) break;
 
-        const chunk = decoder.decode(value, { stream: true });
+        buffer += decoder.decode(value, { stream: true });
+        const blocks = buffer.split("\n\n");
+        buffer = blocks.pop() ?? "";
+
+        let text = "";
+        for (const block of blocks) {
+          const parsed = parseSseEvent(block);
+          if (!parsed) continue; // heartbeat comment
+          if (parsed.event === "message") text += parsed.data.text ?? "";
+          else if (parsed.event === "error") throw new Error(parsed.data.error);
+        }
+        if (!text) continue;
+
         setMessages((prev) => {
           const newMessages = [...prev];
           const lastIdx = newMessages.length - 1;
-          newMessages[lastIdx].content = appendNovelText(newMessages[lastIdx].content, chunk);
+          newMessages[lastIdx] = { ...newMessages[lastIdx], content: newMessages[lastIdx].content + text };
           return newMessages;
         });
       }
@@ -167,6 +216,7 @@ export function ChatInterface({ resourceId }: { resourceId: string }) {
         throw new Error("Failed to clear chat history");
       }
 
+      setNextCursor(null);
       setMessages([
         {
           role: "assistant",
@@ -188,6 +238,16 @@ export function ChatInterface({ resourceId }: { resourceId: string }) {
     <div className="flex flex-col h-full min-h-0 w-full">
       <div ref={scrollRef} className="flex-1 min-h-0 overflow-y-auto p-4 pr-6">
         <div className="flex flex-col gap-4">
+          {nextCursor && !loadingHistory && (
+            <button
+              type="button"
+              onClick={loadOlderMessages}
+              disabled={loadingOlder}
+              className="self-center px-3 py-1 text-xs text-white/40 hover:text-white/70 disabled:opacity-50"
+            >
+              {loadingOlder ? "Loading..." : "Load older messages"}
+            </button>
+          )}
           {messages.map((msg, i) => (
             <div key={i} className={`flex ${msg.role === "user" ? "justify-end" : "justify-start"}`}>
               <div
@@ -15,7 +15,9 @@ type ResourceItem = {
 
 export function ResourceSidebar() {
   const [resources, setResources] = useState<ResourceItem[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const pathname = usePathname();
 
   useEffect(() => {
@@ -31,6 +33,7 @@ export function ResourceSidebar() {
         const data = await res.json();
         if (!cancelled) {
           setResources(Array.isArray(data.resources) ? data.resources : []);
+          setNextCursor(data.next_cursor ?? null);
         }
       } catch (error) {
         const isAuthError =
@@ -40,6 +43,7 @@ export function ResourceSidebar() {
         }
         if (!cancelled) {
           setResources([]);
+          setNextCursor(null);
         }
       } finally {
         if (!cancelled) {
@@ -66,6 +70,27 @@ export function ResourceSidebar() {
     };
   }, []);
 
+  async function loadMore() {
+    if (!nextCursor || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const authHeaders = await getBackendAuthHeaders();
+      const res = await fetch(
+        `${process.env.NEXT_PUBLIC_API_URL}/api/resources?cursor=${encodeURIComponent(nextCursor)}`,
+        { cache: "no-store", headers: authHeaders }
+      );
+      const data = await res.json();
+      if (Array.isArray(data.resources)) {
+        setResources((prev) => [...prev, ...data.resources]);
+      }
+      setNextCursor(data.next_cursor ?? null);
+    } catch (error) {
+      console.error("Failed to load more resources", error);
+    } finally {
+      setLoadingMore(false);
+    }
+  }
+
   const currentResourceId = pathname?.startsWith("/dashboard/resource/")
     ? pathname.split("/").pop()
     : null;
@@ -108,6 +133,16 @@ export function ResourceSidebar() {
           </span>
         </Link>
       ))}
+      {nextCursor && (
+        <button
+          type="button"
+          onClick={loadMore}
+          disabled={loadingMore}
+          className="px-2 py-2 text-left text-xs text-white/40 hover:text-white/70 disabled:opacity-50"
+        >
+          {loadingMore ? "Loading..." : "Load more"}
+        </button>
+      )}
     </div>
   );
 }